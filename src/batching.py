@@ -0,0 +1,27 @@
+from collections import defaultdict
+from typing import Dict, List, Sequence
+
+
+def bucket_width(width: int, step: int) -> int:
+    """Округлити ширину вгору до найближчої межі кошика."""
+    return -(-width // step) * step
+
+
+def group_by_width(widths: Sequence[int], step: int, max_batch_size: int = 0) -> List[List[int]]:
+    """
+    Розбити індекси зразків на групи зі спільною шириною кошика.
+
+    Групи повертаються у порядку зростання ширини; якщо задано max_batch_size, завеликі
+    кошики розбиваються на кілька груп.
+    """
+    buckets: Dict[int, List[int]] = defaultdict(list)
+    for idx, width in enumerate(widths):
+        buckets[bucket_width(width, step)].append(idx)
+
+    groups = []
+    for width in sorted(buckets):
+        indices = buckets[width]
+        size = max_batch_size or len(indices)
+        groups += [indices[i:i + size] for i in range(0, len(indices), size)]
+    return groups
+
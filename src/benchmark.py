@@ -0,0 +1,397 @@
+import argparse
+import functools
+import glob
+import json
+import os
+import random
+import re
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import cv2
+import editdistance
+import numpy as np
+
+import ctc
+from dataloaderIAM import Batch
+from datafiles import data_files
+from preprocessor import Preprocessor
+
+
+def synthetic_samples(char_list: Sequence[str], words: Sequence[str], num_samples: int,
+                      seed: int = 0) -> List[Tuple[np.ndarray, List[int]]]:
+    """
+    Згенерувати матриці ймовірностей (T, C), схожі на вихід мережі, для відомих слів.
+
+    Кожен символ слова отримує пік у своєму кадрі, пропуск домінує між піками, а частина
+    кадрів містить конкуруючий хибний символ, тож жадібне декодування іноді помиляється.
+    """
+    rng = np.random.default_rng(seed)
+    char_idx = {c: i for i, c in enumerate(char_list)}
+    num_chars = len(char_list) + 1
+    samples = []
+    for word in rng.choice(words, num_samples):
+        labels = [char_idx[c] for c in word if c in char_idx]
+        num_steps = max(32, 4 * len(labels))
+        logits = rng.normal(size=(num_steps, num_chars))
+        logits[:, -1] += 8
+        pos = np.linspace(1, num_steps - 2, len(labels)).astype(int)
+        logits[pos, labels] += 12
+        confused = pos[rng.random(len(pos)) < 0.2]
+        logits[confused, rng.integers(0, num_chars - 1, len(confused))] += rng.uniform(10, 14, len(confused))
+        samples.append((ctc.softmax(logits), labels))
+    return samples
+
+
+def iam_samples(data_dir: str, num_samples: int) -> Tuple[List[str], List[Tuple[np.ndarray, List[int]]]]:
+    """Отримати справжні виходи відновленої англійської моделі на наборі валідації IAM."""
+    from path import Path
+    from dataloaderIAM import DataLoaderIAM
+    from engRecognition import EnglishRecognition
+    from preprocessor import Preprocessor
+
+    model = EnglishRecognition().loadModel()
+    loader = DataLoaderIAM(Path(data_dir), 50)
+    loader.validation_set()
+    preprocessor = Preprocessor((256, 32))
+    samples = []
+    while loader.has_next() and len(samples) < num_samples:
+        batch = preprocessor.process_batch(loader.get_next())
+        seq_lens = model.batch_seq_lens(batch)
+        feed_dict = {model.input_imgs: batch.imgs, model.seq_len: seq_lens, model.is_train: False}
+        mats = ctc.softmax(model.sess.run(model.ctc_in_3d_tbc, feed_dict)).transpose(1, 0, 2)
+        for mat, seq_len, text in zip(mats, seq_lens, batch.gt_texts):
+            samples.append((mat[:seq_len], [model.charList.index(c) for c in text]))
+    return model.charList, samples[:num_samples]
+
+
+def decoder_benchmark(samples: Sequence[Tuple[np.ndarray, List[int]]], blank: int,
+                      beam_widths: Sequence[int] = (5, 10, 25)) -> dict:
+    """Порівняти жадібне декодування і пошук променем за часом на зразок і CER."""
+    def report(decoded, elapsed):
+        errors = sum(editdistance.eval(d, s[1]) for d, s in zip(decoded, samples))
+        total = sum(len(s[1]) for s in samples)
+        return {'ms_per_sample': 1000 * elapsed / len(samples), 'char_error_rate': errors / max(total, 1)}
+
+    results = {}
+    start = time.perf_counter()
+    decoded = [ctc.best_path(mat, blank)[0] for mat, _ in samples]
+    results['best_path'] = report(decoded, time.perf_counter() - start)
+
+    # пошук променем отримує зразки однакової довжини одним пакетом
+    groups = {}
+    for i, (mat, _) in enumerate(samples):
+        groups.setdefault(mat.shape[0], []).append(i)
+    for beam_width in beam_widths:
+        start = time.perf_counter()
+        decoded = [None] * len(samples)
+        for indices in groups.values():
+            mats = np.stack([samples[i][0] for i in indices])
+            for i, nbest in zip(indices, ctc.prefix_beam_search_batch(mats, blank, beam_width)):
+                decoded[i] = nbest[0][0]
+        results[f'beam_search_{beam_width}'] = report(decoded, time.perf_counter() - start)
+    return results
+
+
+def reference_process_img(preprocessor: Preprocessor, img: np.ndarray) -> np.ndarray:
+    """Попередня обробка одного зображення у float64, як до пакетного шляху; еталон для порівняння."""
+    img = img.astype(np.float64)
+    if preprocessor.data_augmentation:
+        if random.random() < 0.25:
+            def rand_odd():
+                return random.randint(1, 3) * 2 + 1
+            img = cv2.GaussianBlur(img, (rand_odd(), rand_odd()), 0)
+        if random.random() < 0.25:
+            img = cv2.dilate(img, np.ones((3, 3)))
+        if random.random() < 0.25:
+            img = cv2.erode(img, np.ones((3, 3)))
+
+        wt, ht = preprocessor.img_size
+        h, w = img.shape
+        f = min(wt / w, ht / h)
+        fx = f * np.random.uniform(0.75, 1.05)
+        fy = f * np.random.uniform(0.75, 1.05)
+        freedom_x = max((wt - fx * w) / 2, 0)
+        freedom_y = max((ht - fy * h) / 2, 0)
+        tx = (wt - w * fx) / 2 + np.random.uniform(-freedom_x, freedom_x)
+        ty = (ht - h * fy) / 2 + np.random.uniform(-freedom_y, freedom_y)
+        M = np.float32([[fx, 0, tx], [0, fy, ty]])
+        target = np.ones((ht, wt)) * 255
+        img = cv2.warpAffine(img, M, dsize=(wt, ht), dst=target, borderMode=cv2.BORDER_TRANSPARENT)
+
+        if random.random() < 0.5:
+            img = img * (0.25 + random.random() * 0.75)
+        if random.random() < 0.25:
+            img = np.clip(img + (np.random.random(img.shape) - 0.5) * random.randint(1, 25), 0, 255)
+        if random.random() < 0.1:
+            img = 255 - img
+    else:
+        wt, ht = preprocessor.img_size
+        h, w = img.shape
+        f = min(wt / w, ht / h)
+        M = np.float32([[f, 0, (wt - w * f) / 2], [0, f, (ht - h * f) / 2]])
+        target = np.ones((ht, wt)) * 255
+        img = cv2.warpAffine(img, M, dsize=(wt, ht), dst=target, borderMode=cv2.BORDER_TRANSPARENT)
+
+    return cv2.transpose(img) / 255 - 0.5
+
+
+def preprocess_benchmark(imgs: Sequence[np.ndarray], batch_size: int = 50, repeats: int = 3) -> dict:
+    """Порівняти пакетну обробку у float32 з поелементним циклом у float64 за часом на зразок."""
+    results = {}
+    for augment in (False, True):
+        preprocessor = Preprocessor((256, 32), data_augmentation=augment)
+        batches = [imgs[i:i + batch_size] for i in range(0, len(imgs), batch_size)]
+
+        def loop():
+            for batch_imgs in batches:
+                np.stack([reference_process_img(preprocessor, img) for img in batch_imgs])
+
+        def batched():
+            out = np.empty((batch_size,) + preprocessor.img_size, np.float32)
+            for batch_imgs in batches:
+                preprocessor.process_batch(Batch(batch_imgs, None, len(batch_imgs)), out)
+
+        name = 'augmented' if augment else 'plain'
+        for label, fn in (('per_image_float64', loop), ('batch_float32', batched)):
+            elapsed = min(timeit.repeat(fn, number=1, repeat=repeats))
+            results[f'{name}_{label}'] = {'ms_per_sample': 1000 * elapsed / len(imgs)}
+
+    # розбіжність результатів без аугментації
+    preprocessor = Preprocessor((256, 32))
+    reference = np.stack([reference_process_img(preprocessor, img) for img in imgs[:batch_size]])
+    batch = preprocessor.process_batch(Batch(imgs[:batch_size], None, min(batch_size, len(imgs))))
+    results['plain_max_abs_diff'] = float(np.abs(reference - batch.imgs).max())
+    return results
+
+
+def load_images(data_dir: str, num_samples: int) -> List[np.ndarray]:
+    """Зображення IAM або, без набору даних, зображення з каталогу data/ репозиторію, повторені до num_samples."""
+    if data_dir:
+        from path import Path
+        from dataloaderIAM import DataLoaderIAM
+        loader = DataLoaderIAM(Path(data_dir), num_samples)
+        loader.validation_set()
+        return loader.get_next().imgs
+    files = sorted(glob.glob('../data/*.png') + glob.glob('../data/*.jpg'))
+    imgs = [cv2.imread(fn, cv2.IMREAD_GRAYSCALE) for fn in files]
+    return [imgs[i % len(imgs)] for i in range(num_samples)]
+
+
+# набори зображень з data/ для вимірювання розпізнавання
+DATASETS = {
+    'words': ('English', data_files('English', lines=False)),
+    'lines': ('English', data_files('English', words=False)),
+    'ukrainian': ('Ukrainian', data_files('Ukrainian')),
+}
+
+
+def recognizer_configs(languages: Sequence[str], backends: Sequence[str]) -> List[Tuple[str, str, str, Callable]]:
+    """Усі поєднання мови, декодера і рушія: (мова, декодер, рушій, фабрика об'єкта розпізнавання)."""
+    from engRecognition import EnglishRecognition
+    from model import DecoderType
+    from tflitebackend import VARIANTS
+    from ukrRecognition import UkrainianRecognition
+
+    decoders = {
+        'English': {'best_path': dict(decoderType=DecoderType.BestPath),
+                    'beam_search': dict(decoderType=DecoderType.BeamSearch, beamWidth=25),
+                    'word_beam_search': dict(decoderType=DecoderType.WordBeamSearch, beamWidth=25)},
+        'Ukrainian': {'greedy': dict(beamWidth=0), 'beam_search': dict(beamWidth=10)},
+    }
+    factories = {'English': EnglishRecognition, 'Ukrainian': UkrainianRecognition}
+
+    configs = []
+    for language in languages:
+        for decoder, kwargs in decoders[language].items():
+            for backend in backends:
+                if backend == 'tf':
+                    options = dict(kwargs)
+                elif backend in VARIANTS:
+                    options = dict(kwargs, backend='tflite', variant=backend)
+                else:
+                    raise ValueError('Unknown backend: ' + backend)
+                configs.append((language, decoder, backend, functools.partial(factories[language], **options)))
+    return configs
+
+
+def latency_stats(seconds: Sequence[float]) -> dict:
+    """Перцентилі затримки в мілісекундах."""
+    ms = 1000 * np.asarray(seconds)
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95)),
+            'p99_ms': float(np.percentile(ms, 99)), 'mean_ms': float(ms.mean())}
+
+
+def inference_benchmark(factory: Callable, datasets: Dict[str, List[str]], repeats: int = 5,
+                        batch_size: int = 16) -> dict:
+    """
+    Виміряти один об'єкт розпізнавання.
+
+    Холодний старт - створення моделі й розпізнавання першого зображення. Затримка - розпізнавання
+    одного зображення прогрітою моделлю, repeats проходів по набору. Пропускна здатність - зображень
+    за секунду під час розпізнавання пакетами batch_size.
+    """
+    start = time.perf_counter()
+    recognition = factory()
+    model = recognition.loadModel()
+    load_seconds = time.perf_counter() - start
+    first = next(iter(datasets.values()))[:1]
+    recognition.inferBatch(model, first)
+    result = {'cold_start_ms': 1000 * (time.perf_counter() - start), 'model_load_ms': 1000 * load_seconds,
+              'model_size_mb': model.memory_size() / 1024 ** 2, 'datasets': {}}
+
+    for name, files in datasets.items():
+        seconds = []
+        for _ in range(repeats):
+            for fn in files:
+                start = time.perf_counter()
+                recognition.inferBatch(model, [fn])
+                seconds.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for i in range(0, len(files), batch_size):
+                recognition.inferBatch(model, files[i:i + batch_size])
+        throughput = repeats * len(files) / (time.perf_counter() - start)
+        result['datasets'][name] = dict(latency_stats(seconds), images=len(files), images_per_sec=throughput)
+
+    model.close()
+    return result
+
+
+def environment() -> dict:
+    """Опис середовища, без якого результати різних запусків не можна порівнювати."""
+    import platform
+    import subprocess
+    import tensorflow as tf
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': sys.version.split()[0], 'tensorflow': tf.__version__, 'numpy': np.__version__,
+            'opencv': cv2.__version__, 'platform': platform.platform(), 'cpu_count': os.cpu_count(),
+            'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float = 0.1) -> List[str]:
+    """Порівняти з попереднім запуском: повільніші p50 і менша пропускна здатність понад threshold."""
+    regressions = []
+    for key, current in results['results'].items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous or 'datasets' not in current or 'datasets' not in previous:
+            continue
+        for name, stats in current['datasets'].items():
+            old = previous['datasets'].get(name)
+            if not old:
+                continue
+            if stats['p50_ms'] > old['p50_ms'] * (1 + threshold):
+                regressions.append(f"{key}/{name}: p50 {old['p50_ms']:.1f} -> {stats['p50_ms']:.1f} ms")
+            if stats['images_per_sec'] < old['images_per_sec'] * (1 - threshold):
+                regressions.append(f"{key}/{name}: throughput {old['images_per_sec']:.1f} -> "
+                                   f"{stats['images_per_sec']:.1f} images/s")
+    return regressions
+
+
+def decoders(args):
+    if args.data_dir:
+        char_list, samples = iam_samples(args.data_dir, args.samples)
+    elif args.language == 'English':
+        with open('../model/charList.txt') as f:
+            char_list = list(f.read())
+        with open('../data/corpus.txt') as f:
+            words = re.findall(r'\S+', f.read())
+    else:
+        from ukrRecognition import VOCAB
+        # індекс 0 зарезервовано моделлю, тож символи зміщені на 1
+        char_list = [''] + VOCAB
+        words = ['хороший', 'добрий', 'день', 'робота', 'слово', 'рукопис', 'текст']
+
+    if not args.data_dir:
+        samples = synthetic_samples(char_list, words, args.samples)
+    return decoder_benchmark(samples, len(char_list), args.beam_widths)
+
+
+def preprocess(args):
+    return preprocess_benchmark(load_images(args.data_dir, args.samples), args.batch_size)
+
+
+def inference(args):
+    import instrumentation
+
+    np.random.seed(0)
+    random.seed(0)
+    results = {'environment': environment(), 'results': {}}
+    stages = None
+    if args.stages:
+        stages = instrumentation.HistogramSink()
+        instrumentation.enable(stages)
+    for language, decoder, backend, factory in recognizer_configs(args.languages, args.backends):
+        datasets = {name: files for name, (dataset_language, files) in DATASETS.items()
+                    if dataset_language == language}
+        key = f'{language}/{decoder}/{backend}'
+        print('Benchmarking', key)
+        try:
+            results['results'][key] = inference_benchmark(factory, datasets, args.repeats, args.batch_size)
+        except Exception as e:
+            # відсутня модель одного рушія не повинна зупиняти весь набір вимірювань
+            results['results'][key] = {'error': str(e)}
+        if stages:
+            results['results'][key]['stages'] = stages.summary()
+            stages.reset()
+    if stages:
+        instrumentation.disable()
+
+    if args.compare:
+        with open(args.compare) as f:
+            results['regressions'] = find_regressions(results, json.load(f), args.threshold)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the recognition pipeline and its parts.')
+    parser.add_argument('--json', help='file to write the results to')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parser_decoders = subparsers.add_parser('decoders', help='greedy CTC decoding against prefix beam search')
+    parser_decoders.add_argument('--language', choices=['English', 'Ukrainian'], default='English')
+    parser_decoders.add_argument('--samples', type=int, default=200)
+    parser_decoders.add_argument('--beam_widths', type=int, nargs='+', default=[5, 10, 25])
+    parser_decoders.add_argument('--data_dir',
+                                 help='IAM dataset: use real English model outputs instead of synthetic ones')
+    parser_decoders.set_defaults(func=decoders)
+
+    parser_preprocess = subparsers.add_parser('preprocess', help='batch float32 preprocessing against the per-image loop')
+    parser_preprocess.add_argument('--samples', type=int, default=500)
+    parser_preprocess.add_argument('--batch_size', type=int, default=50)
+    parser_preprocess.add_argument('--data_dir', help='IAM dataset to take the images from')
+    parser_preprocess.set_defaults(func=preprocess)
+
+    parser_inference = subparsers.add_parser('inference', help='cold start, latency percentiles and throughput '
+                                                                'of every recognizer, decoder and backend')
+    parser_inference.add_argument('--languages', nargs='+', choices=['English', 'Ukrainian'],
+                                  default=['English', 'Ukrainian'])
+    parser_inference.add_argument('--backends', nargs='+', default=['tf', 'fp32', 'fp16', 'int8'],
+                                  help='tf and/or TFLite variants')
+    parser_inference.add_argument('--repeats', type=int, default=5)
+    parser_inference.add_argument('--batch_size', type=int, default=16)
+    parser_inference.add_argument('--stages', action='store_true',
+                                  help='also report per-stage timings and peak memory')
+    parser_inference.add_argument('--compare', help='JSON of a previous run to check for regressions')
+    parser_inference.add_argument('--threshold', type=float, default=0.1,
+                                  help='relative slowdown reported as a regression')
+    parser_inference.set_defaults(func=inference)
+
+    args = parser.parse_args()
+    results = args.func(args)
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if results.get('regressions'):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+import argparse
+import csv
+import json
+import multiprocessing as mp
+import os
+import time
+from datetime import date
+from typing import Iterator, List, Sequence, Set
+
+from sqlalchemy import create_engine, insert, select
+
+import runtime
+from database import BulkRecord, Record, setupDatabase
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+FIELDS = ['path', 'language', 'text', 'probability', 'error']
+
+# стан процесу-працівника: об'єкт розпізнавання і прогріта модель
+_worker = {}
+
+
+def _init_worker(language: str, options: dict, profile: runtime.RuntimeProfile, page: bool) -> None:
+    # TensorFlow імпортується лише в працівниках, тож головний процес лишається легким;
+    # паралелізм дають процеси, а всередині кожного - потоки з профілю
+    config = runtime.apply(profile)
+    if language == 'English':
+        from engRecognition import EnglishRecognition as Recognition
+    else:
+        from ukrRecognition import UkrainianRecognition as Recognition
+    recognition = Recognition(**options)
+    _worker.update(language=language, recognition=recognition, model=recognition.loadModel(config), page=page)
+
+
+def _recognize_one(path: str) -> dict:
+    recognition, model = _worker['recognition'], _worker['model']
+    result = {'path': path, 'language': _worker['language'], 'text': None, 'probability': None, 'error': None}
+    try:
+        if _worker['page']:
+            import cv2
+            from segmentation import recognize_page
+            img = cv2.imread(path, cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError('Cannot read image: ' + path)
+            result['text'] = recognize_page(lambda crops: recognition.inferBatch(model, crops), img)
+        else:
+            texts, probs = recognition.inferBatch(model, [path])
+            result['text'], result['probability'] = texts[0], probs[0]
+    except Exception as e:
+        result['error'] = repr(e)
+    return result
+
+
+def _recognize_chunk(paths: List[str]) -> List[dict]:
+    if _worker['page']:
+        return [_recognize_one(path) for path in paths]
+    try:
+        texts, probs = _worker['recognition'].inferBatch(_worker['model'], paths)
+    except Exception:
+        # одне пошкоджене зображення не повинне зупиняти весь шматок
+        return [_recognize_one(path) for path in paths]
+    return [{'path': path, 'language': _worker['language'], 'text': text, 'probability': prob, 'error': None}
+            for path, text, prob in zip(paths, texts, probs)]
+
+
+def list_images(source: str) -> List[str]:
+    """Зображення з каталогу (рекурсивно) або з файлу-маніфесту, по одному шляху в рядку."""
+    if os.path.isdir(source):
+        paths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files)
+                         if name.lower().endswith(IMAGE_EXTENSIONS))
+        return paths
+
+    base = os.path.dirname(source)
+    with open(source, encoding='utf-8') as f:
+        lines = [line.strip() for line in f]
+    # відносні шляхи маніфесту відраховуються від його каталогу
+    return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+
+class ResultWriter:
+    """
+        Потоковий запис результатів у JSONL або CSV, що водночас є журналом для відновлення.
+
+        Кожен шматок результатів дописується й скидається на диск, щойно працівник його
+        повертає. Під час відновлення неповний останній рядок, записаний до збою, відрізається,
+        а шляхи з уже записаних рядків пропускаються.
+
+        ---
+
+        Атрибути
+        --------
+        path : str
+            Файл результатів; формат визначається розширенням (.csv або JSONL).
+
+        Методи
+        ------
+        completed() -> Set[str]
+            Шляхи зображень, результати яких уже записані.
+        write(List[dict] results)
+            Дописує результати і скидає їх на диск.
+        close()
+            Закриває файл.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.is_csv = path.lower().endswith('.csv')
+        self._truncate_partial()
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', encoding='utf-8', newline='')
+        self._csv = csv.DictWriter(self._file, FIELDS) if self.is_csv else None
+        if self._csv and new:
+            self._csv.writeheader()
+
+    def _truncate_partial(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            f.truncate(self._complete_length(data) if self.is_csv else data.rfind(b'\n') + 1)
+
+    @staticmethod
+    def _complete_length(data: bytes) -> int:
+        """Довжина CSV без неповного останнього рядка; розриви рядків у полях у лапках (--page) не рахуються."""
+        # розрив рядка поза лапками, якщо перед ним парна кількість лапок (подвоєні лапки
+        # всередині поля додають дві); йдемо назад від кінця, віднімаючи лапки між розривами
+        end = data.rfind(b'\n')
+        quotes = data.count(b'"', 0, end) if end >= 0 else 0
+        while end >= 0 and quotes % 2:
+            previous = data.rfind(b'\n', 0, end)
+            quotes -= data.count(b'"', previous + 1, end)
+            end = previous
+        return end + 1
+
+    def completed(self) -> Set[str]:
+        with open(self.path, encoding='utf-8', newline='') as f:
+            if self.is_csv:
+                return {row['path'] for row in csv.DictReader(f)}
+            return {json.loads(line)['path'] for line in f if line.strip()}
+
+    def write(self, results: Sequence[dict]) -> None:
+        for result in results:
+            if self._csv:
+                self._csv.writerow(result)
+            else:
+                self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def store_records(engine, run_id: str, language: str, coding: str, results: Sequence[dict]) -> None:
+    """
+    Додати успішні результати до records. Зображення, уже додані цим запуском (шматок
+    повторюється, якщо збій стався до запису в журнал), пропускаються, тож записи не дублюються.
+    """
+    results = [result for result in results if result['error'] is None]
+    if not results:
+        return
+    with engine.begin() as connection:
+        stored = set(connection.execute(
+            select(BulkRecord.path).where(BulkRecord.run == run_id, BulkRecord.language == language,
+                                          BulkRecord.path.in_([result['path'] for result in results]))).scalars())
+        for result in results:
+            if result['path'] in stored:
+                continue
+            record_id = connection.execute(insert(Record).values(
+                date=date.today(), file=os.path.basename(result['path']), language=language, coding=coding,
+                result=result['text'])).inserted_primary_key[0]
+            connection.execute(insert(BulkRecord).values(run=run_id, path=result['path'], language=language,
+                                                         record_id=record_id))
+
+
+def chunks(paths: Sequence[str], size: int) -> Iterator[List[str]]:
+    for i in range(0, len(paths), size):
+        yield list(paths[i:i + size])
+
+
+def run(source: str, output: str, language: str = 'English', options: dict = None, workers: int = None,
+        threads: int = None, chunk_size: int = 32, page: bool = False, database: str = 'htr.db',
+        coding: str = 'UTF-8', profile: str = 'throughput') -> dict:
+    """
+    Розпізнати всі зображення з source пулом процесів і дописати результати в output
+    та в таблицю records. Уже записані в output зображення пропускаються, тож перерваний
+    запуск продовжується з місця зупинки.
+    """
+    settings = runtime.get_profile(profile, language)
+    if threads:
+        settings = settings._replace(intra_op_threads=threads)
+    workers = workers or max(1, runtime.CORES // max(1, settings.intra_op_threads))
+    if not settings.intra_op_threads:
+        settings = settings._replace(intra_op_threads=max(1, runtime.CORES // workers))
+    threads = settings.intra_op_threads
+
+    writer = ResultWriter(output)
+    done = writer.completed()
+    paths = [path for path in list_images(source) if path not in done]
+    print(f'{len(done)} images already done, {len(paths)} to recognize with {workers} workers x {threads} threads')
+
+    engine = None
+    if database:
+        engine = create_engine('sqlite:///' + database)
+        setupDatabase(engine)
+    run_id = os.path.abspath(output)
+
+    start = time.perf_counter()
+    processed = failed = 0
+    # spawn: TensorFlow не переживає fork, а працівникам він потрібен свіжим
+    context = mp.get_context('spawn')
+    with context.Pool(workers, _init_worker, (language, options or {}, settings, page)) as pool:
+        for results in pool.imap_unordered(_recognize_chunk, chunks(paths, chunk_size)):
+            if engine is not None:
+                # спершу база даних, потім журнал: після збою шматок повториться, а не загубиться
+                store_records(engine, run_id, language, coding, results)
+            writer.write(results)
+
+            processed += len(results)
+            failed += sum(result['error'] is not None for result in results)
+            rate = processed / (time.perf_counter() - start)
+            print(f'{processed}/{len(paths)} images, {failed} failed, {rate:.1f} images/s')
+    writer.close()
+    return {'processed': processed, 'failed': failed, 'skipped': len(done),
+            'seconds': time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recognize a directory or manifest of images with a process pool.')
+    parser.add_argument('source', help='directory of images or a manifest file with one path per line')
+    parser.add_argument('output', help='results file: .jsonl or .csv; an existing file is resumed')
+    parser.add_argument('--language', choices=['English', 'Ukrainian'], default='English')
+    parser.add_argument('--decoder', choices=['bestpath', 'beamsearch', 'wordbeamsearch'], default='bestpath')
+    parser.add_argument('--beam_width', type=int, default=25)
+    parser.add_argument('--workers', type=int, help='worker processes (default: cores / profile threads)')
+    parser.add_argument('--threads', type=int, help='intra-op threads per worker (default: from the profile)')
+    parser.add_argument('--profile', choices=['default', 'latency', 'throughput'], default='throughput',
+                        help='runtime profile of the workers; tuned values are used when present')
+    parser.add_argument('--chunk_size', type=int, default=32, help='images per task sent to a worker')
+    parser.add_argument('--page', action='store_true', help='segment each image as a full page')
+    parser.add_argument('--database', default='htr.db', help='SQLite database to store records in')
+    parser.add_argument('--no_database', action='store_true', help='only write the results file')
+    args = parser.parse_args()
+
+    if args.language == 'English':
+        decoders = {'bestpath': 0, 'beamsearch': 1, 'wordbeamsearch': 2}
+        options = {'decoderType': decoders[args.decoder], 'beamWidth': args.beam_width}
+    else:
+        options = {'beamWidth': 0 if args.decoder == 'bestpath' else args.beam_width}
+    summary = run(args.source, args.output, args.language, options, args.workers, args.threads, args.chunk_size,
+                  args.page, None if args.no_database else args.database, profile=args.profile)
+    print(json.dumps(summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+
+def softmax(mat: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Softmax уздовж заданої осі, стійкий до великих логітів."""
+    e = np.exp(mat - mat.max(axis=axis, keepdims=True))
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+def log_softmax(mat: np.ndarray, axis: int = -1) -> np.ndarray:
+    """Логарифм softmax уздовж заданої осі."""
+    shifted = mat - mat.max(axis=axis, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=axis, keepdims=True))
+
+
+def label_log_probability(log_probs: np.ndarray, labels: Sequence[int], blank: int) -> float:
+    """
+    Логарифм ймовірності мітки за CTC (прямий прохід), тобто -ctc_loss.
+
+    log_probs - матриця (T, C) логарифмів ймовірностей символів для одного зразка.
+    Обчислення векторизоване за позиціями розширеної мітки (з пропусками між символами).
+    """
+    num_steps = log_probs.shape[0]
+    ext = np.full(2 * len(labels) + 1, blank, dtype=np.int64)
+    ext[1::2] = labels
+    num_states = len(ext)
+
+    # перехід через один стан дозволений лише між різними символами, а не з пропуску
+    skip = np.zeros(num_states, dtype=bool)
+    skip[2:] = (ext[2:] != blank) & (ext[2:] != ext[:-2])
+
+    alpha = np.full(num_states, -np.inf)
+    alpha[0] = log_probs[0, ext[0]]
+    if num_states > 1:
+        alpha[1] = log_probs[0, ext[1]]
+
+    for t in range(1, num_steps):
+        prev1 = np.concatenate(([-np.inf], alpha[:-1]))
+        # зсув на два стани тієї ж довжини, що й alpha (для порожньої мітки стан лише один)
+        prev2 = np.full(num_states, -np.inf)
+        prev2[2:] = alpha[:-2]
+        prev2[~skip] = -np.inf
+        alpha = np.logaddexp(np.logaddexp(alpha, prev1), prev2) + log_probs[t, ext]
+
+    if num_states == 1:
+        return float(alpha[-1])
+    return float(np.logaddexp(alpha[-1], alpha[-2]))
+
+
+def best_path(probs: np.ndarray, blank: int) -> Tuple[List[int], np.ndarray]:
+    """
+    Найкращий шлях (жадібне декодування) з упевненістю для кожного символу.
+
+    probs - матриця (T, C) ймовірностей. Повторювані символи зливаються, пропуски видаляються;
+    упевненість символу - максимальна ймовірність серед кадрів, які він займає.
+    """
+    best = probs.argmax(axis=1)
+    best_probs = probs[np.arange(len(best)), best]
+
+    # початок кожного відрізка однакових міток
+    starts = np.flatnonzero(np.concatenate(([True], best[1:] != best[:-1]))[:len(best)])
+    seg_labels = best[starts]
+    seg_probs = np.maximum.reduceat(best_probs, starts) if len(starts) else best_probs[:0]
+
+    keep = seg_labels != blank
+    return seg_labels[keep].tolist(), seg_probs[keep]
+
+
+def best_path_batch(mats: np.ndarray, blank: int, seq_lens: Sequence[int] = None) -> List[List[int]]:
+    """
+    Найкращий шлях для цілого пакету за один векторний прохід.
+
+    mats - масив (B, T, C) ймовірностей або логітів; seq_lens - справжня довжина кожного
+    елемента, якщо пакет доповнено. Повторювані символи зливаються, пропуски видаляються.
+    """
+    best = mats.argmax(axis=2)
+    # символ лишається, якщо він не пропуск і відрізняється від попереднього кадру
+    keep = best != blank
+    keep[:, 1:] &= best[:, 1:] != best[:, :-1]
+    if seq_lens is not None:
+        keep &= np.arange(best.shape[1]) < np.asarray(seq_lens)[:, None]
+
+    # мітки всіх елементів підряд, розрізані за кількістю символів кожного
+    labels = best[keep].tolist()
+    bounds = np.concatenate(([0], np.cumsum(keep.sum(axis=1)))).tolist()
+    return [labels[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def prefix_beam_search_batch(mats: np.ndarray, blank: int, beam_width: int = 25, top_k: int = 1,
+                             seq_lens: Sequence[int] = None) -> List[List[Tuple[List[int], float]]]:
+    """
+    Пошук променем за префіксами CTC для пакету матриць ймовірностей (B, T, C).
+
+    Розширення всіх променів усіма символами для всіх зразків пакету оцінюються одним
+    векторним кроком; злиття однакових префіксів виконується лише для найкращих кандидатів.
+    Для кожного зразка повертається top_k гіпотез (мітки, ймовірність) за спаданням ймовірності.
+    """
+    batch_size, max_steps, num_chars = mats.shape
+    seq_lens = np.full(batch_size, max_steps) if seq_lens is None else np.asarray(seq_lens)
+    log_mats = np.log(np.maximum(mats, 1e-30))
+
+    # стан: мітки променів і логарифми ймовірностей закінчення пропуском / символом
+    labels = [[()] for _ in range(batch_size)]
+    lp_blank = np.full((batch_size, beam_width), -np.inf)
+    lp_blank[:, 0] = 0
+    lp_non_blank = np.full((batch_size, beam_width), -np.inf)
+    last = np.full((batch_size, beam_width), -1)
+
+    rows = np.arange(batch_size)[:, None]
+    for t in range(max_steps):
+        row = log_mats[:, t]
+        lp_total = np.logaddexp(lp_blank, lp_non_blank)
+
+        # промені без нових символів: пропуск або повтор останнього символу
+        copy_blank = lp_total + row[:, blank, None]
+        copy_non_blank = np.where(last >= 0, lp_non_blank + row[rows, np.maximum(last, 0)], -np.inf)
+
+        # розширення (B, W, C); повтор символу можливий лише після пропуску
+        ext = lp_total[:, :, None] + row[:, None, :]
+        repeat = last[:, :, None] == np.arange(num_chars)
+        ext = np.where(repeat, lp_blank[:, :, None] + row[:, None, :], ext)
+        ext[:, :, blank] = -np.inf
+        ext = ext.reshape(batch_size, -1)
+        top = np.argpartition(-ext, beam_width - 1, axis=1)[:, :beam_width]
+
+        for b in range(batch_size):
+            if t >= seq_lens[b]:
+                continue
+            beams = {}
+            for w, key in enumerate(labels[b]):
+                beams[key] = [copy_blank[b, w], copy_non_blank[b, w]]
+            for i in top[b]:
+                if ext[b, i] == -np.inf:
+                    continue
+                w, c = divmod(int(i), num_chars)
+                key = labels[b][w] + (c,)
+                if key in beams:
+                    beams[key][1] = np.logaddexp(beams[key][1], ext[b, i])
+                else:
+                    beams[key] = [-np.inf, ext[b, i]]
+
+            keys = sorted(beams, key=lambda k: -np.logaddexp(*beams[k]))[:beam_width]
+            labels[b] = keys
+            lp_blank[b] = -np.inf
+            lp_non_blank[b] = -np.inf
+            last[b] = -1
+            for w, key in enumerate(keys):
+                lp_blank[b, w], lp_non_blank[b, w] = beams[key]
+                last[b, w] = key[-1] if key else -1
+
+    lp_total = np.logaddexp(lp_blank, lp_non_blank)
+    return [[(list(key), float(np.exp(lp_total[b, w]))) for w, key in enumerate(labels[b][:top_k])]
+            for b in range(batch_size)]
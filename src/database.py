@@ -28,7 +28,7 @@ class Record(Base):
 
     __tablename__ = 'records'
     id = Column(Integer, primary_key=True)
-    date = Column(DATE)
+    date = Column(DATE, index=True)
     file = Column(String)
     language = Column(String)
     coding = Column(String)
@@ -45,3 +45,112 @@ class Record(Base):
         return self.file
 
 
+class CachedResult(Base):
+    """
+        Клас таблиці result_cache - збережених результатів розпізнавання за вмістом зображення.
+
+        Атрибути
+        --------
+        digest : string
+            SHA-256 вмісту файлу зображення.
+        language  : string
+            Мова розпізнавання тексту.
+        checkpoint  : string
+            Ідентифікатор контрольної точки моделі, якою отримано результат.
+        result  : string
+            Результат розпізнавання у форматі JSON.
+
+
+        Методи
+        ------
+        """
+
+    __tablename__ = 'result_cache'
+    digest = Column(String, primary_key=True)
+    language = Column(String, primary_key=True)
+    checkpoint = Column(String, primary_key=True)
+    result = Column(String)
+
+    def __init__(self, digest, language, checkpoint, result):
+        self.digest = digest
+        self.language = language
+        self.checkpoint = checkpoint
+        self.result = result
+
+
+class BulkRecord(Base):
+    """
+        Клас таблиці bulk_records - зображень пакетного розпізнавання, результати яких уже додано до records.
+
+        Атрибути
+        --------
+        run : string
+            Абсолютний шлях до файлу результатів запуску, що його продовжують повторні запуски.
+        path  : string
+            Шлях до зображення.
+        language  : string
+            Мова розпізнавання тексту.
+        record_id  : int
+            Ідентифікатор запису в records.
+
+
+        Методи
+        ------
+        """
+
+    __tablename__ = 'bulk_records'
+    run = Column(String, primary_key=True)
+    path = Column(String, primary_key=True)
+    language = Column(String, primary_key=True)
+    record_id = Column(Integer)
+
+    def __init__(self, run, path, language, record_id):
+        self.run = run
+        self.path = path
+        self.language = language
+        self.record_id = record_id
+
+
+# повнотекстовий індекс результатів, синхронізований з records тригерами
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE records_fts USING fts5(
+        result, file, content='records', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER records_fts_insert AFTER INSERT ON records BEGIN
+        INSERT INTO records_fts(rowid, result, file) VALUES (new.id, new.result, new.file);
+    END""",
+    """CREATE TRIGGER records_fts_delete AFTER DELETE ON records BEGIN
+        INSERT INTO records_fts(records_fts, rowid, result, file) VALUES ('delete', old.id, old.result, old.file);
+    END""",
+    """CREATE TRIGGER records_fts_update AFTER UPDATE ON records BEGIN
+        INSERT INTO records_fts(records_fts, rowid, result, file) VALUES ('delete', old.id, old.result, old.file);
+        INSERT INTO records_fts(rowid, result, file) VALUES (new.id, new.result, new.file);
+    END""",
+]
+
+recordsFts = table('records_fts', column('records_fts'), column('rowid'), column('rank'))
+
+
+def setupDatabase(engine):
+    """Створити таблиці, індекси та повнотекстовий індекс, яких ще немає в базі даних."""
+    Base.metadata.create_all(engine)
+    # create_all не додає нові індекси до вже наявних таблиць
+    for index in Record.__table__.indexes:
+        index.create(engine, checkfirst=True)
+
+    with engine.begin() as connection:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'records_fts'").first()
+        if not exists:
+            for statement in FTS_SCHEMA:
+                connection.exec_driver_sql(statement)
+            # проіндексувати записи, збережені до появи індексу
+            connection.exec_driver_sql("INSERT INTO records_fts(records_fts) VALUES ('rebuild')")
+
+
+def matchExpression(text):
+    """
+    Перетворити введений користувачем текст на запит FTS5: кожне слово шукається як префікс,
+    а всі слова мають бути в записі. Лапки екрануються, тож спецсимволи FTS5 не діють.
+    """
+    words = text.split()
+    return " ".join('"' + word.replace('"', '""') + '"*' for word in words)
@@ -0,0 +1,22 @@
+from typing import List
+
+DATA_DIR = '../data/'
+
+# зображення з data/ за мовою; розширення файлу про мову нічого не каже
+WORDS = {
+    'English': ['a04-010-00-00.png', 'a04-010-00-01.png', 'a04-010-00-02.png', 'a04-010-00-03.png',
+                'a04-010-00-04.png', 'a04-010-00-05.png', 'a04-010-00-06.png', 'a04-010-00-07.png',
+                'a04-010-01-00.png', 'a04-010-01-01.png', 'helllo.jpg', 'surname.jpg', 'thirty.jpg',
+                'word-example-1.png', 'word.png'],
+    'Ukrainian': ['horoshyy.jpg', 'vlad.png'],
+}
+LINES = {
+    'English': ['itcanwork.jpg', 'line.png', 'veng.jpg'],
+    'Ukrainian': ['vukr.jpg'],
+}
+
+
+def data_files(language: str, words: bool = True, lines: bool = True) -> List[str]:
+    """Шляхи до зображень слів і/або рядків мови language у сталому порядку."""
+    names = (WORDS[language] if words else []) + (LINES[language] if lines else [])
+    return [DATA_DIR + name for name in names]
@@ -1,11 +1,41 @@
 import random
 from collections import namedtuple
+from typing import List, Sequence
 import cv2
 import numpy as np
 from path import Path
 
-Sample = namedtuple('Sample', 'gt_text, file_path')
-Batch = namedtuple('Batch', 'imgs, gt_texts, batch_size')
+from imagestore import ImageStore
+from manifest import Manifest
+
+# width, height - розмір слова з розмітки words.txt, щоб групувати зразки без декодування зображень;
+# label_ids - мітка, закодована за списком символів моделі (вигляд на масив маніфесту)
+class Sample(namedtuple('Sample', 'gt_text, sample_id, img_dir, width, height, label_ids', defaults=(0, 0, None))):
+    __slots__ = ()
+
+    @property
+    def file_path(self) -> str:
+        """Шлях до PNG зразка; будується з ідентифікатора лише тоді, коли зображення справді читається."""
+        form, line = self.sample_id.split('-')[:2]
+        return f'{self.img_dir}/{form}/{form}-{line}/{self.sample_id}.png'
+
+
+# seq_lens - справжня довжина послідовності кожного зразка, якщо зображення доповнені до спільної ширини;
+# gt_labels - закодовані мітки, якщо вони відомі заздалегідь (інакше модель кодує gt_texts сама)
+Batch = namedtuple('Batch', 'imgs, gt_texts, batch_size, seq_lens, gt_labels', defaults=(None, None))
+
+
+def load_batch(samples: List[Sample], store: ImageStore = None) -> Batch:
+    """Завантажити зображення зразків зі сховища (без копіювання) або декодувати PNG з диску."""
+    if store is not None:
+        imgs = [store.get(sample.sample_id) for sample in samples]
+    else:
+        imgs = [cv2.imread(sample.file_path, cv2.IMREAD_GRAYSCALE) for sample in samples]
+    gt_texts = [sample.gt_text for sample in samples]
+    gt_labels = None
+    if all(sample.label_ids is not None for sample in samples):
+        gt_labels = [sample.label_ids for sample in samples]
+    return Batch(imgs, gt_texts, len(imgs), None, gt_labels)
 
 class DataLoaderIAM:
     """
@@ -28,15 +58,26 @@ class DataLoaderIAM:
         validation_words: list
             Слова з пакету, які будуть використані для валідації.
         char_list: list
-            Посортований список усіх символів в наборі даних для розпізнавання.
+            Список символів моделі з маніфесту (посортовані символи набору з пропуском на початку),
+            за яким закодовано label_ids зразків.
+        manifest: Manifest
+            Кешований опис зразків з мітками, закодованими мітками та розмірами.
+        bucket_widths: list
+            Межі кошиків ширини (після масштабування до висоти img_height); якщо задано,
+            навчальні пакети складаються зі зразків подібної ширини.
+        img_height: int
+            Висота, до якої масштабуються зразки для обчислення ширини.
+        store: ImageStore
+            Сховище попередньо декодованих зображень, якщо його увімкнено.
 
 
 
         Методи
         ------
-        train_set()
+        train_set(int seed, int start_batch)
             Здійснює перемикання екземпляру на роботу з випадково обраним піднабором
-            навчальних даних.
+            навчальних даних; з насінням порядок відтворюваний, тож епоху можна
+            продовжити з пакету start_batch.
 
         validation_set()
             Здійснює перемикання екземпляру на роботу з набором валідації.
@@ -50,46 +91,46 @@ class DataLoaderIAM:
 
         get_next() -> Batch
             Повертає наступний пакет для опрацювання.
+
+        next_samples() -> List[Sample]
+            Повертає зразки наступного пакету без декодування зображень.
+
+        load_samples(List[Sample]) -> Batch
+            Декодує зображення зразків у пакет.
         """
 
     def __init__(self,
                  data_dir: Path,
-                 batch_size: int):
+                 batch_size: int,
+                 bucket_widths: Sequence[int] = None,
+                 img_height: int = 32,
+                 image_store: bool = False):
         assert data_dir.exists()
 
+        self.data_dir = data_dir
         self.curr_idx = 0
         self.batch_size = batch_size
+        self.bucket_widths = sorted(bucket_widths) if bucket_widths else None
+        self.img_height = img_height
         self.samples = []
 
-        f = open(data_dir / 'gt/words.txt')
-        chars = set()
-        bad_samples_reference = ['a01-117-05-02', 'r06-022-03-05']  # відомі зіпсовані зразки в наборі
-        for line in f:
-            # ігнорування пустих та закоментованих рядків
-            line = line.strip()
-            if not line or line[0] == '#':
-                continue
-
-            line_split = line.split(' ')
-            assert len(line_split) >= 9
-
-            # аналіз шляху до файлів
-            file_name_split = line_split[0].split('-')
-            file_name_subdir1 = file_name_split[0]
-            file_name_subdir2 = f'{file_name_split[0]}-{file_name_split[1]}'
-            file_base_name = line_split[0] + '.png'
-            file_name = data_dir / 'img' / file_name_subdir1 / file_name_subdir2 / file_base_name
-
-            if line_split[0] in bad_samples_reference:
-                print('Ignoring known broken image:', file_name)
+        # опис зразків береться з кешу, який перебудовується лише при зміні words.txt
+        self.manifest = Manifest.load(data_dir)
+        img_dir = str(data_dir / 'img')
+        for idx, (sample_id, gt_text, width, height, valid) in enumerate(zip(
+                self.manifest.ids.tolist(), self.manifest.texts.tolist(), self.manifest.widths.tolist(),
+                self.manifest.heights.tolist(), self.manifest.valid.tolist())):
+            # шлях до файлу не будується: Sample виводить його з ідентифікатора на вимогу
+            sample = Sample(gt_text, sample_id, img_dir, width, height, self.manifest.label_ids(idx))
+            if not valid:
+                print('Ignoring known broken image:', sample.file_path)
                 continue
 
-            # Мітки з результатом починаються на 9 рядку
-            gt_text = ' '.join(line_split[8:])
-            chars = chars.union(set(list(gt_text)))
-
             # завантаження зразків у список
-            self.samples.append(Sample(gt_text, file_name))
+            self.samples.append(sample)
+
+        # зображення читаються з одного відображеного в пам'ять файлу замість PNG
+        self.store = ImageStore.open_or_pack(self.samples, data_dir) if image_store else None
 
         # розділення даних на навчання та валідацію
         split_idx = int(0.95 * len(self.samples))
@@ -102,14 +143,56 @@ class DataLoaderIAM:
 
         # починаємо з навчального набору
         self.train_set()
-        self.char_list = sorted(list(chars))
+        self.char_list = self.manifest.char_list
 
-    def train_set(self) -> None:
-        self.curr_idx = 0
-        random.shuffle(self.train_samples)
-        self.samples = self.train_samples
+    def train_set(self, seed: int = None, start_batch: int = 0) -> None:
+        if seed is None:
+            rng = random
+            random.shuffle(self.train_samples)
+            self.samples = self.train_samples
+        else:
+            # порядок залежить лише від насіння, а не від попередніх перемішувань у цьому процесі
+            rng = random.Random(seed)
+            self.samples = sorted(self.train_samples, key=lambda sample: sample.sample_id)
+            rng.shuffle(self.samples)
+        if self.bucket_widths:
+            self.samples = self._bucketed_order(self.samples, rng)
+        self.curr_idx = start_batch * self.batch_size
         self.curr_set = 'train'
 
+    def _bucket_idx(self, sample: Sample) -> int:
+        """Індекс найменшого кошика, у який вміщається зразок після масштабування."""
+        if sample.width <= 0 or sample.height <= 0:
+            return len(self.bucket_widths) - 1
+        scaled_width = sample.width * self.img_height / sample.height
+        for i, bucket_width in enumerate(self.bucket_widths):
+            if scaled_width <= bucket_width:
+                return i
+        return len(self.bucket_widths) - 1
+
+    def _bucketed_order(self, samples: List[Sample], rng: random.Random = random) -> List[Sample]:
+        """
+        Переставити вже перемішані зразки так, щоб кожен пакет складався з одного кошика ширини.
+        Порядок пакетів перемішується, тож кошики чергуються випадково впродовж епохи.
+        """
+        buckets = [[] for _ in self.bucket_widths]
+        for sample in samples:
+            buckets[self._bucket_idx(sample)].append(sample)
+
+        batches = []
+        leftovers = []
+        for bucket in buckets:
+            num_full = len(bucket) // self.batch_size * self.batch_size
+            batches += [bucket[i:i + self.batch_size] for i in range(0, num_full, self.batch_size)]
+            leftovers += bucket[num_full:]
+
+        # залишки кошиків (уже впорядковані за шириною) утворюють змішані пакети;
+        # неповний останній пакет відкидається, як і при звичайному навчанні
+        num_full = len(leftovers) // self.batch_size * self.batch_size
+        batches += [leftovers[i:i + self.batch_size] for i in range(0, num_full, self.batch_size)]
+        rng.shuffle(batches)
+        return [sample for batch in batches for sample in batch]
+
     def validation_set(self) -> None:
         self.curr_idx = 0
         self.samples = self.validation_samples
@@ -129,11 +212,13 @@ class DataLoaderIAM:
         else:
             return self.curr_idx < len(self.samples)
 
-    def get_next(self) -> Batch:
-        batch_range = range(self.curr_idx, min(self.curr_idx + self.batch_size, len(self.samples)))
+    def next_samples(self) -> List[Sample]:
+        samples = self.samples[self.curr_idx:self.curr_idx + self.batch_size]
+        self.curr_idx += self.batch_size
+        return samples
 
-        imgs = [cv2.imread(self.samples[i].file_path, cv2.IMREAD_GRAYSCALE) for i in batch_range]
-        gt_texts = [self.samples[i].gt_text for i in batch_range]
+    def load_samples(self, samples: List[Sample]) -> Batch:
+        return load_batch(samples, self.store)
 
-        self.curr_idx += self.batch_size
-        return Batch(imgs, gt_texts, len(imgs))
\ No newline at end of file
+    def get_next(self) -> Batch:
+        return self.load_samples(self.next_samples())
\ No newline at end of file
@@ -1,11 +1,19 @@
 import json
-from typing import Tuple, List
+import random
+import time
+from typing import Tuple, List, Sequence, Union
 import cv2
 import editdistance
+import numpy as np
 from path import Path
+from batching import group_by_width
 from dataloaderIAM import DataLoaderIAM, Batch
-from model import Model
+from instrumentation import span
+from model import Model, DecoderType
+from pipeline import PrefetchPipeline
 from preprocessor import Preprocessor
+import runtime
+from tflitebackend import TFLiteModel, tflite_path
 
 
 
@@ -23,6 +31,16 @@ class EnglishRecognition:
             Шлях до файлу, куди буде записані сумарні дані щодо навчання на кожній епосі.
         corpus: str
             Шлях до файлу, у якому знаходиться корпус тексту, з якого відбувається навчання.
+        decoderType: int
+            Тип декодера CTC для розпізнавання (DecoderType).
+        beamWidth: int
+            Ширина променя для декодерів з пошуком променем.
+        backend: str
+            Рушій розпізнавання: "tf" - сесія TensorFlow, "tflite" - експортована модель TFLite.
+        variant: str
+            Варіант моделі TFLite (fp32, fp16 або int8).
+        checkpoint: str
+            Файл, зміна якого означає нову версію моделі.
 
 
 
@@ -31,86 +49,146 @@ class EnglishRecognition:
         fileCharList() -> List[str]
             Зчитує дані з файлу з переліком можливих символів
 
-        train(Model, DataLoaderIAM, int)
-            Здійснює навчання моделі на IAM наборі даних.
+        train(Model, DataLoaderIAM, int, int, bool, int)
+            Здійснює навчання моделі на IAM наборі даних, за потреби готуючи пакети у кількох процесах;
+            стан навчання періодично зберігається, тож перерване навчання продовжується з того ж пакету.
 
         validate(Model, DataLoaderIAM) -> Tuple[float, float]
             Здійснює валідацію моделі.
 
+        loadModel(tf.compat.v1.ConfigProto) -> Model | TFLiteModel
+            Створює модель, відновлену із збереженого стану, лише для розпізнавання, з заданими налаштуваннями сесії.
+
         infer(Model, Path) -> List[str]
             Здійснює розпізнавання тексту англійською мовою.
 
+        inferBatch(Model, List[Path | np.ndarray]) -> Tuple[List[str], List[float]]
+            Здійснює розпізнавання пакету зображень, групуючи їх за шириною.
+
         main(dict[str,str]) -> List[str]
             Викликає відповідний метод відповідно до потреби.
     """
 
-    def __init__(self):
+    # крок кошиків ширини (у пікселях після масштабування) та максимальний розмір пакету
+    bucketStep = 64
+    maxBatchSize = 64
+    # кошики ширини для навчання, якщо увімкнено групування зразків за шириною
+    trainBucketWidths = [64, 128, 192, 256]
+
+    def __init__(self, decoderType: int = DecoderType.BestPath, beamWidth: int = 25,
+                 backend: str = "tf", variant: str = "fp32"):
         self.charList = '../model/charList.txt'
         self.summary = '../model/summary.json'
         self.corpus = '../data/corpus.txt'
+        self.decoderType = decoderType
+        self.beamWidth = beamWidth
+        self.backend = backend
+        self.variant = variant
+        self.checkpoint = '../model/checkpoint' if backend == "tf" else tflite_path("English", variant)
 
     def fileCharList(self) -> List[str]:
         with open(self.charList) as f:
             return list(f.read())
 
 
+    @staticmethod
+    def serialBatches(loader: DataLoaderIAM, preprocessor: Preprocessor, seed: int = None, start_batch: int = 0):
+        """Послідовно завантажує й обробляє пакети навчального набору в поточному потоці"""
+        loader.train_set(seed, start_batch)
+        while loader.has_next():
+            iter_info = loader.get_iterator_info()
+            yield iter_info, preprocessor.process_batch(loader.get_next())
+
+
     def train(self, model: Model,
               loader: DataLoaderIAM,
-              early_stopping: int = 25) -> None:
-        epoch = 0  # кількість навчальних епох з початку
-        summary_char_error_rates = []
-        summary_word_accuracies = []
-
-        train_loss_in_epoch = []
-        average_train_loss = []
-
-        preprocessor = Preprocessor((256, 32), data_augmentation=True)
-        best_char_error_rate = float('inf')  # найменша похибка при валідації для символа
-        no_improvement_since = 0  # кількість епох, що від них не відбувається зменшення похибки при валідації
-        # зупинити навчання після досягнення такої кількости епох
-        while True:
-            epoch += 1
-            print('Epoch:', epoch)
-
-            # навчання
-            print('Train NN')
-            loader.train_set()
-            while loader.has_next():
-                iter_info = loader.get_iterator_info()
-                batch = loader.get_next()
-                batch = preprocessor.process_batch(batch)
-                loss = model.train_batch(batch)
-                print(f'Epoch: {epoch} Batch: {iter_info[0]}/{iter_info[1]} Loss: {loss}')
-                train_loss_in_epoch.append(loss)
-
-            # валідація
-            char_error_rate, word_accuracy = self.validate(model, loader)
-
-            # запис звіту
-            summary_char_error_rates.append(char_error_rate)
-            summary_word_accuracies.append(word_accuracy)
-            average_train_loss.append((sum(train_loss_in_epoch)) / len(train_loss_in_epoch))
-            with open(self.summary, 'w') as f:
-                json.dump({'averageTrainLoss': average_train_loss, 'charErrorRates': summary_char_error_rates,
-                           'wordAccuracies': summary_word_accuracies}, f)
-
-            # очистити список навчальних похибок
-            train_loss_in_epoch = []
-
-            # якщо точність валідації найкраща, зберегти модель
-            if char_error_rate < best_char_error_rate:
-                print('Character error rate improved, save model')
-                best_char_error_rate = char_error_rate
-                no_improvement_since = 0
-                model.save()
-            else:
-                print(f'Character error rate not improved, best so far: {best_char_error_rate * 100.0}%')
-                no_improvement_since += 1
-
-            # зупинити навчання за таких умов
-            if no_improvement_since >= early_stopping:
-                print(f'No more improvement for {early_stopping} epochs. Training stopped.')
-                break
+              early_stopping: int = 25,
+              workers: int = 0,
+              resume: bool = True,
+              checkpoint_every: int = 200) -> None:
+        # стан навчання, що зберігається разом зі змінними моделі
+        state = {
+            'epoch': 1,  # поточна епоха, з 1
+            'batch': 0,  # кількість уже навчених пакетів поточної епохи
+            'seed': random.randrange(2 ** 31),  # насіння порядку зразків і аугментації
+            'best_char_error_rate': float('inf'),  # найменша похибка при валідації для символа
+            'no_improvement_since': 0,  # кількість епох, що від них не відбувається зменшення похибки при валідації
+            'char_error_rates': [],
+            'word_accuracies': [],
+            'average_train_loss': [],
+            'train_loss_in_epoch': [],
+        }
+        saved = model.load_state() if resume else None
+        if saved:
+            state.update({key: saved[key] for key in state})
+
+        preprocessor = Preprocessor((256, 32), data_augmentation=True, bucket_widths=loader.bucket_widths)
+
+        # пакети готуються наперед у процесах-працівниках, якщо їх задано
+        pipeline = PrefetchPipeline(loader, preprocessor, workers, seed=state['seed']) if workers > 0 else None
+
+        # процеси і спільна пам'ять конвеєра звільняються і тоді, коли навчання перервано
+        try:
+            # зупинити навчання після досягнення такої кількости епох
+            while True:
+                epoch = state['epoch']
+                print('Epoch:', epoch)
+
+                # навчання; після відновлення епоха продовжується з першого ненавченого пакету
+                print('Train NN')
+                if pipeline:
+                    batches = pipeline.train_epoch(epoch, state['batch'])
+                else:
+                    batches = self.serialBatches(loader, preprocessor, state['seed'] + epoch, state['batch'])
+                epoch_start = time.perf_counter()
+                epoch_samples = 0
+                for iter_info, batch in batches:
+                    loss = model.train_batch(batch)
+                    epoch_samples += batch.batch_size
+                    print(f'Epoch: {epoch} Batch: {iter_info[0]}/{iter_info[1]} Loss: {loss}')
+                    state['train_loss_in_epoch'].append(float(loss))
+                    state['batch'] = iter_info[0]
+                    if state['batch'] % checkpoint_every == 0:
+                        model.save_state(state)
+                print(f'Epoch: {epoch} Samples/sec: {epoch_samples / (time.perf_counter() - epoch_start):.1f}')
+
+                # валідація
+                char_error_rate, word_accuracy = self.validate(model, loader)
+
+                # запис звіту
+                state['char_error_rates'].append(char_error_rate)
+                state['word_accuracies'].append(word_accuracy)
+                train_loss_in_epoch = state['train_loss_in_epoch']
+                state['average_train_loss'].append(sum(train_loss_in_epoch) / max(1, len(train_loss_in_epoch)))
+                with open(self.summary, 'w') as f:
+                    json.dump({'averageTrainLoss': state['average_train_loss'],
+                               'charErrorRates': state['char_error_rates'],
+                               'wordAccuracies': state['word_accuracies']}, f)
+
+                # очистити список навчальних похибок і перейти до наступної епохи
+                state.update(epoch=epoch + 1, batch=0, train_loss_in_epoch=[])
+
+                # якщо точність валідації найкраща, зберегти модель
+                improved = char_error_rate < state['best_char_error_rate']
+                if improved:
+                    print('Character error rate improved, save model')
+                    state['best_char_error_rate'] = char_error_rate
+                    state['no_improvement_since'] = 0
+                else:
+                    print(f'Character error rate not improved, best so far: {state["best_char_error_rate"] * 100.0}%')
+                    state['no_improvement_since'] += 1
+                model.save_state(state, best=improved)
+
+                # зупинити навчання за таких умов
+                if state['no_improvement_since'] >= early_stopping:
+                    print(f'No more improvement for {early_stopping} epochs. Training stopped.')
+                    break
+
+            # завершене навчання не продовжується - наступний запуск почне з найкращого знімка
+            model.clear_state()
+        finally:
+            if pipeline:
+                pipeline.close()
 
 
     def validate(self, model: Model, loader: DataLoaderIAM) -> Tuple[float, float]:
@@ -146,30 +224,74 @@ class EnglishRecognition:
         return char_error_rate, word_accuracy
 
 
-    def infer(self, model: Model, fn_img: Path) -> list:
-        """Розпізнає текст з заданого зображення"""
-        img = cv2.imread(fn_img, cv2.IMREAD_GRAYSCALE)
-        assert img is not None
+    def loadModel(self, sessionConfig=None) -> Model:
+        """Створює відновлену модель для розпізнавання без оптимізатора з заданими налаштуваннями сесії"""
+        with span('english.load_model', backend=self.backend):
+            if self.backend == "tflite":
+                threads = sessionConfig.intra_op_parallelism_threads if sessionConfig else 0
+                return TFLiteModel(self.checkpoint, self.fileCharList(), self.decoderType, self.beamWidth,
+                                   threads or None)
+            return Model(self.fileCharList(), must_restore=True, inference_only=True,
+                         decoder_type=self.decoderType, beam_width=self.beamWidth, session_config=sessionConfig)
 
-        preprocessor = Preprocessor((256, 32), dynamic_width=True, padding=16)
-        img = preprocessor.process_img(img)
 
-        batch = Batch([img], None, 1)
-        recognized, probability = model.infer_batch(batch, True)
+    def infer(self, model: Model, fn_img: Path) -> list:
+        """Розпізнає текст з заданого зображення"""
+        recognized, probability = self.inferBatch(model, [fn_img])
         print(f'Recognized: "{recognized[0]}"')
         print(f'Probability: {probability[0]}')
         return recognized
 
 
+    def inferBatch(self, model: Model, items: Sequence[Union[Path, np.ndarray]],
+                   calc_probability: bool = True, char_confidence: bool = False) -> Tuple[List[str], list]:
+        """
+        Розпізнає текст з кількох зображень (шляхів або масивів у відтінках сірого).
+
+        Зображення динамічної ширини групуються у кошики за шириною, кожна група
+        обробляється препроцесором в один суцільний масив і одним викликом мережі зі
+        справжньою довжиною послідовності кожного зразка. Результати повертаються у порядку входу.
+        Якщо char_confidence, замість ймовірності тексту повертається список упевненостей
+        для кожного символу.
+        """
+        preprocessor = Preprocessor((256, 32), dynamic_width=True, padding=16)
+        if self.backend == "tflite":
+            # експортована мережа має фіксовану ширину входу
+            preprocessor = Preprocessor(model.img_size)
+        imgs = []
+        with span('english.load_images', count=len(items)):
+            for item in items:
+                img = item if isinstance(item, np.ndarray) else cv2.imread(item, cv2.IMREAD_GRAYSCALE)
+                assert img is not None
+                if img.ndim == 3:
+                    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+                imgs.append(img)
+
+        texts = [''] * len(imgs)
+        probs = [None] * len(imgs)
+        widths = [preprocessor.target_width(img) for img in imgs]
+        for group in group_by_width(widths, self.bucketStep, self.maxBatchSize):
+            batch = preprocessor.process_batch(Batch([imgs[i] for i in group], None, len(group)))
+            recognized, probability = model.infer_batch(batch, calc_probability, char_confidence)
+            for j, i in enumerate(group):
+                texts[i] = recognized[j]
+                if calc_probability:
+                    probs[i] = probability[j].tolist() if char_confidence else float(probability[j])
+        return texts, probs
+
+
     def main(self, args):
+        # профіль виконання (потоки, grappler, XLA) для сесії цього запуску
+        config = runtime.apply(runtime.get_profile(args.get("profile", "default"), "English"))
+
         # варіант навчання моделі
         if args["mode"] == 'train':
-            loader = DataLoaderIAM(args["data_dir"], args["batch_size"])
+            bucket_widths = self.trainBucketWidths if args.get("bucketed") else None
+            loader = DataLoaderIAM(args["data_dir"], args["batch_size"], bucket_widths=bucket_widths,
+                                   image_store=args.get("image_store", False))
 
-            # переконатися, що пробіл є в списку символів
+            # список символів маніфесту вже містить пробіл; закодовані мітки зразків відповідають саме йому
             char_list = loader.char_list
-            if ' ' not in char_list:
-                char_list = [' '] + char_list
 
             # зберегти список символів і слів
             with open(self.charList, 'w') as f:
@@ -178,22 +300,23 @@ class EnglishRecognition:
             with open(self.corpus, 'w') as f:
                 f.write(' '.join(loader.train_words + loader.validation_words))
 
-            model = Model(char_list)
-            self.train(model, loader, early_stopping=args["early_stopping"])
+            model = Model(char_list, session_config=config)
+            self.train(model, loader, early_stopping=args["early_stopping"], workers=args.get("workers", 0),
+                       resume=args.get("resume", True))
 
         # оцінка навчання - валідація результатів
         elif args["mode"] == 'validate':
-            loader = DataLoaderIAM(args["data_dir"], args["batch_size"])
-            model = Model(self.fileCharList(), must_restore=True)
+            loader = DataLoaderIAM(args["data_dir"], args["batch_size"], image_store=args.get("image_store", False))
+            model = self.loadModel(config)
             self.validate(model, loader)
 
         # розпізнавання тексту на тестовому зображенні
         elif args["mode"] == 'infer':
-            model = Model(self.fileCharList(), must_restore=True)
+            model = self.loadModel(config)
             recognized = self.infer(model, args["img_file"])
             return recognized
 
 
 if __name__ == '__main__':
     obj = EnglishRecognition()
-    obj.main({"mode":"infer","img_file":"C:\\Users\\LEGION\\Desktop\\Coursework\\Kursova0\\data\\word.png"})
\ No newline at end of file
+    obj.main({"mode":"infer","img_file":"../data/word.png"})
\ No newline at end of file
@@ -0,0 +1,127 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from sqlalchemy import select
+
+from database import Record, matchExpression, recordsFts
+
+
+class HistoryModel(QAbstractTableModel):
+    """
+        Модель таблиці історії, що читає записи з бази даних сторінками.
+
+        Записи впорядковані від новіших до старіших. Кожна сторінка вибирається за ключем
+        (id менший за останній завантажений) по первинному ключу, тому її вартість не залежить
+        від того, наскільки далеко прокручено таблицю. Представлення саме просить наступну
+        сторінку через canFetchMore/fetchMore, коли користувач доходить до кінця.
+
+        Якщо задано пошуковий текст, записи знаходяться через повнотекстовий індекс records_fts
+        і впорядковуються за релевантністю; такі сторінки вибираються зі зміщенням, бо ранг
+        обчислюється під час запиту. Фільтри за мовою і датою застосовуються в обох режимах.
+
+        ---
+
+        Атрибути
+        --------
+        engine: sqlalchemy.engine.base.Engine
+            Рушій для підключення бази даних.
+        pageSize: int
+            Кількість записів, що вибираються за один запит.
+        headers: str[]
+            Заголовки колонок таблиці.
+        searchText: str
+            Текст для повнотекстового пошуку; порожній - показувати всі записи.
+        language: str
+            Мова записів або None для всіх мов.
+        dateFrom: datetime.date
+            Найраніша дата записів або None.
+
+        Методи
+        ------
+        refresh()
+            Скидає завантажені записи і вибирає першу сторінку заново.
+        setFilter(str searchText, str language, datetime.date dateFrom)
+            Задає пошук і фільтри та оновлює таблицю.
+        query() -> sqlalchemy.sql.Select
+            Повертає запит до записів з урахуванням пошуку і фільтрів без обмеження кількості.
+        recordId(int row) -> int
+            Повертає первинний ключ запису в рядку таблиці.
+    """
+
+    headers = ["Id", "Date", "File", "Language", "Coding", "Result"]
+    columns = [Record.id, Record.date, Record.file, Record.language, Record.coding, Record.result]
+
+    def __init__(self, engine, pageSize=200, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.pageSize = pageSize
+        self.rows = []
+        self.exhausted = False
+        self.searchText = ""
+        self.language = None
+        self.dateFrom = None
+
+    def setFilter(self, searchText, language=None, dateFrom=None):
+        self.searchText = searchText.strip()
+        self.language = language
+        self.dateFrom = dateFrom
+        self.refresh()
+
+    def refresh(self):
+        self.beginResetModel()
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def query(self):
+        query = select(*self.columns)
+        if self.language:
+            query = query.where(Record.language == self.language)
+        if self.dateFrom:
+            query = query.where(Record.date >= self.dateFrom)
+        if not self.searchText:
+            return query.order_by(Record.id.desc())
+
+        # rank у FTS5 - це bm25, менше значення означає кращий збіг
+        return (query.join(recordsFts, recordsFts.c.rowid == Record.id)
+                .where(recordsFts.c.records_fts.op("MATCH")(matchExpression(self.searchText)))
+                .order_by(recordsFts.c.rank, Record.id.desc()))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return str(self.rows[index.row()][index.column()])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        query = self.query()
+        if self.searchText:
+            query = query.offset(len(self.rows))
+        elif self.rows:
+            # вибірка за ключем: продовжити після останнього завантаженого запису
+            query = query.where(Record.id < self.rows[-1][0])
+        with self.engine.connect() as connection:
+            page = connection.execute(query.limit(self.pageSize)).all()
+
+        self.exhausted = len(page) < self.pageSize
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(tuple(row) for row in page)
+            self.endInsertRows()
+
+    def recordId(self, row):
+        return self.rows[row][0]
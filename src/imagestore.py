@@ -0,0 +1,108 @@
+import hashlib
+import os
+import sys
+from typing import Optional
+
+import cv2
+import numpy as np
+from path import Path
+
+
+class ImageStore:
+    """
+        Сховище попередньо декодованих зображень IAM у відтінках сірого.
+
+        Усі зображення записані одне за одним в один файл uint8, який відображається в пам'ять;
+        окремий індекс зберігає зміщення та розмір кожного зразка. Зображення повертаються як
+        вигляд на відображений файл без копіювання і без повторного декодування PNG.
+
+        ---
+
+        Атрибути
+        --------
+        blob : np.memmap
+            Відображений у пам'ять файл з пікселями всіх зображень.
+        index : dict
+            Відповідність ідентифікатора зразка до (зміщення, висота, ширина).
+
+        Методи
+        ------
+        pack(List[Sample] samples, Path data_dir) -> ImageStore
+            Одноразово декодує зображення зразків і записує сховище.
+        open_or_pack(List[Sample] samples, Path data_dir) -> ImageStore
+            Відкриває наявне сховище, якщо воно запаковане з тих самих зразків, або створює його заново.
+        samples_digest(List[Sample] samples) -> str
+            Обчислює відбиток набору зразків, з якого запаковано сховище.
+        get(str sample_id) -> np.ndarray
+            Повертає зображення зразка або None, якщо його немає у сховищі.
+    """
+
+    blob_name = 'img.bin'
+    index_name = 'img-index.npz'
+
+    def __init__(self, data_dir: Path):
+        index = np.load(data_dir / self.index_name)
+        self.index = {sample_id: (offset, height, width) for sample_id, offset, height, width in
+                      zip(index['ids'].tolist(), index['offsets'].tolist(),
+                          index['heights'].tolist(), index['widths'].tolist())}
+        # порожній файл не можна відобразити в пам'ять
+        size = os.path.getsize(data_dir / self.blob_name)
+        self.blob = np.zeros(0, np.uint8)
+        if size:
+            self.blob = np.memmap(data_dir / self.blob_name, dtype=np.uint8, mode='r', shape=(size,))
+
+    @classmethod
+    def pack(cls, samples: list, data_dir: Path) -> 'ImageStore':
+        ids, offsets, heights, widths = [], [], [], []
+        offset = 0
+        with open(data_dir / cls.blob_name, 'wb') as f:
+            for sample in samples:
+                img = cv2.imread(sample.file_path, cv2.IMREAD_GRAYSCALE)
+                # пошкоджені файли не потрапляють у сховище
+                if img is None:
+                    print('Ignoring broken image:', sample.file_path)
+                    continue
+                f.write(np.ascontiguousarray(img).tobytes())
+                ids.append(sample.sample_id)
+                offsets.append(offset)
+                heights.append(img.shape[0])
+                widths.append(img.shape[1])
+                offset += img.size
+
+        # індекс записується останнім, тож перерване пакування не дає неповного сховища
+        np.savez(data_dir / cls.index_name, ids=np.array(ids), offsets=np.array(offsets, dtype=np.int64),
+                 heights=np.array(heights, dtype=np.int32), widths=np.array(widths, dtype=np.int32),
+                 samples=cls.samples_digest(samples))
+        return cls(data_dir)
+
+    @staticmethod
+    def samples_digest(samples: list) -> str:
+        digest = hashlib.sha1()
+        for sample in samples:
+            digest.update(f'{sample.sample_id}\t{sample.gt_text}\n'.encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def open_or_pack(cls, samples: list, data_dir: Path) -> 'ImageStore':
+        if os.path.exists(data_dir / cls.index_name):
+            with np.load(data_dir / cls.index_name) as index:
+                packed = str(index['samples']) if 'samples' in index else None
+            # після зміни набору даних старе сховище повертало б None або чужі пікселі
+            if packed == cls.samples_digest(samples):
+                return cls(data_dir)
+            print('Sample set changed, repacking images')
+        print('Packing images into', data_dir / cls.blob_name)
+        return cls.pack(samples, data_dir)
+
+    def get(self, sample_id: str) -> Optional[np.ndarray]:
+        if sample_id not in self.index:
+            return None
+        offset, height, width = self.index[sample_id]
+        return self.blob[offset:offset + height * width].reshape(height, width)
+
+
+if __name__ == '__main__':
+    from dataloaderIAM import DataLoaderIAM
+    data_dir = Path(sys.argv[1])
+    loader = DataLoaderIAM(data_dir, 1)
+    ImageStore.pack(loader.train_samples + loader.validation_samples, data_dir)
@@ -0,0 +1,260 @@
+import bisect
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from contextlib import nullcontext
+from functools import wraps
+from typing import Callable, Dict, List, Sequence
+
+# resource є лише в POSIX; на Windows пікове RSS не вимірюється
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SpanRecord = namedtuple('SpanRecord', 'name, seconds, peak_rss, peak_traced, labels')
+
+# вимкнений інструментарій повертає один і той самий порожній контекст, тож span() коштує один виклик
+_DISABLED = nullcontext()
+_sinks: List['Sink'] = []
+_trace_memory = False
+_local = threading.local()
+
+
+def peak_rss() -> int:
+    """Найбільший резидентний обсяг пам'яті процесу з його запуску в байтах або None."""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux повертає кілобайти, macOS - байти
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+class Sink(ABC):
+    """Приймач вимірювань; record викликається з потоку, у якому завершився етап."""
+
+    @abstractmethod
+    def record(self, span: SpanRecord) -> None:
+        ...
+
+
+class LogSink(Sink):
+    """
+        Друкує кожен завершений етап одним рядком.
+
+        Атрибути
+        --------
+        stream : TextIO
+            Потік, у який друкуються рядки.
+    """
+
+    def __init__(self, stream=None) -> None:
+        self.stream = stream
+
+    def record(self, span: SpanRecord) -> None:
+        parts = [f'{span.name}: {1000 * span.seconds:.2f} ms']
+        if span.peak_rss is not None:
+            parts.append(f'peak rss {span.peak_rss / 1024 ** 2:.1f} MB')
+        if span.peak_traced is not None:
+            parts.append(f'peak traced {span.peak_traced / 1024 ** 2:.1f} MB')
+        parts.extend(f'{key}={value}' for key, value in span.labels.items())
+        print(', '.join(parts), file=self.stream or sys.stderr)
+
+
+class HistogramSink(Sink):
+    """
+        Накопичує в пам'яті гістограму тривалості кожного етапу і пікову пам'ять.
+
+        Межі кошиків однакові для всіх етапів, як у гістограмах Prometheus, тож перцентилі
+        оцінюються за кошиками без зберігання окремих вимірювань.
+
+        Атрибути
+        --------
+        buckets : Sequence[float]
+            Верхні межі кошиків у секундах, за зростанням.
+        stages : Dict[str, dict]
+            Для кожного етапу: кількість у кошиках, кількість, сума секунд, пікова пам'ять.
+
+        Методи
+        ------
+        percentile(str name, float q) -> float
+            Оцінка перцентиля q (0-100) тривалості етапу в секундах - верхня межа кошика.
+        summary() -> dict
+            Кількість, середнє, p50/p95/p99 у мілісекундах і пікова пам'ять кожного етапу.
+        reset()
+            Видаляє накопичені вимірювання.
+    """
+
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+    def __init__(self, buckets: Sequence[float] = BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        if self.buckets[-1] != float('inf'):
+            self.buckets += (float('inf'),)
+        self.stages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, span: SpanRecord) -> None:
+        with self._lock:
+            stage = self.stages.get(span.name)
+            if stage is None:
+                stage = self.stages[span.name] = {'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                                                  'peak_rss': 0, 'peak_traced': 0}
+            stage['buckets'][bisect.bisect_left(self.buckets, span.seconds)] += 1
+            stage['count'] += 1
+            stage['sum'] += span.seconds
+            stage['peak_rss'] = max(stage['peak_rss'], span.peak_rss or 0)
+            stage['peak_traced'] = max(stage['peak_traced'], span.peak_traced or 0)
+
+    def percentile(self, name: str, q: float) -> float:
+        stage = self.stages[name]
+        rank = q / 100 * stage['count']
+        seen = 0
+        for bound, count in zip(self.buckets, stage['buckets']):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return self.buckets[-1]
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {name: {'count': stage['count'], 'mean_ms': 1000 * stage['sum'] / stage['count'],
+                           'p50_ms': 1000 * self.percentile(name, 50), 'p95_ms': 1000 * self.percentile(name, 95),
+                           'p99_ms': 1000 * self.percentile(name, 99),
+                           'peak_rss_mb': stage['peak_rss'] / 1024 ** 2,
+                           'peak_traced_mb': stage['peak_traced'] / 1024 ** 2}
+                    for name, stage in self.stages.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+
+
+class PrometheusSink(HistogramSink):
+    """
+        Гістограма, що віддається у текстовому форматі Prometheus.
+
+        Методи
+        ------
+        dump(str path = None) -> str
+            Повертає текст метрик і, якщо задано path, атомарно записує його у файл
+            (для textfile collector у node_exporter).
+    """
+
+    def __init__(self, buckets: Sequence[float] = HistogramSink.BUCKETS, prefix: str = 'htr') -> None:
+        super().__init__(buckets)
+        self.prefix = prefix
+
+    def dump(self, path: str = None) -> str:
+        name = self.prefix + '_stage_seconds'
+        lines = [f'# HELP {name} Duration of recognition stages.', f'# TYPE {name} histogram']
+        memory = [f'# HELP {self.prefix}_stage_peak_rss_bytes Peak resident memory observed at the end of a stage.',
+                  f'# TYPE {self.prefix}_stage_peak_rss_bytes gauge']
+        with self._lock:
+            for stage_name, stage in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, stage['buckets']):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{name}_bucket{{stage="{stage_name}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{stage="{stage_name}"}} {stage["sum"]}')
+                lines.append(f'{name}_count{{stage="{stage_name}"}} {stage["count"]}')
+                memory.append(f'{self.prefix}_stage_peak_rss_bytes{{stage="{stage_name}"}} {stage["peak_rss"]}')
+        text = '\n'.join(lines + memory) + '\n'
+        if path:
+            with open(path + '.tmp', 'w') as f:
+                f.write(text)
+            os.replace(path + '.tmp', path)
+        return text
+
+
+class Span:
+    """
+        Вимірювання одного етапу: тривалість, пікове RSS процесу і, якщо увімкнено
+        tracemalloc, пік виділеної Python-пам'яті всередині етапу.
+
+        Вкладені етапи в одному потоці підтримуються: пік вкладеного враховується і в зовнішньому.
+        tracemalloc спільний для процесу, тож для паралельних потоків пік наближений.
+    """
+
+    __slots__ = ('name', 'labels', 'start', 'peak_traced')
+
+    def __init__(self, name: str, labels: dict) -> None:
+        self.name = name
+        self.labels = labels
+        self.peak_traced = 0
+
+    def __enter__(self) -> 'Span':
+        if _trace_memory:
+            stack = _local.__dict__.setdefault('stack', [])
+            if stack:
+                stack[-1].peak_traced = max(stack[-1].peak_traced, tracemalloc.get_traced_memory()[1])
+            stack.append(self)
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        seconds = time.perf_counter() - self.start
+        peak_traced = None
+        if _trace_memory:
+            peak_traced = max(self.peak_traced, tracemalloc.get_traced_memory()[1])
+            stack = _local.stack
+            stack.pop()
+            if stack:
+                stack[-1].peak_traced = max(stack[-1].peak_traced, peak_traced)
+        record = SpanRecord(self.name, seconds, peak_rss(), peak_traced, self.labels)
+        for sink in _sinks:
+            sink.record(record)
+
+
+def span(name: str, **labels):
+    """
+    Контекст вимірювання етапу name. Поки немає приймачів, повертає порожній контекст
+    без жодних вимірювань, тож виклики можна лишати в гарячому коді.
+    """
+    if not _sinks:
+        return _DISABLED
+    return Span(name, labels)
+
+
+def timed(name: str) -> Callable:
+    """Декоратор, що вимірює кожен виклик функції як етап name."""
+    def decorator(fn: Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable(*sinks: Sink, trace_memory: bool = False) -> None:
+    """
+    Додати приймачі вимірювань. Якщо trace_memory, запускається tracemalloc і для кожного
+    етапу записується пік виділеної Python-пам'яті; це помітно сповільнює код.
+    """
+    global _trace_memory
+    _sinks.extend(sinks)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _trace_memory = trace_memory or _trace_memory
+
+
+def disable() -> None:
+    """Видалити всі приймачі і зупинити tracemalloc, запущений через enable."""
+    global _trace_memory
+    _sinks.clear()
+    if _trace_memory:
+        tracemalloc.stop()
+    _trace_memory = False
+
+
+def enabled() -> bool:
+    return bool(_sinks)
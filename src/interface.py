@@ -3,6 +3,9 @@ from PyQt6.QtWidgets import *
 from pathlib import Path
 from scrolllabel import ScrollLabel
 from solution import Solution
+from worker import RecognitionWorker
+from historymodel import HistoryModel
+from resultcache import ResultCache
 from database import *
 from sqlalchemy.orm import sessionmaker
 class MainWindow(QMainWindow):
@@ -19,6 +22,10 @@ class MainWindow(QMainWindow):
             Сесія підключення до бази даних.
         solution: solution.Solution
             Екземпляр функціонального класу розв'язку.
+        resultCache: resultcache.ResultCache
+            Кеш результатів розпізнавання за вмістом зображення.
+        worker: worker.RecognitionWorker
+            Фоновий потік розпізнавання тексту.
         stackedWidget: QStackedWidget
             Віджет для можливості багатосторінковости одного вікна.
         firstPageWidget: QWidget
@@ -33,6 +40,12 @@ class MainWindow(QMainWindow):
             Радіокнопка для вибору ASCII як параметру кодування тексту для запису у файл.
         utfCoding: QRadioButton
             Радіокнопка для вибору UTF-8 як параметру кодування тексту для запису у файл.
+        progressBar: QProgressBar
+            Індикатор виконання поточного розпізнавання.
+        progressLabel: QLabel
+            Текстова мітка з етапом розпізнавання або станом черги.
+        cancelButton: QPushButton
+            Кнопка скасування поставлених розпізнавань.
         secondPageWigdet: QWidget
             Віджет другої сторінки програми - перегляд результату.
         filename2: QLabel
@@ -53,8 +66,18 @@ class MainWindow(QMainWindow):
             Вікно з повідомленням про збереження.
         historyPageWidget: QWidget
             Віджет сторінки історії - перегляд попередніх записів.
-        tableWidget: QTableWidget
-            Віджет таблиці з попередніми розпізнаваннями, записаними в базу даних.
+        historyModel: historymodel.HistoryModel
+            Модель записів історії, що завантажуються сторінками.
+        tableView: QTableView
+            Таблиця з попередніми розпізнаваннями, записаними в базу даних.
+        searchEdit: QLineEdit
+            Поле повнотекстового пошуку в історії.
+        searchLanguage: QComboBox
+            Фільтр історії за мовою розпізнавання.
+        searchPeriod: QComboBox
+            Фільтр історії за датою розпізнавання.
+        searchTimer: QTimer
+            Таймер, що запускає пошук після паузи у введенні.
 
 
         Методи
@@ -69,22 +92,36 @@ class MainWindow(QMainWindow):
             Ініціалізація сторінки історії програми.
         openFileDialog(int page)
             Взаємодія з файловою системою для роботи з читанням\записом файлу.
+        closeEvent(QCloseEvent event)
+            Зупинка фонового потоку розпізнавання під час закриття вікна.
     """
 
     def __init__(self):
         super().__init__()
 
         self.engine = create_engine('sqlite:///htr.db', echo=True)
-        Base.metadata.create_all(self.engine)
+        setupDatabase(self.engine)
         Session = sessionmaker(bind=self.engine)
         self.session = Session()
 
         self.setWindowTitle("Handwritten to Printed Text Conversion")
         self.solution = Solution(self)
+
+        # розпізнавання виконується у фоновому потоці, щоб вікно не зависало
+        self.resultCache = ResultCache(self.engine)
+        self.worker = RecognitionWorker(self.resultCache, self)
+        self.worker.jobProgress.connect(self.solution.onJobProgress)
+        self.worker.jobFinished.connect(self.solution.onJobFinished)
+        self.worker.jobFailed.connect(self.solution.onJobFailed)
+        self.worker.queueChanged.connect(self.solution.onQueueChanged)
+        self.worker.start()
+
         self.firstPageInitialize()
         self.secondPageInitialize()
         self.thirdPageInitialize()
         self.historyPageInitialize()
+        # модель мови за замовчуванням завантажується, поки користувач вибирає файл
+        self.worker.warmUp(self.ukrLang.isChecked())
 
         self.stackedWidget = QStackedWidget()
         self.stackedWidget.addWidget(self.firstPageWidget)
@@ -157,15 +194,34 @@ class MainWindow(QMainWindow):
         parametersLayout.addLayout(langLayout)
         parametersLayout.addLayout(codingLayout)
 
+        # режим сторінки: зображення розбивається на рядки і слова
+        self.pageMode = QCheckBox("Whole page")
+        self.pageMode.setToolTip("Split a scanned page into lines and words before recognition")
+
         continue0Button = QPushButton("Continue")
         continue0Button.clicked.connect(self.solution.getParameters)
 
+        # стан фонового розпізнавання
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressLabel = QLabel()
+        self.cancelButton = QPushButton("Cancel")
+        self.cancelButton.setEnabled(False)
+        self.cancelButton.clicked.connect(self.solution.cancelRecognition)
+
+        progressLayout = QHBoxLayout()
+        progressLayout.addWidget(self.progressBar)
+        progressLayout.addWidget(self.cancelButton)
+
         outerLayout = QVBoxLayout()
         outerLayout.addWidget(fileLabel)
         outerLayout.addLayout(browseLayout)
         outerLayout.addWidget(conversionLabel)
         outerLayout.addLayout(parametersLayout)
+        outerLayout.addWidget(self.pageMode)
         outerLayout.addWidget(continue0Button)
+        outerLayout.addLayout(progressLayout)
+        outerLayout.addWidget(self.progressLabel)
 
         self.firstPageWidget.setLayout(outerLayout)
 
@@ -247,10 +303,40 @@ class MainWindow(QMainWindow):
         historyLabel = QLabel()
         historyLabel.setText("Conversion history:")
 
-        self.tableWidget = QTableWidget()
+        # пошук і фільтри історії
+        self.searchEdit = QLineEdit()
+        self.searchEdit.setPlaceholderText("Search results...")
+        self.searchLanguage = QComboBox()
+        self.searchLanguage.addItems(["All languages", "English", "Ukrainian"])
+        self.searchPeriod = QComboBox()
+        self.searchPeriod.addItems(["Any time", "Today", "Last 7 days", "Last 30 days", "Last year"])
+
+        # пошук запускається, коли користувач перестає друкувати
+        self.searchTimer = QTimer()
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(250)
+        self.searchTimer.timeout.connect(self.solution.historySearch)
+        self.searchEdit.textChanged.connect(self.searchTimer.start)
+        self.searchLanguage.currentIndexChanged.connect(self.solution.historySearch)
+        self.searchPeriod.currentIndexChanged.connect(self.solution.historySearch)
+
+        searchLayout = QHBoxLayout()
+        searchLayout.addWidget(self.searchEdit)
+        searchLayout.addWidget(self.searchLanguage)
+        searchLayout.addWidget(self.searchPeriod)
+
+        # записи підвантажуються сторінками під час прокручування
+        self.historyModel = HistoryModel(self.engine)
+        self.tableView = QTableView()
+        self.tableView.setModel(self.historyModel)
+        self.tableView.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.tableView.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.tableView.doubleClicked.connect(self.solution.getItem)
+
         outerLayout = QVBoxLayout()
         outerLayout.addWidget(historyLabel)
-        outerLayout.addWidget(self.tableWidget)
+        outerLayout.addLayout(searchLayout)
+        outerLayout.addWidget(self.tableView)
 
         self.historyPageWidget.setLayout(outerLayout)
 
@@ -278,5 +364,7 @@ class MainWindow(QMainWindow):
                 path = Path(filename)
                 self.saveFile.setText(str(path))
 
-
-
+    def closeEvent(self, event):
+        # дочекатися завершення поточного розпізнавання перед виходом
+        self.worker.stop()
+        super().closeEvent(event)
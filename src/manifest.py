@@ -0,0 +1,132 @@
+import hashlib
+import os
+
+import numpy as np
+from path import Path
+
+# відомі зіпсовані зразки в наборі
+BAD_SAMPLES = ['a01-117-05-02', 'r06-022-03-05']
+
+
+class Manifest:
+    """
+        Кешований опис зразків IAM, побудований з gt/words.txt.
+
+        Розбір words.txt виконується один раз; результат зберігається у двійковому файлі
+        gt/words.manifest.npz і перебудовується, лише коли змінюється words.txt (перевіряються
+        час зміни і розмір, а за їх розбіжності - хеш вмісту).
+
+        ---
+
+        Атрибути
+        --------
+        ids : np.ndarray
+            Ідентифікатори зразків у порядку words.txt.
+        texts : np.ndarray
+            Мітки (текст) зразків.
+        char_list : list
+            Список символів моделі: посортовані символи міток з пропуском на початку (модель
+            розпізнає й рядки, тож пропуск потрібен завжди); за ним закодовано label_values.
+        label_offsets : np.ndarray
+            Зміщення закодованої мітки кожного зразка в label_values (довжина - кількість зразків + 1).
+        label_values : np.ndarray
+            Закодовані мітки всіх зразків (індекси в char_list) одним масивом.
+        widths : np.ndarray
+            Ширина обмежувальної рамки слова (-1, якщо невідома).
+        heights : np.ndarray
+            Висота обмежувальної рамки слова (-1, якщо невідома).
+        valid : np.ndarray
+            False для відомих зіпсованих зразків.
+        segmentation_ok : np.ndarray
+            True, якщо сегментація слова в words.txt позначена як ok.
+
+        Методи
+        ------
+        load(Path data_dir) -> Manifest
+            Завантажує кешований опис або будує його з words.txt.
+        label_ids(int idx) -> np.ndarray
+            Повертає закодовану мітку зразка (вигляд на label_values без копіювання).
+    """
+
+    file_name = 'gt/words.manifest.npz'
+    # змінюється разом зі складом або кодуванням масивів, щоб старий кеш перебудувався
+    version = 2
+
+    def __init__(self, arrays: dict):
+        self.ids = arrays['ids']
+        self.texts = arrays['texts']
+        self.char_list = arrays['char_list'].tolist()
+        self.label_offsets = arrays['label_offsets']
+        self.label_values = arrays['label_values']
+        self.widths = arrays['widths']
+        self.heights = arrays['heights']
+        self.valid = arrays['valid']
+        self.segmentation_ok = arrays['segmentation_ok']
+
+    @classmethod
+    def load(cls, data_dir: Path) -> 'Manifest':
+        words_path = data_dir / 'gt/words.txt'
+        manifest_path = data_dir / cls.file_name
+        stat = os.stat(words_path)
+
+        if os.path.exists(manifest_path):
+            with np.load(manifest_path) as cached:
+                arrays = dict(cached)
+            # кеш старішого формату перебудовується
+            if int(arrays.get('version', 0)) == cls.version:
+                if arrays['mtime_ns'] == stat.st_mtime_ns and arrays['size'] == stat.st_size:
+                    return cls(arrays)
+                # час зміни міг змінитися без зміни вмісту (наприклад, після копіювання)
+                if arrays['size'] == stat.st_size and str(arrays['sha1']) == cls._hash(words_path):
+                    arrays['mtime_ns'] = stat.st_mtime_ns
+                    np.savez(manifest_path, **arrays)
+                    return cls(arrays)
+
+        print('Building sample manifest from', words_path)
+        arrays = cls._build(words_path)
+        arrays.update(version=cls.version, mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha1=cls._hash(words_path))
+        np.savez(manifest_path, **arrays)
+        return cls(arrays)
+
+    @staticmethod
+    def _hash(words_path: Path) -> str:
+        with open(words_path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+
+    @staticmethod
+    def _build(words_path: Path) -> dict:
+        ids, texts, widths, heights, segmentation_ok = [], [], [], [], []
+        with open(words_path) as f:
+            for line in f:
+                # ігнорування пустих та закоментованих рядків
+                line = line.strip()
+                if not line or line[0] == '#':
+                    continue
+
+                line_split = line.split(' ')
+                assert len(line_split) >= 9
+
+                ids.append(line_split[0])
+                segmentation_ok.append(line_split[1] == 'ok')
+                widths.append(int(line_split[5]))
+                heights.append(int(line_split[6]))
+                # Мітки з результатом починаються на 9 рядку
+                texts.append(' '.join(line_split[8:]))
+
+        valid = [sample_id not in BAD_SAMPLES for sample_id in ids]
+        char_list = sorted(set(''.join(text for text, ok in zip(texts, valid) if ok)))
+        # мітки кодуються за списком символів моделі, а не за символами самого набору
+        if ' ' not in char_list:
+            char_list = [' '] + char_list
+        char_idx = {c: i for i, c in enumerate(char_list)}
+        label_values = np.array([char_idx.get(c, -1) for text in texts for c in text], dtype=np.int32)
+        label_offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        label_offsets[1:] = np.cumsum([len(text) for text in texts])
+
+        return {'ids': np.array(ids), 'texts': np.array(texts), 'char_list': np.array(char_list),
+                'label_offsets': label_offsets, 'label_values': label_values,
+                'widths': np.array(widths, dtype=np.int32), 'heights': np.array(heights, dtype=np.int32),
+                'valid': np.array(valid), 'segmentation_ok': np.array(segmentation_ok)}
+
+    def label_ids(self, idx: int) -> np.ndarray:
+        return self.label_values[self.label_offsets[idx]:self.label_offsets[idx + 1]]
@@ -1,14 +1,44 @@
+import glob
+import json
+import os
+import re
 import sys
-from typing import List, Tuple
+import threading
+from typing import List, Sequence, Tuple
 
 import numpy as np
 import tensorflow as tf
 
+import ctc
 from dataloaderIAM import Batch
+from instrumentation import span
+from wordbeamsearch import LanguageModel, WordBeamSearch
 
 # Disable eager mode
 tf.compat.v1.disable_eager_execution()
 
+# контрольна точка і стан перерваного навчання лежать поруч з model/checkpoint
+RESUME_PREFIX = '../model/resume'
+TRAINING_STATE = '../model/training.json'
+
+
+def remove_resume_checkpoints(keep: str = None) -> None:
+    """Remove resume checkpoints (also from earlier runs) except keep, and the index once none are kept."""
+    for path in glob.glob(RESUME_PREFIX + '-*'):
+        if os.path.isfile(path) and (keep is None or os.path.basename(path).split('.')[0] != os.path.basename(keep)):
+            os.remove(path)
+    index = os.path.join(os.path.dirname(RESUME_PREFIX), 'resume_checkpoint')
+    if keep is None and os.path.exists(index):
+        os.remove(index)
+
+
+class DecoderType:
+    """CTC decoder types."""
+    BestPath = 0
+    BeamSearch = 1
+    WordBeamSearch = 2
+
+
 class Model:
     """
         Клас моделі глибокого навчання для розпізнавання рукописного тексту.
@@ -19,12 +49,26 @@ class Model:
             Список можливих символів для розпізнавання.
         must_restore : bool
             Якщо True, модель відновлюється із збереженого стану.
+        inference_only : bool
+            Якщо True, оптимізатор не створюється - модель лише для розпізнавання.
+        decoder_type : int
+            Тип декодера CTC (DecoderType).
+        beam_width : int
+            Ширина променя для декодерів з пошуком променем.
+        input_shape : Tuple[int, int, int]
+            Форма вхідного пакету (B, W, H); фіксована форма потрібна для експорту в TFLite.
+        session_config : tf.compat.v1.ConfigProto
+            Налаштування сесії TensorFlow (кількість потоків тощо) або None для типових.
+        graph : tf.Graph
+            Власний граф моделі, незалежний від графа за замовчуванням.
         snap_ID : int
             Ідентифікатор для збереження стану моделі.
         is_train : tf.Placeholder
-            Вказує, чи використовується модель у режимі тренування.
+            Вказує, чи використовується модель у режимі тренування (за замовчуванням False).
         input_imgs : tf.Placeholder
             Вхідні зображення для обробки моделлю.
+        seq_len : tf.Placeholder
+            Довжина послідовності кожного зображення (за замовчуванням ширина входу / 4).
         batches_trained : int
             Кількість тренувальних пакетів, на яких модель вже навчилася.
         update_ops : list
@@ -35,6 +79,9 @@ class Model:
             Сесія TensorFlow для виконання операцій моделі.
         saver : tf.saver.Saver
             Об'єкт для збереження та відновлення стану моделі.
+        shadow_vars : list
+            Копії всіх змінних графа, з яких контрольні точки пишуться у фоновому потоці,
+            поки навчання змінює оригінали (лише для навчання).
 
         Методи:
         -------
@@ -46,46 +93,83 @@ class Model:
             Налаштування Connectionist Temporal Classification (CTC) для декодування виходу мережі.
         setup_tf()
             Ініціалізація та налаштування сесії TensorFlow.
-        to_sparse(texts: List[str])
-            Перетворення тексту в розріджений тензор для CTC loss.
+        to_sparse(texts: List[str], labels: List[Sequence[int]] = None)
+            Перетворення тексту (або вже закодованих міток) в розріджений тензор для CTC loss.
         decoder_output_to_text(ctc_output: tuple, batch_size: int)
             Конвертує вихід декодера в текст.
         train_batch(batch: Batch)
             Тренування моделі на пакеті даних.
-        infer_batch(batch: Batch, calc_probability: bool = False)
-            Розпізнавання тексту з пакету даних.
+        infer_batch(batch: Batch, calc_probability: bool = False, char_confidence: bool = False)
+            Розпізнавання тексту з пакету даних з оцінкою ймовірності за той самий прохід мережі.
+        infer_nbest(batch: Batch, top_k: int = 5)
+            Розпізнавання тексту з пакету даних з top_k гіпотезами пошуку променем.
         save()
-            Збереження поточного стану моделі.
+            Збереження поточного стану моделі у фоновому потоці.
+        save_state(dict state, bool best)
+            Збереження змінних і стану навчання для продовження перерваного навчання у фоновому потоці.
+        load_state() -> dict | None
+            Відновлення змінних і стану навчання, збережених save_state.
+        clear_state()
+            Видалення стану навчання після його завершення.
+        wait_for_save()
+            Очікування завершення фонового збереження.
+        memory_size() -> int
+            Оцінка обсягу пам'яті, який займають змінні моделі.
+        close()
+            Звільнення сесії TensorFlow.
     """
 
     def __init__(self,
                  charList: List[str],
-                 must_restore: bool = False) -> None:
+                 must_restore: bool = False,
+                 inference_only: bool = False,
+                 decoder_type: int = DecoderType.BestPath,
+                 beam_width: int = 25,
+                 input_shape: Tuple[int, int, int] = (None, None, None),
+                 session_config: tf.compat.v1.ConfigProto = None) -> None:
         """Init model: add CNN, RNN and CTC and initialize TF."""
-        tf.compat.v1.reset_default_graph()
         self.charList = charList
+        self.session_config = session_config
         self.must_restore = must_restore
+        self.inference_only = inference_only
+        self.decoder_type = decoder_type
+        self.beam_width = beam_width
         self.snap_ID = 0
-
-        # Чи використовувати нормалізацію для пакету або популяції
-        self.is_train = tf.compat.v1.placeholder(tf.bool, name='is_train')
-
-        # вхідний пакет зображень
-        self.input_imgs = tf.compat.v1.placeholder(tf.float32, shape=(None, None, None))
-
-        # налаштувати CNN, RNN та CTC
-        self.setup_cnn()
-        self.setup_rnn()
-        self.setup_ctc()
-
-        # налаштувати оптимізатор для навчання NN
-        self.batches_trained = 0
-        self.update_ops = tf.compat.v1.get_collection(tf.compat.v1.GraphKeys.UPDATE_OPS)
-        with tf.control_dependencies(self.update_ops):
-            self.optimizer = tf.compat.v1.train.AdamOptimizer().minimize(self.loss)
-
-        # налаштувати TF
-        self.sess, self.saver = self.setup_tf()
+        self._save_thread = None
+        self._save_error = None
+
+        # кожна модель має власний граф, щоб кілька моделей могли жити в одному процесі
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            # Чи використовувати нормалізацію для пакету або популяції; за замовчуванням - розпізнавання,
+            # тож експортований граф не потребує цього входу
+            self.is_train = tf.compat.v1.placeholder_with_default(False, shape=[], name='is_train')
+
+            # вхідний пакет зображень
+            self.input_imgs = tf.compat.v1.placeholder(tf.float32, shape=input_shape, name='input_imgs')
+
+            # довжина послідовності кожного елемента пакету (ширина зображення / 4);
+            # без явного значення вважається, що всі зображення займають усю ширину
+            input_shape = tf.shape(input=self.input_imgs)
+            self.seq_len = tf.compat.v1.placeholder_with_default(tf.fill([input_shape[0]], input_shape[1] // 4),
+                                                                 shape=[None], name='seq_len')
+
+            # налаштувати CNN, RNN та CTC
+            self.setup_cnn()
+            self.setup_rnn()
+            self.setup_ctc()
+
+            # налаштувати оптимізатор для навчання NN (для розпізнавання він не потрібен)
+            self.batches_trained = 0
+            self.update_ops = tf.compat.v1.get_collection(tf.compat.v1.GraphKeys.UPDATE_OPS)
+            self.optimizer = None
+            if not inference_only:
+                with tf.control_dependencies(self.update_ops):
+                    self.optimizer = tf.compat.v1.train.AdamOptimizer().minimize(self.loss)
+                self.setup_checkpointing()
+
+            # налаштувати TF
+            self.sess, self.saver = self.setup_tf()
 
     def setup_cnn(self) -> None:
         """Create CNN layers."""
@@ -125,8 +209,17 @@ class Model:
 
         # двонапрямлена rnn
         # BxTxF -> BxTx2H
-        (fw, bw), _ = tf.compat.v1.nn.bidirectional_dynamic_rnn(cell_fw=stacked, cell_bw=stacked, inputs=rnn_in3d,
-                                                                dtype=rnn_in3d.dtype)
+        # довжини послідовностей не дають доповненню пакету впливати на зворотний прохід
+        if rnn_in3d.shape[1] is None:
+            (fw, bw), _ = tf.compat.v1.nn.bidirectional_dynamic_rnn(cell_fw=stacked, cell_bw=stacked, inputs=rnn_in3d,
+                                                                    sequence_length=self.seq_len,
+                                                                    dtype=rnn_in3d.dtype)
+        else:
+            # фіксована ширина входу (експорт): розгорнута RNN без циклу while, з тими самими змінними,
+            # бо квантизація TFLite не підтримує цикли графа TF1; кожне зображення займає всю ширину
+            outputs, _, _ = tf.compat.v1.nn.static_bidirectional_rnn(stacked, stacked, tf.unstack(rnn_in3d, axis=1),
+                                                                     dtype=rnn_in3d.dtype)
+            fw, bw = tf.split(tf.stack(outputs, axis=1), 2, axis=2)
 
         # BxTxH + BxTxH -> BxTx2H -> BxTx1X2H
         concat = tf.expand_dims(tf.concat([fw, bw], 2), 2)
@@ -146,27 +239,38 @@ class Model:
                                         tf.compat.v1.placeholder(tf.int64, [2]))
 
         # розрахунок втрат для пакету
-        self.seq_len = tf.compat.v1.placeholder(tf.int32, [None])
         self.loss = tf.reduce_mean(
             input_tensor=tf.compat.v1.nn.ctc_loss(labels=self.gt_texts, inputs=self.ctc_in_3d_tbc,
                                                   sequence_length=self.seq_len,
                                                   ctc_merge_repeated=True))
 
-        # розрахувати втрати для кожного елемента, щоб обчислити ймовірність
-        self.saved_ctc_input = tf.compat.v1.placeholder(tf.float32,
-                                                        shape=[None, None, len(self.charList) + 1])
-        self.loss_per_element = tf.compat.v1.nn.ctc_loss(labels=self.gt_texts, inputs=self.saved_ctc_input,
-                                                         sequence_length=self.seq_len, ctc_merge_repeated=True)
-
-        self.decoder = tf.nn.ctc_greedy_decoder(inputs=self.ctc_in_3d_tbc, sequence_length=self.seq_len)
-
+        # best path: decoding done in TF graph; beam searches: decoding done in NumPy on the RNN output
+        if self.decoder_type == DecoderType.BestPath:
+            self.decoder = tf.nn.ctc_greedy_decoder(inputs=self.ctc_in_3d_tbc, sequence_length=self.seq_len)
+        elif self.decoder_type == DecoderType.WordBeamSearch:
+            self.decoder = WordBeamSearch(LanguageModel.load('../data/corpus.txt', self.charList),
+                                          beam_width=self.beam_width)
+
+
+    def setup_checkpointing(self) -> None:
+        """Create shadow copies of all variables and the savers that write them in the background."""
+        variables = tf.compat.v1.global_variables()
+        # копії не входять у колекції графа, тож основний saver і ініціалізатор їх не бачать
+        self.shadow_vars = [tf.compat.v1.Variable(tf.zeros(v.shape, v.dtype.base_dtype), trainable=False,
+                                                  collections=[], name='shadow/' + v.op.name) for v in variables]
+        self.shadow_copy = tf.group(*[shadow.assign(v) for v, shadow in zip(variables, self.shadow_vars)])
+        # копії зберігаються під іменами оригіналів, тож контрольні точки відновлює звичайний saver
+        var_list = {v.op.name: shadow for v, shadow in zip(variables, self.shadow_vars)}
+        self.snapshot_saver = tf.compat.v1.train.Saver(var_list, max_to_keep=1)
+        # старі контрольні точки продовження видаляє save_state, коли стан уже посилається на нову
+        self.resume_saver = tf.compat.v1.train.Saver(var_list, max_to_keep=None)
 
     def setup_tf(self) -> Tuple[tf.compat.v1.Session, tf.compat.v1.train.Saver]:
         """Initialize TF."""
         print('Python: ' + sys.version)
         print('Tensorflow: ' + tf.__version__)
 
-        sess = tf.compat.v1.Session()  # TF session
+        sess = tf.compat.v1.Session(graph=self.graph, config=self.session_config)  # TF session
 
         saver = tf.compat.v1.train.Saver(max_to_keep=1)  # saver зберігає модель у файл
         model_dir = '../model/'
@@ -180,22 +284,32 @@ class Model:
         if latest_snapshot:
             print('Init with stored values from ' + latest_snapshot)
             saver.restore(sess, latest_snapshot)
+            # нові знімки продовжують нумерацію, а не перезаписують старі з нуля
+            match = re.search(r'-(\d+)$', latest_snapshot)
+            self.snap_ID = int(match.group(1)) if match else 0
         else:
             print('Init with new values')
             sess.run(tf.compat.v1.global_variables_initializer())
 
+        if not self.inference_only:
+            sess.run(tf.compat.v1.variables_initializer(self.shadow_vars))
+
         return sess, saver
 
-    def to_sparse(self, texts: List[str]) -> Tuple[List[List[int]], List[int], List[int]]:
-        """Put ground truth texts into sparse tensor for ctc_loss."""
+    def to_sparse(self, texts: List[str],
+                  labels: List[Sequence[int]] = None) -> Tuple[List[List[int]], List[int], List[int]]:
+        """Put ground truth texts into sparse tensor for ctc_loss; pre-encoded labels are used as is."""
         indices = []
         values = []
         shape = [len(texts), 0]  # останній запис повинен бути max(labelList[i])
 
         # переглянути всі тексти
         for batchElement, text in enumerate(texts):
-            # перетворити в рядок мітки (тобто ідентифікатори класів)
-            label_str = [self.charList.index(c) for c in text]
+            # перетворити в рядок мітки (тобто ідентифікатори класів), якщо її не закодовано заздалегідь
+            if labels is not None:
+                label_str = list(labels[batchElement])
+            else:
+                label_str = [self.charList.index(c) for c in text]
             # sparse tensor повинен мати розмір max. label-string
             if len(label_str) > shape[1]:
                 shape[1] = len(label_str)
@@ -206,8 +320,8 @@ class Model:
 
         return indices, values, shape
 
-    def decoder_output_to_text(self, ctc_output: tuple, batch_size: int) -> List[str]:
-        """Extract texts from output of CTC decoder."""
+    def decoder_output_to_labels(self, ctc_output: tuple, batch_size: int) -> List[List[int]]:
+        """Extract label strings from output of CTC decoder."""
 
         # word beam search: already contains label strings
         decoded = ctc_output[0][0]
@@ -221,23 +335,42 @@ class Model:
                 batch_element = idx2d[0]  # index according to [b,t]
                 label_strs[batch_element].append(label)
 
+        return label_strs
+
+    def decoder_output_to_text(self, ctc_output: tuple, batch_size: int) -> List[str]:
+        """Extract texts from output of CTC decoder."""
+
         # map labels to chars for all batch elements
+        label_strs = self.decoder_output_to_labels(ctc_output, batch_size)
         return [''.join([self.charList[c] for c in labelStr]) for labelStr in label_strs]
 
+    @staticmethod
+    def batch_seq_lens(batch: Batch) -> List[int]:
+        """Sequence length of each batch element: true lengths if given, else the common input width / 4."""
+        if batch.seq_lens is not None:
+            return list(batch.seq_lens)
+        return [batch.imgs[0].shape[0] // 4] * len(batch.imgs)
+
     def train_batch(self, batch: Batch) -> float:
         """Feed a batch into the NN to train it."""
-        num_batch_elements = len(batch.imgs)
-        max_text_len = batch.imgs[0].shape[0] // 4
-        sparse = self.to_sparse(batch.gt_texts)
+        sparse = self.to_sparse(batch.gt_texts, batch.gt_labels)
         eval_list = [self.optimizer, self.loss]
         feed_dict = {self.input_imgs: batch.imgs, self.gt_texts: sparse,
-                     self.seq_len: [max_text_len] * num_batch_elements, self.is_train: True}
-        _, loss_val = self.sess.run(eval_list, feed_dict)
+                     self.seq_len: self.batch_seq_lens(batch), self.is_train: True}
+        with span('model.train_batch', batch=len(batch.imgs)):
+            _, loss_val = self.sess.run(eval_list, feed_dict)
         self.batches_trained += 1
         return loss_val
 
-    def infer_batch(self, batch: Batch, calc_probability: bool = False):
-        """Feed a batch into the NN to recognize the texts."""
+    def infer_batch(self, batch: Batch, calc_probability: bool = False, char_confidence: bool = False):
+        """
+        Feed a batch into the NN to recognize the texts.
+
+        Probabilities come from the same session run as the decoded text: the RNN output is
+        fetched together with the decoder and scored in NumPy. By default each element gets
+        the CTC labeling probability exp(-loss); with char_confidence each element gets an
+        array of per-character confidences taken from the best path instead, which is cheaper.
+        """
 
         # decode, optionally save RNN output
         num_batch_elements = len(batch.imgs)
@@ -245,41 +378,155 @@ class Model:
         # put tensors to be evaluated into list
         eval_list = []
 
-        eval_list.append(self.decoder)
+        if self.decoder_type == DecoderType.BestPath:
+            eval_list.append(self.decoder)
 
-        if calc_probability:
+        if calc_probability or self.decoder_type != DecoderType.BestPath:
             eval_list.append(self.ctc_in_3d_tbc)
 
         # sequence length depends on input image size (model downsizes width by 4)
-        max_text_len = batch.imgs[0].shape[0] // 4
+        seq_lens = self.batch_seq_lens(batch)
 
         # dict containing all tensor fed into the model
-        feed_dict = {self.input_imgs: batch.imgs, self.seq_len: [max_text_len] * num_batch_elements,
-                     self.is_train: False}
+        feed_dict = {self.input_imgs: batch.imgs, self.seq_len: seq_lens, self.is_train: False}
 
         # evaluate model
-        eval_res = self.sess.run(eval_list, feed_dict)
-
-        # TF decoders: decoding already done in TF graph
-        decoded = eval_res[0]
-
-        # map labels (numbers) to character string
-        texts = self.decoder_output_to_text(decoded, num_batch_elements)
-
-        # feed RNN output and recognized text into CTC loss to compute labeling probability
+        with span('model.run', batch=num_batch_elements):
+            eval_res = self.sess.run(eval_list, feed_dict)
+
+        with span('model.decode', batch=num_batch_elements):
+            # TF decoders: decoding already done in TF graph
+            if self.decoder_type == DecoderType.BestPath:
+                label_strs = self.decoder_output_to_labels(eval_res[0], num_batch_elements)
+
+            # NumPy decoders: decode softmax of the RNN output of each batch element
+            elif self.decoder_type == DecoderType.BeamSearch:
+                mats = ctc.softmax(eval_res[-1]).transpose(1, 0, 2)
+                label_strs = [nbest[0][0] for nbest in ctc.prefix_beam_search_batch(
+                    mats, len(self.charList), self.beam_width, seq_lens=seq_lens)]
+            else:
+                label_strs = [self.decoder.decode(ctc.softmax(eval_res[-1][:seq_lens[b], b]))
+                              for b in range(num_batch_elements)]
+
+            # map labels (numbers) to character string
+            texts = [''.join([self.charList[c] for c in labelStr]) for labelStr in label_strs]
+
+        # score recognized labels against the RNN output of the same run
         probs = None
         if calc_probability:
-            sparse = self.to_sparse(texts)
-            ctc_input = eval_res[1]
-            eval_list = self.loss_per_element
-            feed_dict = {self.saved_ctc_input: ctc_input, self.gt_texts: sparse,
-                         self.seq_len: [max_text_len] * num_batch_elements, self.is_train: False}
-            loss_vals = self.sess.run(eval_list, feed_dict)
-            probs = np.exp(-loss_vals)
+            with span('model.probability', batch=num_batch_elements):
+                ctc_input = eval_res[-1]
+                blank = len(self.charList)
+                if char_confidence:
+                    # per-character confidences are taken from the best path
+                    assert self.decoder_type == DecoderType.BestPath
+                    probs = [ctc.best_path(ctc.softmax(ctc_input[:seq_lens[b], b]), blank)[1]
+                             for b in range(num_batch_elements)]
+                else:
+                    probs = np.exp([ctc.label_log_probability(ctc.log_softmax(ctc_input[:seq_lens[b], b]),
+                                                              label_strs[b], blank)
+                                    for b in range(num_batch_elements)])
 
         return texts, probs
 
+    def infer_nbest(self, batch: Batch, top_k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Recognize the texts with CTC prefix beam search and return the top_k hypotheses of each element."""
+        seq_lens = self.batch_seq_lens(batch)
+        feed_dict = {self.input_imgs: batch.imgs, self.seq_len: seq_lens, self.is_train: False}
+        mats = ctc.softmax(self.sess.run(self.ctc_in_3d_tbc, feed_dict)).transpose(1, 0, 2)
+        nbests = ctc.prefix_beam_search_batch(mats, len(self.charList), max(self.beam_width, top_k), top_k, seq_lens)
+        return [[(''.join([self.charList[c] for c in labels]), prob) for labels, prob in nbest] for nbest in nbests]
+
     def save(self) -> None:
-        """Save model to file."""
+        """Save model to file in the background."""
         self.snap_ID += 1
-        self.saver.save(self.sess, '../model/snapshot', global_step=self.snap_ID)
\ No newline at end of file
+        self._checkpoint(self._write_snapshot(self.snap_ID))
+
+    def save_state(self, state: dict, best: bool = False) -> None:
+        """
+        Save variables and training state (epoch, batch offset, early-stopping counters, summaries)
+        in the background, so that an interrupted training can be resumed by load_state.
+        With best=True the variables are also saved as the next model snapshot.
+        """
+        writers = []
+        if best:
+            self.snap_ID += 1
+            writers.append(self._write_snapshot(self.snap_ID))
+        # стан серіалізується зараз, бо навчання продовжує змінювати його списки
+        checkpoint = f'{RESUME_PREFIX}-{self.batches_trained}'
+        data = json.dumps(dict(state, snap_ID=self.snap_ID, batches_trained=self.batches_trained,
+                               checkpoint=checkpoint))
+
+        def write_state() -> None:
+            with span('model.save_state'):
+                self.resume_saver.save(self.sess, RESUME_PREFIX, global_step=self.batches_trained,
+                                       latest_filename='resume_checkpoint', write_meta_graph=False)
+                # стан замінюється атомарно і лише після того, як його контрольна точка вже записана
+                with open(TRAINING_STATE + '.tmp', 'w') as f:
+                    f.write(data)
+                os.replace(TRAINING_STATE + '.tmp', TRAINING_STATE)
+                remove_resume_checkpoints(keep=checkpoint)
+
+        writers.append(write_state)
+        self._checkpoint(*writers)
+
+    def load_state(self):
+        """Restore variables and return the training state saved by save_state, or None if there is none."""
+        if not os.path.exists(TRAINING_STATE):
+            return None
+        with open(TRAINING_STATE) as f:
+            state = json.load(f)
+        print('Resume training from ' + state['checkpoint'])
+        self.saver.restore(self.sess, state['checkpoint'])
+        self.snap_ID = state['snap_ID']
+        self.batches_trained = state['batches_trained']
+        return state
+
+    def clear_state(self) -> None:
+        """Remove the training state once training has finished."""
+        self.wait_for_save()
+        if os.path.exists(TRAINING_STATE):
+            os.remove(TRAINING_STATE)
+        remove_resume_checkpoints()
+
+    def wait_for_save(self) -> None:
+        """Block until the background save is written; re-raise its error if it failed."""
+        if self._save_thread is not None:
+            self._save_thread.join()
+            self._save_thread = None
+        if self._save_error is not None:
+            error, self._save_error = self._save_error, None
+            raise error
+
+    def _write_snapshot(self, snap_ID: int):
+        def write() -> None:
+            with span('model.save'):
+                self.snapshot_saver.save(self.sess, '../model/snapshot', global_step=snap_ID)
+        return write
+
+    def _checkpoint(self, *writers) -> None:
+        # попередній запис ще читає копії, тож їх не можна перезаписувати до його завершення
+        self.wait_for_save()
+        # копіювання змінних у пам'яті - єдине, що блокує крок навчання
+        with span('model.snapshot'):
+            self.sess.run(self.shadow_copy)
+
+        def run() -> None:
+            try:
+                for write in writers:
+                    write()
+            except Exception as e:
+                self._save_error = e
+
+        self._save_thread = threading.Thread(target=run, name='checkpoint')
+        self._save_thread.start()
+
+    def memory_size(self) -> int:
+        """Estimate memory held by the model variables in bytes."""
+        variables = self.graph.get_collection(tf.compat.v1.GraphKeys.GLOBAL_VARIABLES)
+        return sum(v.shape.num_elements() * v.dtype.size for v in variables)
+
+    def close(self) -> None:
+        """Release the TF session."""
+        self.wait_for_save()
+        self.sess.close()
\ No newline at end of file
@@ -0,0 +1,127 @@
+import multiprocessing as mp
+import random
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Iterator, List, Tuple
+
+import cv2
+import numpy as np
+
+from dataloaderIAM import Batch, DataLoaderIAM, Sample, load_batch
+from imagestore import ImageStore
+from preprocessor import Preprocessor
+
+# стан процесу-працівника: препроцесор і масиви слотів у спільній пам'яті
+_worker = {}
+
+
+def _init_worker(preprocessor: Preprocessor, shm_names: List[str], slot_shape: Tuple[int, int, int],
+                 store_dir: str) -> None:
+    # кожен процес обробляє один пакет, тому паралелізм OpenCV лише заважає
+    cv2.setNumThreads(1)
+    _worker['preprocessor'] = preprocessor
+    # відображений файл сховища спільний для всіх процесів через кеш сторінок
+    _worker['store'] = ImageStore(store_dir) if store_dir else None
+    _worker['shms'] = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    _worker['slots'] = [np.ndarray(slot_shape, np.float32, buffer=shm.buf) for shm in _worker['shms']]
+
+
+def _process_batch(slot: int, samples: List[Sample],
+                   seed: Tuple[int, ...]) -> Tuple[int, Tuple[int, ...], List[str], List[np.ndarray]]:
+    # насіння залежить лише від номера пакету, тож аугментація не залежить від розподілу між процесами
+    seed_seq = np.random.SeedSequence(seed)
+    random.seed(int(seed_seq.generate_state(1)[0]))
+    np.random.seed(seed_seq.generate_state(1))
+
+    # препроцесор пише пакет одразу у слот спільної пам'яті
+    batch = _worker['preprocessor'].process_batch(load_batch(samples, _worker['store']), _worker['slots'][slot])
+    return slot, batch.imgs.shape, batch.gt_texts, batch.gt_labels
+
+
+class PrefetchPipeline:
+    """
+        Паралельний конвеєр підготовки навчальних пакетів.
+
+        Процеси-працівники декодують і аугментують наступні пакети, поки крок TensorFlow
+        обробляє поточний, і записують результат у слоти спільної пам'яті, тож зображення
+        не серіалізуються між процесами. Пакети видаються у порядку завантажувача; масив
+        зображень пакету - це вигляд на слот, дійсний до запиту наступного пакету.
+
+        ---
+
+        Атрибути
+        --------
+        loader : DataLoaderIAM
+            Завантажувач, що визначає порядок і склад пакетів.
+        num_workers : int
+            Кількість процесів-працівників.
+        prefetch : int
+            Кількість пакетів, які готуються наперед.
+        seed : int
+            Базове насіння для відтворюваного порядку зразків і аугментації.
+
+        Методи
+        ------
+        train_epoch(int epoch, int start_batch) -> Iterator[Tuple[Tuple[int, int], Batch]]
+            Перемикає завантажувач на навчальний набір і видає готові пакети епохи,
+            починаючи з пакету start_batch.
+        close()
+            Зупиняє процеси і звільняє спільну пам'ять.
+    """
+
+    def __init__(self,
+                 loader: DataLoaderIAM,
+                 preprocessor: Preprocessor,
+                 num_workers: int = None,
+                 prefetch: int = 4,
+                 seed: int = 0) -> None:
+        # слот має фіксований розмір, тому ширина полотна не може бути динамічною
+        assert not preprocessor.dynamic_width
+
+        self.loader = loader
+        self.num_workers = num_workers or mp.cpu_count()
+        self.prefetch = prefetch
+        self.seed = seed
+
+        # один слот на кожен пакет у роботі плюс один для пакету, який зараз навчається
+        width, height = preprocessor.img_size
+        slot_shape = (loader.batch_size, width, height)
+        slot_bytes = int(np.prod(slot_shape)) * np.dtype(np.float32).itemsize
+        self._shms = [shared_memory.SharedMemory(create=True, size=slot_bytes) for _ in range(prefetch + 1)]
+        self._slots = [np.ndarray(slot_shape, np.float32, buffer=shm.buf) for shm in self._shms]
+
+        # spawn, щоб працівники не успадковували потоки TensorFlow батьківського процесу
+        store_dir = loader.data_dir if loader.store is not None else None
+        self._pool = mp.get_context('spawn').Pool(self.num_workers, _init_worker,
+                                                   (preprocessor, [shm.name for shm in self._shms], slot_shape,
+                                                    store_dir))
+
+    def train_epoch(self, epoch: int, start_batch: int = 0) -> Iterator[Tuple[Tuple[int, int], Batch]]:
+        self.loader.train_set(self.seed + epoch, start_batch)
+        pending = deque()
+        free_slots = deque(range(len(self._slots)))
+        batch_no = start_batch
+        while True:
+            # тримати prefetch пакетів у роботі, поки є вільні слоти
+            while self.loader.has_next() and len(pending) < self.prefetch and free_slots:
+                iter_info = self.loader.get_iterator_info()
+                samples = self.loader.next_samples()
+                task = self._pool.apply_async(_process_batch, (free_slots.popleft(), samples,
+                                                               (self.seed, epoch, batch_no)))
+                pending.append((iter_info, task))
+                batch_no += 1
+            if not pending:
+                break
+
+            iter_info, task = pending.popleft()
+            slot, shape, gt_texts, gt_labels = task.get()
+            imgs = self._slots[slot][:shape[0], :shape[1], :shape[2]]
+            yield iter_info, Batch(imgs, gt_texts, shape[0], None, gt_labels)
+            free_slots.append(slot)
+
+    def close(self) -> None:
+        self._pool.terminate()
+        self._pool.join()
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
@@ -1,10 +1,11 @@
 import random
-from typing import Tuple
+from typing import List, Sequence, Tuple
 
 import cv2
 import numpy as np
 
 from dataloaderIAM import Batch
+from instrumentation import timed
 
 
 class Preprocessor:
@@ -21,6 +22,11 @@ class Preprocessor:
             Якщо True, ширина зображення адаптується динамічно.
         data_augmentation : bool
             Якщо True, застосовується аугментація даних.
+        bucket_widths : List[int]
+            Можливі ширини полотна для пакету; якщо задано, кожен пакет отримує найвужче
+            полотно, у яке вміщаються його зразки, замість повної ширини img_size.
+        line_mode : bool
+            Якщо True, з кількох слів пакету складаються зображення текстових рядків.
 
         Методи:
         -------
@@ -30,26 +36,38 @@ class Preprocessor:
         _simulate_text_line(batch: Batch) -> Batch
             Створює зображення текстового рядка, об'єднуючи декілька слів зображень у одне зображення.
 
-        process_img(img: np.ndarray) -> np.ndarray
+        target_width(img: np.ndarray, img_size: Tuple[int, int] = None) -> int
+            Обчислює ширину полотна для зображення.
+
+        process_img(img: np.ndarray, img_size: Tuple[int, int] = None) -> np.ndarray
             Змінює розмір зображення до цільового розміру, застосовує аугментацію даних.
 
-        process_batch(batch: Batch) -> Batch
-            Обробляє кожне зображення в пакеті та повертає оброблений пакет.
+        batch_img_size(imgs: List[np.ndarray]) -> Tuple[int, int]
+            Обирає розмір полотна для пакету з урахуванням кошиків ширини.
+
+        process_batch(batch: Batch, out: np.ndarray = None) -> Batch
+            Обробляє пакет в один суцільний масив float32 та повертає оброблений пакет.
         """
     def __init__(self,
                  img_size: Tuple[int, int],
                  padding: int = 0,
                  dynamic_width: bool = False,
-                 data_augmentation: bool = False) -> None:
+                 data_augmentation: bool = False,
+                 bucket_widths: Sequence[int] = None,
+                 line_mode: bool = False) -> None:
         # dynamic width only supported when no data augmentation happens
         assert not (dynamic_width and data_augmentation)
         # when padding is on, we need dynamic width enabled
         assert not (padding > 0 and not dynamic_width)
+        # width buckets replace dynamic width with a fixed set of canvas widths
+        assert not (bucket_widths and dynamic_width)
 
         self.img_size = img_size
         self.padding = padding
         self.dynamic_width = dynamic_width
         self.data_augmentation = data_augmentation
+        self.bucket_widths = sorted(bucket_widths) if bucket_widths else None
+        self.line_mode = line_mode
 
     @staticmethod
     def _truncate_label(text: str, max_text_len: int) -> str:
@@ -114,15 +132,38 @@ class Preprocessor:
 
         return Batch(res_imgs, res_gt_texts, batch.batch_size)
 
-    def process_img(self, img: np.ndarray) -> np.ndarray:
-        """Змініть розмір до потрібного, застосуйте доповнення даних."""
-
+    def batch_img_size(self, imgs: List[np.ndarray]) -> Tuple[int, int]:
+        """Найвужче полотно з bucket_widths, у яке вміщаються всі зображення пакету."""
+        if not self.bucket_widths:
+            return self.img_size
+
+        wt, ht = self.img_size
+        needed = max([min(wt, img.shape[1] * ht / img.shape[0]) for img in imgs if img is not None] or [wt])
+        for width in self.bucket_widths:
+            if width >= needed:
+                return width, ht
+        return self.img_size
+
+    def target_width(self, img: np.ndarray, img_size: Tuple[int, int] = None) -> int:
+        """Ширина полотна для зображення: фіксована або, для динамічної ширини, пропорційна зображенню."""
+        img_size = img_size or self.img_size
+        if not self.dynamic_width or self.data_augmentation or img is None:
+            return img_size[0]
+        h, w = img.shape
+        wt = int(img_size[1] / h * w + self.padding)
+        return wt + (4 - wt) % 4
+
+    def _warp_into(self, img: np.ndarray, img_size: Tuple[int, int], out: np.ndarray) -> None:
+        """
+        Відобразити зображення у полотно out (W, H) вже транспонованим для TF.
+        Полотно заповнюється білим (255) у відтінках float32 без нормалізації.
+        """
         # there are damaged files in IAM dataset - just use black image instead
         if img is None:
-            img = np.zeros(self.img_size[::-1])
+            img = np.zeros(img_size[::-1], np.uint8)
 
-        # data augmentation
-        img = img.astype(np.float64)
+        img = img.astype(np.float32)
+        h, w = img.shape
         if self.data_augmentation:
             # photometric data augmentation
             if random.random() < 0.25:
@@ -135,8 +176,7 @@ class Preprocessor:
                 img = cv2.erode(img, np.ones((3, 3)))
 
             # geometric data augmentation
-            wt, ht = self.img_size
-            h, w = img.shape
+            wt, ht = img_size
             f = min(wt / w, ht / h)
             fx = f * np.random.uniform(0.75, 1.05)
             fy = f * np.random.uniform(0.75, 1.05)
@@ -151,51 +191,86 @@ class Preprocessor:
 
             # map image into target image
             M = np.float32([[fx, 0, tx], [0, fy, ty]])
-            target = np.ones(self.img_size[::-1]) * 255
-            img = cv2.warpAffine(img, M, dsize=self.img_size, dst=target, borderMode=cv2.BORDER_TRANSPARENT)
+            target = np.full((ht, wt), 255, np.float32)
+            cv2.warpAffine(img, M, dsize=(wt, ht), dst=target, borderMode=cv2.BORDER_TRANSPARENT)
+            # transpose for TF
+            cv2.transpose(target, dst=out)
 
-            # photometric data augmentation
+            # photometric data augmentation, in place
             if random.random() < 0.5:
-                img = img * (0.25 + random.random() * 0.75)
+                out *= 0.25 + random.random() * 0.75
             if random.random() < 0.25:
-                img = np.clip(img + (np.random.random(img.shape) - 0.5) * random.randint(1, 25), 0, 255)
+                # шум генерується у вигляді (H, W), як і до транспонування
+                out += (np.random.random(out.shape[::-1]).T - 0.5) * random.randint(1, 25)
+                np.clip(out, 0, 255, out=out)
             if random.random() < 0.1:
-                img = 255 - img
+                np.subtract(255, out, out=out)
 
         # no data augmentation
         else:
+            wt, ht = out.shape
             if self.dynamic_width:
-                ht = self.img_size[1]
-                h, w = img.shape
                 f = ht / h
-                wt = int(f * w + self.padding)
-                wt = wt + (4 - wt) % 4
                 tx = (wt - w * f) / 2
                 ty = 0
             else:
-                wt, ht = self.img_size
-                h, w = img.shape
                 f = min(wt / w, ht / h)
                 tx = (wt - w * f) / 2
                 ty = (ht - h * f) / 2
 
             # map image into target image
             M = np.float32([[f, 0, tx], [0, f, ty]])
-            target = np.ones([ht, wt]) * 255
-            img = cv2.warpAffine(img, M, dsize=(wt, ht), dst=target, borderMode=cv2.BORDER_TRANSPARENT)
+            target = np.full((ht, wt), 255, np.float32)
+            cv2.warpAffine(img, M, dsize=(wt, ht), dst=target, borderMode=cv2.BORDER_TRANSPARENT)
+            # transpose for TF
+            cv2.transpose(target, dst=out)
 
-        # transpose for TF
-        img = cv2.transpose(img)
+    @timed('preprocessor.process_img')
+    def process_img(self, img: np.ndarray, img_size: Tuple[int, int] = None) -> np.ndarray:
+        """Змініть розмір до потрібного, застосуйте доповнення даних."""
+        img_size = img_size or self.img_size
+        out = np.full((self.target_width(img, img_size), img_size[1]), 255, np.float32)
+        self._warp_into(img, img_size, out)
 
         # convert to range [-1, 1]
-        img = img / 255 - 0.5
-        return img
+        out *= 1 / 255
+        out -= 0.5
+        return out
 
-    def process_batch(self, batch: Batch) -> Batch:
+    @timed('preprocessor.process_batch')
+    def process_batch(self, batch: Batch, out: np.ndarray = None) -> Batch:
+        """
+        Обробити пакет в один суцільний масив float32 (B, W, H). Кожне зображення відображається
+        одразу у свій зріз масиву, а нормалізація виконується одним проходом по всьому пакету.
+        Для динамічної ширини зображення доповнюються білим до найширшого, а справжня
+        довжина послідовності кожного зберігається в seq_lens. Якщо задано out, результат
+        записується в його початковий зріз без виділення нового масиву.
+        """
         if self.line_mode:
             batch = self._simulate_text_line(batch)
 
-        res_imgs = [self.process_img(img) for img in batch.imgs]
-        max_text_len = res_imgs[0].shape[0] // 4
-        res_gt_texts = [self._truncate_label(gt_text, max_text_len) for gt_text in batch.gt_texts]
-        return Batch(res_imgs, res_gt_texts, batch.batch_size)
+        img_size = self.batch_img_size(batch.imgs)
+        widths = [self.target_width(img, img_size) for img in batch.imgs]
+        shape = (len(batch.imgs), max(widths), img_size[1])
+        if out is None:
+            res_imgs = np.empty(shape, np.float32)
+        else:
+            res_imgs = out[:shape[0], :shape[1], :shape[2]]
+        # доповнення праворуч білим тлом
+        res_imgs.fill(255)
+        for img, canvas, width in zip(batch.imgs, res_imgs, widths):
+            self._warp_into(img, img_size, canvas[:width])
+
+        # convert to range [-1, 1]
+        res_imgs *= 1 / 255
+        res_imgs -= 0.5
+
+        seq_lens = [width // 4 for width in widths]
+        res_gt_texts = None
+        if batch.gt_texts is not None:
+            res_gt_texts = [self._truncate_label(gt_text, seq_len) for gt_text, seq_len in zip(batch.gt_texts, seq_lens)]
+        # закодовані мітки обрізаються так само, як тексти
+        res_gt_labels = None
+        if batch.gt_labels is not None and res_gt_texts is not None:
+            res_gt_labels = [labels[:len(text)] for labels, text in zip(batch.gt_labels, res_gt_texts)]
+        return Batch(res_imgs, res_gt_texts, batch.batch_size, seq_lens if self.dynamic_width else None, res_gt_labels)
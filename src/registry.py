@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import cv2
+
+import runtime
+from engRecognition import EnglishRecognition
+from resultcache import ResultCache
+from segmentation import recognize_page
+from ukrRecognition import UkrainianRecognition
+
+
+class WarmRecognizer:
+    """
+        Прогріта модель разом з об'єктом розпізнавання відповідної мови.
+
+        Атрибути
+        --------
+        language : str
+            Мова розпізнавання ("English" або "Ukrainian").
+        recognition : EnglishRecognition | UkrainianRecognition
+            Об'єкт розпізнавання, що вміє працювати з моделлю.
+        model : Model | UkrainianModel
+            Завантажена модель, яка живе весь час перебування у реєстрі.
+        checkpoint_id : str
+            Ідентифікатор контрольної точки (ResultCache.checkpointId), з якої завантажено модель;
+            після перенавчання він лишається старим, доки модель не перезавантажено.
+
+        Методи
+        ------
+        recognize(str path) -> List[str]
+            Розпізнає текст з зображення без повторного завантаження моделі.
+        recognizeBatch(List items) -> Tuple[List[str], List[float]]
+            Розпізнає текст з кількох зображень пакетами.
+        recognizePage(str path, str unit) -> str
+            Розбиває сторінку на рядки і слова та розпізнає всі фрагменти разом.
+        memory_size() -> int
+            Оцінка обсягу пам'яті, який займає модель.
+    """
+
+    def __init__(self, language: str, recognition, model, checkpoint_id: str):
+        self.language = language
+        self.recognition = recognition
+        self.model = model
+        self.checkpoint_id = checkpoint_id
+
+    def recognize(self, path) -> List[str]:
+        return self.recognition.infer(self.model, path)
+
+    def recognizeBatch(self, items: Sequence) -> Tuple[List[str], List[float]]:
+        return self.recognition.inferBatch(self.model, items)
+
+    def recognizePage(self, path, unit: str = 'word') -> str:
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+        if img is None:
+            raise ValueError('Cannot read image: ' + str(path))
+        return recognize_page(self.recognizeBatch, img, unit)
+
+    def memory_size(self) -> int:
+        return self.model.memory_size()
+
+
+class RecognizerRegistry:
+    """
+        Реєстр прогрітих моделей, спільний для всього процесу.
+
+        Кожна мова завантажується один раз і далі видається з кешу. Якщо сумарний обсяг
+        моделей перевищує бюджет пам'яті, витісняються ті, що найдовше не використовувались.
+        Витіснена модель звільняється збирачем сміття, коли її перестають використовувати,
+        тому розпізнавання, яке вже триває в іншому потоці, не переривається.
+
+        ---
+
+        Атрибути
+        --------
+        memory_budget : int
+            Бюджет пам'яті для всіх моделей у байтах.
+        profile : str
+            Назва профілю виконання (runtime.PROFILES), з яким завантажуються моделі.
+
+        Методи
+        ------
+        register(str language, Callable factory)
+            Реєструє фабрику об'єкта розпізнавання для мови.
+        get(str language) -> WarmRecognizer
+            Повертає прогріту модель для мови, завантажуючи її за потреби.
+        checkpoint(str language) -> str
+            Повертає ідентифікатор контрольної точки прогрітої моделі мови або, якщо її ще
+            не завантажено, поточного файлу контрольної точки, не завантажуючи модель.
+        set_memory_budget(int memory_budget)
+            Змінює бюджет пам'яті і витісняє зайві моделі.
+        set_profile(str profile)
+            Змінює профіль виконання; моделі перезавантажуються з ним при наступному запиті.
+            Сесії профілів з явною кількістю потоків мають власні пули (runtime.session_config),
+            тож новий профіль діє й у процесі, де вже є інші сесії.
+        evict(str language)
+            Видаляє модель мови з кешу.
+        clear()
+            Видаляє всі моделі з кешу.
+    """
+
+    def __init__(self, memory_budget: int = 1024 ** 3, profile: str = 'latency'):
+        self.memory_budget = memory_budget
+        self.profile = profile
+        self._factories: Dict[str, Callable] = {}
+        self._entries: 'OrderedDict[str, WarmRecognizer]' = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, language: str, factory: Callable) -> None:
+        with self._lock:
+            self._factories[language] = factory
+            self._entries.pop(language, None)
+
+    def get(self, language: str) -> WarmRecognizer:
+        with self._lock:
+            if language in self._entries:
+                self._entries.move_to_end(language)
+                return self._entries[language]
+
+            if language not in self._factories:
+                raise KeyError('No recognizer registered for language: ' + language)
+
+            recognition = self._factories[language]()
+            config = runtime.apply(runtime.get_profile(self.profile, language))
+            # ідентифікатор береться до завантаження: файл, змінений під час нього, дасть новий ідентифікатор
+            checkpoint_id = ResultCache.checkpointId(recognition.checkpoint)
+            entry = WarmRecognizer(language, recognition, recognition.loadModel(config), checkpoint_id)
+            self._entries[language] = entry
+            self._shrink()
+            return entry
+
+    def checkpoint(self, language: str) -> str:
+        with self._lock:
+            if language in self._entries:
+                return self._entries[language].checkpoint_id
+            return ResultCache.checkpointId(self._factories[language]().checkpoint)
+
+    def set_memory_budget(self, memory_budget: int) -> None:
+        with self._lock:
+            self.memory_budget = memory_budget
+            self._shrink()
+
+    def set_profile(self, profile: str) -> None:
+        with self._lock:
+            if profile != self.profile:
+                self.profile = profile
+                self._entries.clear()
+
+    def evict(self, language: str) -> None:
+        with self._lock:
+            self._entries.pop(language, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _shrink(self) -> None:
+        # щойно використана модель завжди лишається, навіть якщо сама не вміщається в бюджет
+        total = sum(entry.memory_size() for entry in self._entries.values())
+        while total > self.memory_budget and len(self._entries) > 1:
+            language, entry = self._entries.popitem(last=False)
+            total -= entry.memory_size()
+            print('Evicting recognizer:', language)
+
+
+registry = RecognizerRegistry()
+registry.register("English", EnglishRecognition)
+registry.register("Ukrainian", UkrainianRecognition)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from typing import List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from database import CachedResult
+
+CacheKey = namedtuple('CacheKey', 'digest, language, checkpoint')
+
+
+class ResultCache:
+    """
+        Кеш результатів розпізнавання, адресований вмістом зображення.
+
+        Ключ складається з SHA-256 вмісту файлу, мови та ідентифікатора контрольної точки
+        моделі, тож повторно надіслане зображення не проходить через мережу, навіть якщо
+        файл перейменовано. Результати зберігаються в таблиці result_cache поруч із records,
+        а найсвіжіші тримаються ще й у пам'яті. Ідентифікатор контрольної точки обчислюється
+        з часу зміни та розміру файлу контрольної точки, тож після перенавчання старі ключі
+        просто перестають збігатися, а їхні записи видаляються при першому зверненні.
+
+        ---
+
+        Атрибути
+        --------
+        engine: sqlalchemy.engine.base.Engine
+            Рушій для підключення бази даних.
+        capacity: int
+            Кількість результатів, які тримаються в пам'яті.
+
+        Методи
+        ------
+        imageDigest(str path) -> str
+            Обчислює SHA-256 вмісту файлу зображення.
+        key(str path, str language, str checkpoint) -> CacheKey
+            Обчислює ключ кешу для зображення з ідентифікатором контрольної точки, з якої завантажено модель;
+            за зміни контрольної точки видаляє застарілі результати.
+        get(CacheKey key) -> List[str]
+            Повертає збережений результат або None.
+        put(CacheKey key, List[str] recognized)
+            Зберігає результат розпізнавання.
+        checkpointId(str checkpointFile) -> str
+            Повертає ідентифікатор поточного стану файлу контрольної точки.
+        purge(str language, str checkpoint)
+            Видаляє результати мови, отримані іншими контрольними точками.
+    """
+
+    def __init__(self, engine, capacity: int = 4096):
+        self.engine = engine
+        self.capacity = capacity
+        self._memory: 'OrderedDict[CacheKey, List[str]]' = OrderedDict()
+        self._checkpoints = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def imageDigest(path) -> str:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    @staticmethod
+    def checkpointId(checkpointFile) -> str:
+        stat = os.stat(checkpointFile)
+        return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+    def key(self, path, language: str, checkpoint: str) -> CacheKey:
+        with self._lock:
+            changed = self._checkpoints.get(language) != checkpoint
+            self._checkpoints[language] = checkpoint
+        if changed:
+            self.purge(language, checkpoint)
+        return CacheKey(self.imageDigest(path), language, checkpoint)
+
+    def purge(self, language: str, checkpoint: str) -> None:
+        # результати попередніх контрольних точок уже ніколи не знадобляться
+        with self._lock:
+            for key in [key for key in self._memory if key.language == language and key.checkpoint != checkpoint]:
+                del self._memory[key]
+        with self.engine.begin() as connection:
+            connection.execute(delete(CachedResult).where(CachedResult.language == language,
+                                                          CachedResult.checkpoint != checkpoint))
+
+    def get(self, key: CacheKey) -> Optional[List[str]]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        with self.engine.connect() as connection:
+            result = connection.execute(select(CachedResult.result).where(
+                CachedResult.digest == key.digest, CachedResult.language == key.language,
+                CachedResult.checkpoint == key.checkpoint)).scalar()
+        if result is None:
+            return None
+        recognized = json.loads(result)
+        self._remember(key, recognized)
+        return recognized
+
+    def put(self, key: CacheKey, recognized: List[str]) -> None:
+        recognized = list(recognized)
+        with self.engine.begin() as connection:
+            connection.execute(insert(CachedResult).values(
+                digest=key.digest, language=key.language, checkpoint=key.checkpoint,
+                result=json.dumps(recognized)).on_conflict_do_nothing())
+        self._remember(key, recognized)
+
+    def _remember(self, key: CacheKey, recognized: List[str]) -> None:
+        with self._lock:
+            self._memory[key] = recognized
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.capacity:
+                self._memory.popitem(last=False)
@@ -0,0 +1,205 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from collections import namedtuple
+from typing import Dict, List
+
+import numpy as np
+
+from datafiles import data_files
+
+# налаштування виконання моделі: потоки TensorFlow і OpenCV, XLA та перемикачі grappler
+# (назви полів RewriterConfig, True - увімкнути, False - вимкнути, відсутні - типове значення)
+RuntimeProfile = namedtuple('RuntimeProfile',
+                            'name, intra_op_threads, inter_op_threads, opencv_threads, xla, grappler',
+                            defaults=(0, 0, -1, False, {}))
+
+CORES = os.cpu_count() or 1
+
+PROFILES = {
+    # типові налаштування TensorFlow і OpenCV
+    'default': RuntimeProfile('default'),
+    # одне зображення якнайшвидше: усі ядра на одну сесію, незалежні гілки графа - паралельно
+    'latency': RuntimeProfile('latency', intra_op_threads=CORES, inter_op_threads=2, opencv_threads=CORES,
+                              grappler={'constant_folding': True, 'arithmetic_optimization': True,
+                                        'remapping': True}),
+    # багато зображень одночасно: процес на ядро, кожен з одним потоком, без змагання за ядра
+    'throughput': RuntimeProfile('throughput', intra_op_threads=1, inter_op_threads=1, opencv_threads=1,
+                                 grappler={'constant_folding': True, 'arithmetic_optimization': True,
+                                           'remapping': True}),
+}
+
+# профілі, підібрані auto-tune для цього комп'ютера, окремо для кожної мови
+TUNED_FILE = '../model/runtime.json'
+
+
+def session_config(profile: RuntimeProfile):
+    """ConfigProto сесії TensorFlow для профілю."""
+    import tensorflow as tf
+    from tensorflow.core.protobuf import rewriter_config_pb2
+
+    config = tf.compat.v1.ConfigProto(intra_op_parallelism_threads=profile.intra_op_threads,
+                                      inter_op_parallelism_threads=profile.inter_op_threads)
+    # спільні пули потоків процесу задає перша сесія, тож без власних пулів кількість потоків
+    # профілю діяла б лише для першої завантаженої моделі
+    if profile.intra_op_threads or profile.inter_op_threads:
+        config.use_per_session_threads = True
+    rewrite = config.graph_options.rewrite_options
+    for option, enabled in profile.grappler.items():
+        setattr(rewrite, option, rewriter_config_pb2.RewriterConfig.ON if enabled
+                else rewriter_config_pb2.RewriterConfig.OFF)
+    if profile.xla:
+        config.graph_options.optimizer_options.global_jit_level = tf.compat.v1.OptimizerOptions.ON_1
+    return config
+
+
+def apply(profile: RuntimeProfile):
+    """Застосувати налаштування профілю, спільні для процесу, і повернути ConfigProto для сесій."""
+    import cv2
+
+    if profile.opencv_threads >= 0:
+        cv2.setNumThreads(profile.opencv_threads)
+    return session_config(profile)
+
+
+def load_tuned(path: str = TUNED_FILE) -> Dict[str, Dict[str, RuntimeProfile]]:
+    """
+    Профілі, збережені auto-tune, за мовою і призначенням; підібрані на комп'ютері
+    з іншою кількістю ядер ігноруються.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    if data.get('cpu_count') != CORES:
+        return {}
+    return {language: {purpose: RuntimeProfile(**fields) for purpose, fields in profiles.items()}
+            for language, profiles in data.get('profiles', {}).items()}
+
+
+def save_tuned(language: str, profiles: Dict[str, RuntimeProfile], path: str = TUNED_FILE) -> None:
+    data = {'cpu_count': CORES, 'profiles': {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous.get('cpu_count') == CORES:
+            data['profiles'] = previous.get('profiles', {})
+    data['profiles'].setdefault(language, {}).update(
+        {purpose: profile._asdict() for purpose, profile in profiles.items()})
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def get_profile(name: str, language: str) -> RuntimeProfile:
+    """Профіль за назвою для мови: підібраний auto-tune, якщо є, інакше вбудований."""
+    return load_tuned().get(language, {}).get(name) or PROFILES[name]
+
+
+def candidates(purpose: str) -> List[RuntimeProfile]:
+    """Варіанти для перебору: кількість потоків, що має сенс на цьому комп'ютері, з XLA і без."""
+    threads = sorted({1, max(1, CORES // 2), CORES})
+    base = PROFILES[purpose]
+    result = []
+    for intra in threads:
+        for inter in sorted({1, 2}):
+            for xla in (False, True):
+                opencv = intra if purpose == 'latency' else 1
+                name = f'{purpose}-intra{intra}-inter{inter}' + ('-xla' if xla else '')
+                result.append(base._replace(name=name, intra_op_threads=intra, inter_op_threads=inter,
+                                            opencv_threads=opencv, xla=xla))
+    return result
+
+
+def measure(profile: RuntimeProfile, purpose: str, language: str, files: List[str], repeats: int = 3,
+            batch_size: int = 16) -> float:
+    """
+    Оцінка профілю: для latency - медіана розпізнавання одного зображення в мілісекундах,
+    для throughput - зображень за секунду на весь комп'ютер, тобто швидкість одного процесу,
+    помножена на кількість процесів, що вміщаються на ядрах. Менше - краще в обох випадках,
+    тому пропускна здатність повертається з мінусом.
+
+    Пули потоків TensorFlow і OpenCV спільні для процесу і задаються першою сесією,
+    тому кожен профіль треба вимірювати в окремому процесі (див. autotune).
+    """
+    if language == 'English':
+        from engRecognition import EnglishRecognition as Recognition
+    else:
+        from ukrRecognition import UkrainianRecognition as Recognition
+
+    recognition = Recognition()
+    model = recognition.loadModel(apply(profile))
+    try:
+        # перший виклик компілює граф (і XLA-кластери) - його не рахуємо
+        recognition.inferBatch(model, files[:batch_size])
+        if purpose == 'latency':
+            seconds = []
+            for _ in range(repeats):
+                for fn in files:
+                    start = time.perf_counter()
+                    recognition.inferBatch(model, [fn])
+                    seconds.append(time.perf_counter() - start)
+            return 1000 * float(np.median(seconds))
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for i in range(0, len(files), batch_size):
+                recognition.inferBatch(model, files[i:i + batch_size])
+        per_process = repeats * len(files) / (time.perf_counter() - start)
+        return -per_process * max(1, CORES // max(1, profile.intra_op_threads))
+    finally:
+        model.close()
+
+
+def autotune(purpose: str, language: str = 'English', repeats: int = 3, save: bool = True) -> dict:
+    """Виміряти всі варіанти для purpose, кожен у свіжому процесі, зберегти найшвидший і повернути звіт."""
+    files = data_files(language)
+    report = {}
+    best = None
+    # spawn: процес не успадковує пули потоків, уже створені з налаштуваннями іншого профілю
+    context = mp.get_context('spawn')
+    for profile in candidates(purpose):
+        print('Measuring', profile.name)
+        try:
+            with context.Pool(1) as pool:
+                score = pool.apply(measure, (profile, purpose, language, files, repeats))
+        except Exception as e:
+            # наприклад, TensorFlow зібрано без XLA
+            report[profile.name] = {'error': str(e)}
+            continue
+        report[profile.name] = {'ms_per_image': score} if purpose == 'latency' else {'images_per_sec': -score}
+        if best is None or score < best[0]:
+            best = (score, profile)
+
+    if best is None:
+        raise RuntimeError('No runtime profile could be measured')
+    tuned = best[1]._replace(name=purpose)
+    if save:
+        save_tuned(language, {purpose: tuned})
+    return {'best': best[1].name, 'profile': tuned._asdict(), 'candidates': report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show runtime profiles or tune them for this host.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('show', help='print the profiles in effect')
+    parser_tune = subparsers.add_parser('tune', help='benchmark candidate profiles and persist the fastest')
+    parser_tune.add_argument('--purpose', choices=['latency', 'throughput', 'both'], default='both')
+    parser_tune.add_argument('--language', choices=['English', 'Ukrainian'], default='English')
+    parser_tune.add_argument('--repeats', type=int, default=3)
+    parser_tune.add_argument('--dry_run', action='store_true', help='do not write ' + TUNED_FILE)
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        print(json.dumps({language: {name: get_profile(name, language)._asdict() for name in PROFILES}
+                          for language in ('English', 'Ukrainian')}, indent=2))
+        return
+
+    purposes = ['latency', 'throughput'] if args.purpose == 'both' else [args.purpose]
+    report = {purpose: autotune(purpose, args.language, args.repeats, not args.dry_run) for purpose in purposes}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
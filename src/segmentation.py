@@ -0,0 +1,124 @@
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from typing import Callable, List, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+# рядок, до якого належить фрагмент, і його рамка на сторінці
+Segment = namedtuple('Segment', 'line, x, y, w, h')
+
+
+def binarize(img: np.ndarray) -> np.ndarray:
+    """Порогова бінаризація Оцу: чорнило - 255, тло - 0."""
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    img = cv2.GaussianBlur(img, (3, 3), 0)
+    _, binary = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    return binary
+
+
+def runs(mask: np.ndarray, max_gap: int = 0) -> List[Tuple[int, int]]:
+    """Відрізки [початок, кінець) істинних значень; відрізки з проміжком до max_gap зливаються."""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    result = []
+    for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+        if result and start - result[-1][1] <= max_gap:
+            result[-1] = (result[-1][0], end)
+        else:
+            result.append((start, end))
+    return result
+
+
+def find_lines(binary: np.ndarray, min_height: int = 8) -> List[Tuple[int, int]]:
+    """
+    Рядки тексту за горизонтальним профілем проєкції: рядок - відрізок рядків пікселів,
+    у яких є чорнило. Рядки, менші за min_height, вважаються шумом.
+    """
+    profile = np.count_nonzero(binary, axis=1)
+    # поодинокі пікселі шуму не створюють рядка
+    ink = profile > max(1, 0.005 * binary.shape[1])
+    lines = runs(ink, max_gap=2)
+    if not lines:
+        return []
+    # крапки над літерами і розриви в рядку менші за чверть типової висоти рядка
+    typical = np.median([end - start for start, end in lines])
+    lines = runs(ink, max_gap=max(2, int(typical // 4)))
+    return [(start, end) for start, end in lines if end - start >= min_height]
+
+
+def find_words(binary: np.ndarray, min_area: int = 20) -> List[Tuple[int, int, int, int]]:
+    """
+    Слова в рядку за зв'язними компонентами. Рядок розмивається по горизонталі на третину
+    його висоти, тож літери одного слова зливаються в одну компоненту, а пробіли - ні.
+    Повертає рамки (x, y, w, h) зліва направо.
+    """
+    height = binary.shape[0]
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, height // 3), max(3, height // 2)))
+    dilated = cv2.dilate(binary, kernel)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(dilated, connectivity=8)
+    # площа чорнила кожної компоненти до розмиття відсіює шум
+    ink = np.bincount(labels[binary > 0], minlength=count)
+
+    words = []
+    for label in range(1, count):
+        if ink[label] < min_area:
+            continue
+        x, _, w, _, _ = stats[label]
+        # рамка по вертикалі - за чорнилом у межах слова, а не за розмитою компонентою
+        rows = np.flatnonzero(np.count_nonzero(binary[:, x:x + w], axis=1))
+        words.append((int(x), int(rows[0]), int(w), int(rows[-1] - rows[0] + 1)))
+    return sorted(words)
+
+
+def segment_line(binary: np.ndarray, index: int, top: int, bottom: int, unit: str,
+                 margin: int = 4) -> List[Segment]:
+    """Фрагменти одного рядка: увесь рядок або його слова, з полем margin пікселів."""
+    page_height, page_width = binary.shape
+    line = binary[top:bottom]
+    if unit == 'line':
+        columns = np.flatnonzero(np.count_nonzero(line, axis=0))
+        boxes = [(int(columns[0]), 0, int(columns[-1] - columns[0] + 1), bottom - top)] if len(columns) else []
+    else:
+        boxes = find_words(line)
+
+    segments = []
+    for x, y, w, h in boxes:
+        x0, y0 = max(0, x - margin), max(0, top + y - margin)
+        x1, y1 = min(page_width, x + w + margin), min(page_height, top + y + h + margin)
+        segments.append(Segment(index, x0, y0, x1 - x0, y1 - y0))
+    return segments
+
+
+def segment_page(img: np.ndarray, unit: str = 'word', workers: int = None) -> List[Segment]:
+    """
+    Розбити сторінку на рядки і, якщо unit == 'word', на слова. Рядки обробляються
+    паралельно (OpenCV звільняє GIL), фрагменти повертаються в порядку читання:
+    рядки згори донизу, слова в рядку зліва направо.
+    """
+    assert unit in ('word', 'line')
+    binary = binarize(img)
+    lines = find_lines(binary)
+    with ThreadPool(workers) as pool:
+        per_line = pool.starmap(segment_line, [(binary, index, top, bottom, unit)
+                                               for index, (top, bottom) in enumerate(lines)])
+    return [segment for segments in per_line for segment in segments]
+
+
+def recognize_page(recognize_batch: Callable[[Sequence[np.ndarray]], Tuple[List[str], list]],
+                   img: np.ndarray, unit: str = 'word', workers: int = None) -> str:
+    """
+    Розпізнати сторінку: усі фрагменти передаються в recognize_batch одним викликом,
+    а текст збирається в порядку читання - слова через пробіл, рядки з нового рядка.
+    """
+    segments = segment_page(img, unit, workers)
+    if not segments:
+        return ''
+    crops = [img[s.y:s.y + s.h, s.x:s.x + s.w] for s in segments]
+    texts, _ = recognize_batch(crops)
+
+    lines = {}
+    for segment, text in zip(segments, texts):
+        lines.setdefault(segment.line, []).append(text)
+    return '\n'.join(' '.join(words) for _, words in sorted(lines.items()))
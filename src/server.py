@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+import instrumentation
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+           413: 'Payload Too Large', 503: 'Service Unavailable', 504: 'Gateway Timeout'}
+
+
+class Overloaded(Exception):
+    """Черга мікропакетування заповнена."""
+
+
+class MicroBatcher:
+    """
+        Збирає одночасні запити до однієї моделі в мікропакети.
+
+        Перший запит у черзі відкриває пакет, який далі чекає інших запитів не довше max_wait
+        секунд або до заповнення max_batch_size. Пакет розпізнається в окремому потоці, тож цикл
+        подій не блокується, а поки модель працює, наступний пакет уже збирається. Черга має
+        межу: якщо вона заповнена, запит одразу відхиляється, а не стоїть у черзі без кінця.
+        Запити, чий клієнт уже не чекає відповіді, вилучаються з пакету до розпізнавання.
+
+        ---
+
+        Атрибути
+        --------
+        infer_batch : Callable[[List[np.ndarray]], Tuple[List[str], list]]
+            Розпізнавання пакету зображень.
+        max_batch_size : int
+            Найбільша кількість зображень у пакеті.
+        max_wait : float
+            Найдовше очікування інших запитів після першого, у секундах.
+        max_queue : int
+            Найбільша кількість запитів, що чекають на пакет.
+
+        Методи
+        ------
+        submit(np.ndarray img, float timeout) -> Tuple[str, float]
+            Ставить зображення в чергу і чекає на результат не довше timeout секунд.
+        run()
+            Цикл збирання і розпізнавання пакетів.
+        stats() -> dict
+            Довжина черги та кількість розпізнаних пакетів і зображень.
+    """
+
+    def __init__(self, infer_batch: Callable[[List[np.ndarray]], Tuple[List[str], list]],
+                 max_batch_size: int = 32, max_wait: float = 0.005, max_queue: int = 256) -> None:
+        self.infer_batch = infer_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._queue = asyncio.Queue(max_queue)
+        # один потік на модель: пакети однієї моделі виконуються по черзі
+        self._executor = ThreadPoolExecutor(1)
+        self._batches = 0
+        self._images = 0
+
+    async def submit(self, img: np.ndarray, timeout: float) -> Tuple[str, float]:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((img, future))
+        except asyncio.QueueFull:
+            raise Overloaded()
+        # після тайм-ауту майбутнє скасовується, і пакет його пропускає
+        return await asyncio.wait_for(future, timeout)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [(img, future) for img, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                with instrumentation.span('server.batch', batch=len(batch)):
+                    texts, probs = await loop.run_in_executor(self._executor, self.infer_batch,
+                                                              [img for img, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self._batches += 1
+            self._images += len(batch)
+            for (_, future), text, prob in zip(batch, texts, probs):
+                if not future.done():
+                    future.set_result((text, prob))
+
+    def stats(self) -> dict:
+        return {'queued': self._queue.qsize(), 'batches': self._batches, 'images': self._images,
+                'mean_batch_size': self._images / self._batches if self._batches else 0.0}
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class RecognitionServer:
+    """
+        HTTP-сервіс розпізнавання поверх asyncio без сторонніх залежностей.
+
+        POST /recognize?language=English|Ukrainian - тіло запиту є закодованим зображенням
+        (PNG, JPEG тощо); відповідь - JSON з розпізнаним текстом і ймовірністю. GET /health
+        повертає стан черг, GET /metrics - метрики етапів у форматі Prometheus, якщо
+        сервер запущено з ними. Переповнена черга дає 503, перевищення часу очікування - 504.
+
+        ---
+
+        Атрибути
+        --------
+        batchers : Dict[str, MicroBatcher]
+            Мікропакетувальник для кожної мови.
+        timeout : float
+            Найдовше очікування результату одним запитом, у секундах.
+        max_body : int
+            Найбільший розмір тіла запиту в байтах.
+        metrics : instrumentation.PrometheusSink
+            Приймач метрик етапів або None.
+
+        Методи
+        ------
+        start(str host, int port)
+            Прогріває моделі і починає приймати з'єднання.
+        handle(StreamReader reader, StreamWriter writer)
+            Обслуговує одне з'єднання, можливо з кількома запитами.
+        close()
+            Зупиняє сервер і мікропакетувальники.
+    """
+
+    def __init__(self, languages: Sequence[str] = ('English', 'Ukrainian'), max_batch_size: int = 32,
+                 max_wait: float = 0.005, max_queue: int = 256, timeout: float = 10.0,
+                 max_body: int = 20 * 1024 ** 2, metrics: instrumentation.PrometheusSink = None) -> None:
+        self.languages = list(languages)
+        self.batchers: Dict[str, MicroBatcher] = {}
+        self.batcher_options = dict(max_batch_size=max_batch_size, max_wait=max_wait, max_queue=max_queue)
+        self.timeout = timeout
+        self.max_body = max_body
+        self.metrics = metrics
+        self._server = None
+        self._tasks = []
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8080) -> None:
+        # реєстр (і TensorFlow) потрібні лише для запуску моделей, а не для мікропакетування
+        from registry import registry
+
+        loop = asyncio.get_running_loop()
+        for language in self.languages:
+            recognizer = await loop.run_in_executor(None, registry.get, language)
+            self.batchers[language] = MicroBatcher(recognizer.recognizeBatch, **self.batcher_options)
+            self._tasks.append(asyncio.create_task(self.batchers[language].run()))
+        self._server = await asyncio.start_server(self.handle, host, port)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        for batcher in self.batchers.values():
+            batcher.close()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), 60)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self.respond(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                # тіло читається лише за Content-Length; chunked-кодування не підтримується
+                if 'transfer-encoding' in headers:
+                    await self.respond(writer, 411, {'error': 'send the image with Content-Length'},
+                                       keep_alive=False)
+                    break
+                length = headers.get('content-length', '0') or '0'
+                if not (length.isascii() and length.isdigit()):
+                    await self.respond(writer, 400, {'error': 'malformed Content-Length'}, keep_alive=False)
+                    break
+                length = int(length)
+                if length > self.max_body:
+                    await self.respond(writer, 413, {'error': 'image too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, payload, extra = await self.dispatch(method, target, body)
+                await self.respond(writer, status, payload, keep_alive, extra)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, object, dict]:
+        url = urlsplit(target)
+        if url.path == '/health':
+            return 200, {'status': 'ok', 'queues': {name: b.stats() for name, b in self.batchers.items()}}, {}
+        if url.path == '/metrics':
+            if self.metrics is None:
+                return 404, {'error': 'metrics are disabled'}, {}
+            return 200, self.metrics.dump(), {}
+        if url.path != '/recognize':
+            return 404, {'error': 'unknown path'}, {}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}, {'Allow': 'POST'}
+
+        language = parse_qs(url.query).get('language', ['English'])[0]
+        if language not in self.batchers:
+            return 400, {'error': 'unsupported language: ' + language}, {}
+        img = cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR) if body else None
+        if img is None:
+            return 400, {'error': 'cannot decode image'}, {}
+
+        try:
+            text, probability = await self.batchers[language].submit(img, self.timeout)
+        except Overloaded:
+            return 503, {'error': 'too many requests in queue'}, {'Retry-After': '1'}
+        except asyncio.TimeoutError:
+            return 504, {'error': 'recognition timed out'}, {}
+        except Exception as e:
+            return 500, {'error': str(e)}, {}
+        return 200, {'language': language, 'text': text, 'probability': probability}, {}
+
+    @staticmethod
+    async def respond(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool,
+                      extra: dict = None) -> None:
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload, ensure_ascii=False).encode(), 'application/json'
+        head = [f'HTTP/1.1 {status} {REASONS.get(status, "Internal Server Error")}',
+                f'Content-Type: {content_type}', f'Content-Length: {len(body)}',
+                'Connection: ' + ('keep-alive' if keep_alive else 'close')]
+        head += [f'{name}: {value}' for name, value in (extra or {}).items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(args) -> None:
+    metrics = None
+    if args.metrics:
+        metrics = instrumentation.PrometheusSink()
+        instrumentation.enable(metrics)
+    server = RecognitionServer(args.languages, args.max_batch_size, args.max_wait_ms / 1000, args.max_queue,
+                               args.timeout, metrics=metrics)
+    await server.start(args.host, args.port)
+    print(f'Serving on http://{args.host}:{server.port}')
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the warm recognizers over HTTP with dynamic micro-batching.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--languages', nargs='+', choices=['English', 'Ukrainian'], default=['English', 'Ukrainian'])
+    parser.add_argument('--max_batch_size', type=int, default=32)
+    parser.add_argument('--max_wait_ms', type=float, default=5.0, help='how long a batch waits for more requests')
+    parser.add_argument('--max_queue', type=int, default=256, help='queued requests per language before 503')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds a request may wait before 504')
+    parser.add_argument('--profile', choices=['default', 'latency', 'throughput'], default='latency',
+                        help='runtime profile the models are loaded with')
+    parser.add_argument('--metrics', action='store_true', help='expose per-stage metrics on /metrics')
+    args = parser.parse_args()
+    from registry import registry
+    registry.set_profile(args.profile)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
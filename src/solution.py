@@ -1,10 +1,7 @@
-from engRecognition import EnglishRecognition
 from PyQt6.QtWidgets import *
 from docx import Document
 from database import *
-from datetime import date
-import pandas as pd
-from ukrRecognition import UkrainianRecognition
+from datetime import date, timedelta
 
 class Solution:
     """
@@ -23,7 +20,17 @@ class Solution:
         Методи
         ------
         getParameters()
-            Отримання заданих параметрів і запуск розпізнавання тексту.
+            Отримання заданих параметрів і постановка розпізнавання тексту в чергу фонового потоку.
+        cancelRecognition()
+            Скасування всіх поставлених розпізнавань.
+        onJobProgress(int job_id, int percent, str stage)
+            Оновлення індикатора виконання.
+        onJobFinished(int job_id, bool lang, bool coding, str path, str[] recognized)
+            Отримання результату розпізнавання з фонового потоку.
+        onJobFailed(int job_id, str message)
+            Повідомлення про помилку розпізнавання.
+        onQueueChanged(int pending)
+            Оновлення стану черги розпізнавань.
         showResult(int lang, int coding, str path, str[] recognized)
             Виведення результатів розпізнавання в інтерфейс.
         databaseSaving()
@@ -32,8 +39,10 @@ class Solution:
             Збереження результату до файлу.
         historyPageUpdate()
             Оновлення сторінки історії під час роботи програми.
-        getItem(QTableWidgetItem item)
-            Отримання інформації про запис в історії за подвійним натисканням.
+        historySearch()
+            Пошук в історії за текстом, мовою і датою.
+        getItem(QModelIndex index)
+            Отримання запису історії за первинним ключем за подвійним натисканням.
     """
 
     def __init__(self, window):
@@ -43,12 +52,32 @@ class Solution:
         path = self.window.filename_edit.displayText()
         language = self.window.ukrLang.isChecked()
         coding = self.window.asciiCoding.isChecked()
+        page = self.window.pageMode.isChecked()
         if path != "":
-            if language:
-                recognized = UkrainianRecognition().main(path)
-            else:
-                recognized = EnglishRecognition().main({"mode":"infer","img_file":path})
-            self.showResult(language,coding,path,recognized)
+            # розпізнавання виконується у фоновому потоці, результат прийде сигналом
+            self.window.worker.submit(language, coding, path, page)
+
+    def cancelRecognition(self):
+        self.window.worker.cancelAll()
+        self.window.progressBar.setValue(0)
+        self.window.progressLabel.setText("Cancelled")
+
+    def onJobProgress(self, job_id, percent, stage):
+        self.window.progressBar.setValue(percent)
+        self.window.progressLabel.setText(stage)
+
+    def onJobFinished(self, job_id, lang, coding, path, recognized):
+        self.showResult(lang, coding, path, recognized)
+
+    def onJobFailed(self, job_id, message):
+        self.window.progressBar.setValue(0)
+        self.window.progressLabel.setText("Failed")
+        QMessageBox.warning(self.window, "Recognition failed", message)
+
+    def onQueueChanged(self, pending):
+        self.window.cancelButton.setEnabled(pending > 0)
+        if pending > 1:
+            self.window.progressLabel.setText(f"{pending} images in queue")
 
     def showResult(self, lang, coding, path, recognized):
         self.window.filename2.setText(path)
@@ -95,30 +124,25 @@ class Solution:
             print(f"Error: {e}")
 
     def historyPageUpdate(self):
-        a = pd.read_sql("select * from records", self.window.engine)
-        a = a.sort_values(by=["id"], ascending=False)
-        self.window.tableWidget.setRowCount(a.shape[0])
-        self.window.tableWidget.setColumnCount(6)
-        self.window.tableWidget.setHorizontalHeaderLabels(["Id", "Date", "File", "Language", "Coding","Result"])
-
-        # Заповнення таблиці історії
-        for i in range(a.shape[0]):
-            for j in range(6):
-                item = QTableWidgetItem(str(a.iat[i, j]))
-                self.window.tableWidget.setItem(i, j, item)
+        # вибирається лише перша сторінка, решта підвантажується під час прокручування
+        self.historySearch()
 
         # Ресайз колонок, щоб підігнати під зміст
-        self.window.tableWidget.resizeColumnsToContents()
-        self.window.tableWidget.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.window.tableWidget.itemDoubleClicked.connect(self.getItem)
+        self.window.tableView.resizeColumnsToContents()
 
         self.window.stackedWidget.setCurrentIndex(3)
 
-    def getItem(self, item):
-        a = pd.read_sql("select * from records", self.window.engine)
-        a = a.sort_values(by=["id"], ascending=False)
-        res = a.iloc[item.row()]
+    def historySearch(self):
+        language = self.window.searchLanguage.currentIndex()
+        period = [None, 0, 7, 30, 365][self.window.searchPeriod.currentIndex()]
+        self.window.historyModel.setFilter(
+            self.window.searchEdit.text(),
+            [None, "English", "Ukrainian"][language],
+            None if period is None else date.today() - timedelta(days=period))
+
+    def getItem(self, index):
+        res = self.window.session.get(Record, self.window.historyModel.recordId(index.row()))
 
         self.coding = res.coding
         self.window.result3.label.setText(res.result)
-        self.window.stackedWidget.setCurrentIndex(2)
\ No newline at end of file
+        self.window.stackedWidget.setCurrentIndex(2)
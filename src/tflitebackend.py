@@ -0,0 +1,152 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+import ctc
+from dataloaderIAM import Batch
+from instrumentation import span
+from model import DecoderType
+from wordbeamsearch import LanguageModel, WordBeamSearch
+
+# інтерпретатор LiteRT або tflite_runtime, якщо встановлений, інакше - з TensorFlow
+try:
+    from ai_edge_litert.interpreter import Interpreter
+except ImportError:
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+
+VARIANTS = ('fp32', 'fp16', 'int8')
+
+
+def tflite_path(language: str, variant: str) -> str:
+    """Шлях до експортованої моделі мови у заданому варіанті."""
+    return f'../model/{language.lower()}-{variant}.tflite'
+
+
+class TFLiteNetwork:
+    """
+        Експортована в TFLite мережа з одним входом і одним виходом фіксованої форми.
+
+        Атрибути
+        --------
+        path : str
+            Шлях до файлу .tflite.
+        input_shape : Tuple[int, ...]
+            Форма входу мережі, включно з розміром пакету.
+
+        Методи
+        ------
+        run(np.ndarray images) -> np.ndarray
+            Обчислює вихід мережі для кожного зображення; пакет обробляється частинами розміру входу.
+        memory_size() -> int
+            Розмір файлу моделі в байтах.
+        close()
+            Звільнення інтерпретатора.
+    """
+
+    def __init__(self, path: str, num_threads: int = None) -> None:
+        self.path = path
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self.input_shape = tuple(self._input['shape'])
+
+    def run(self, images: np.ndarray) -> np.ndarray:
+        step = self.input_shape[0]
+        outputs = []
+        for i in range(0, len(images), step):
+            chunk = np.asarray(images[i:i + step], dtype=self._input['dtype'])
+            # останній неповний пакет доповнюється нулями
+            if len(chunk) < step:
+                chunk = np.concatenate([chunk, np.zeros((step - len(chunk),) + chunk.shape[1:], chunk.dtype)])
+            self.interpreter.set_tensor(self._input['index'], chunk)
+            self.interpreter.invoke()
+            outputs.append(self.interpreter.get_tensor(self._output['index'])[:len(images) - i])
+        return np.concatenate(outputs)
+
+    def memory_size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def close(self) -> None:
+        self.interpreter = None
+
+
+class TFLiteModel(TFLiteNetwork):
+    """
+        Англійська модель, експортована в TFLite, з тим самим інтерфейсом розпізнавання, що й Model.
+
+        Мережа повертає ймовірності символів (B, T, C) для зображень фіксованої ширини;
+        декодування і оцінка ймовірності виконуються в NumPy тими самими декодерами.
+
+        Атрибути
+        --------
+        charList : List[str]
+            Список можливих символів для розпізнавання.
+        decoder_type : int
+            Тип декодера CTC (DecoderType).
+        beam_width : int
+            Ширина променя для декодерів з пошуком променем.
+        img_size : Tuple[int, int]
+            Розмір вхідного зображення (ширина, висота), з яким експортовано мережу.
+
+        Методи
+        ------
+        infer_batch(Batch batch, bool calc_probability = False, bool char_confidence = False)
+            Розпізнавання тексту з пакету даних, як Model.infer_batch.
+    """
+
+    def __init__(self, path: str, charList: List[str], decoder_type: int = DecoderType.BestPath,
+                 beam_width: int = 25, num_threads: int = None) -> None:
+        super().__init__(path, num_threads)
+        self.charList = charList
+        self.decoder_type = decoder_type
+        self.beam_width = beam_width
+        self.img_size = self.input_shape[1:]
+        if decoder_type == DecoderType.WordBeamSearch:
+            self.decoder = WordBeamSearch(LanguageModel.load('../data/corpus.txt', charList), beam_width=beam_width)
+
+    def infer_batch(self, batch: Batch, calc_probability: bool = False, char_confidence: bool = False):
+        # етапи мають ті самі назви, що й у Model, щоб рушії можна було порівняти
+        with span('model.run', batch=len(batch.imgs)):
+            mats = self.run(batch.imgs)
+        blank = len(self.charList)
+
+        with span('model.decode', batch=len(batch.imgs)):
+            if self.decoder_type == DecoderType.BestPath:
+                label_strs = [ctc.best_path(mat, blank)[0] for mat in mats]
+            elif self.decoder_type == DecoderType.BeamSearch:
+                label_strs = [nbest[0][0] for nbest in ctc.prefix_beam_search_batch(mats, blank, self.beam_width)]
+            else:
+                label_strs = [self.decoder.decode(mat) for mat in mats]
+            texts = [''.join([self.charList[c] for c in labelStr]) for labelStr in label_strs]
+
+        probs = None
+        if calc_probability:
+            with span('model.probability', batch=len(batch.imgs)):
+                if char_confidence:
+                    assert self.decoder_type == DecoderType.BestPath
+                    probs = [ctc.best_path(mat, blank)[1] for mat in mats]
+                else:
+                    log_mats = np.log(np.maximum(mats, 1e-30))
+                    probs = np.exp([ctc.label_log_probability(log_mat, labels, blank)
+                                    for log_mat, labels in zip(log_mats, label_strs)])
+        return texts, probs
+
+
+class UkrainianTFLiteModel(TFLiteNetwork):
+    """
+        Українська модель, експортована в TFLite, з тим самим інтерфейсом, що й UkrainianModel.
+
+        Методи
+        ------
+        predict(np.ndarray images) -> np.ndarray
+            Обчислює ймовірності символів для пакету зображень.
+    """
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self.run(images)
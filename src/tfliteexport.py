@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import time
+from typing import Iterator, List, Sequence
+
+import cv2
+import editdistance
+import numpy as np
+import tensorflow as tf
+
+from datafiles import data_files
+from tflitebackend import VARIANTS, tflite_path
+
+# ширина і висота входу експортованої англійської мережі
+EXPORT_IMG_SIZE = (256, 32)
+
+
+def convert(sess: tf.compat.v1.Session, inputs: list, outputs: list, variant: str,
+            calibration: Sequence[np.ndarray] = None) -> bytes:
+    """
+    Перетворити підграф сесії на модель TFLite.
+
+    fp16 зберігає ваги у половинній точності; int8 квантизує ваги й активації за діапазонами,
+    зібраними на калібрувальних зображеннях, залишаючи у float операції без int8-ядер.
+    """
+    converter = tf.compat.v1.lite.TFLiteConverter.from_session(sess, inputs, outputs)
+    if variant == 'fp16':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif variant == 'int8':
+        assert calibration is not None and len(calibration)
+
+        def representative_dataset() -> Iterator[List[np.ndarray]]:
+            for img in calibration:
+                yield [img[None].astype(np.float32)]
+
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset
+    return converter.convert()
+
+
+def english_calibration_images(data_dir: str = None, num_samples: int = 200) -> List[np.ndarray]:
+    """Зображення для калібрування int8: валідаційний набір IAM або, без нього, зображення з data/."""
+    from dataloaderIAM import DataLoaderIAM
+    from path import Path
+    from preprocessor import Preprocessor
+
+    preprocessor = Preprocessor(EXPORT_IMG_SIZE)
+    if data_dir:
+        loader = DataLoaderIAM(Path(data_dir), num_samples)
+        loader.validation_set()
+        return list(preprocessor.process_batch(loader.get_next()).imgs)
+    # вхід експортованої мережі - слово 256x32, тож рядки спотворили б діапазони активацій
+    files = data_files('English', lines=False)[:num_samples]
+    return [preprocessor.process_img(cv2.imread(fn, cv2.IMREAD_GRAYSCALE)) for fn in files]
+
+
+def export_english(variants: Sequence[str] = VARIANTS, data_dir: str = None, num_samples: int = 200) -> List[str]:
+    """Експортувати відновлену англійську мережу з фіксованою шириною входу."""
+    from engRecognition import EnglishRecognition
+    from model import Model
+
+    model = Model(EnglishRecognition().fileCharList(), must_restore=True, inference_only=True,
+                  input_shape=(1,) + EXPORT_IMG_SIZE)
+    with model.graph.as_default():
+        probs = tf.nn.softmax(model.rnn_out_3d, name='probs')
+
+    calibration = english_calibration_images(data_dir, num_samples) if 'int8' in variants else None
+    paths = []
+    for variant in variants:
+        path = tflite_path('English', variant)
+        with open(path, 'wb') as f:
+            f.write(convert(model.sess, [model.input_imgs], [probs], variant, calibration))
+        print('Exported', path)
+        paths.append(path)
+    model.close()
+    return paths
+
+
+def inference_layer(layer: tf.keras.layers.Layer) -> tf.keras.layers.Layer:
+    """Копія шару Keras для експорту: без dropout, рекурентні шари розгорнуті."""
+    config = layer.get_config()
+    inner = config['layer']['config'] if isinstance(layer, tf.keras.layers.Bidirectional) else config
+    for key in ('rate', 'dropout', 'recurrent_dropout'):
+        if key in inner:
+            inner[key] = 0.0
+    if 'unroll' in inner:
+        inner['unroll'] = True
+    return layer.__class__.from_config(config)
+
+
+def export_ukrainian(variants: Sequence[str] = VARIANTS, num_samples: int = 200) -> List[str]:
+    """Експортувати українську мережу передбачення з розміром пакету 1."""
+    from ukrRecognition import UkrainianModel, UkrainianRecognition
+
+    recognition = UkrainianRecognition()
+    graph = tf.Graph()
+    sess = tf.compat.v1.Session(graph=graph)
+    with graph.as_default(), sess.as_default():
+        prediction_model = UkrainianModel.build(recognition.checkpoint)
+        # копія для розпізнавання: статичний розмір пакету, без dropout і з розгорнутими LSTM,
+        # бо цикл while з масками dropout не перетворюється і не квантизується
+        image_input = tf.keras.Input(batch_shape=(1,) + prediction_model.input_shape[1:])
+        fixed = tf.keras.models.clone_model(prediction_model, input_tensors=image_input,
+                                            clone_function=inference_layer)
+        fixed.set_weights(prediction_model.get_weights())
+
+    calibration = None
+    if 'int8' in variants:
+        files = data_files('Ukrainian')[:num_samples]
+        calibration = recognition.loadImages(files)
+
+    paths = []
+    for variant in variants:
+        path = tflite_path('Ukrainian', variant)
+        with open(path, 'wb') as f:
+            f.write(convert(sess, fixed.inputs, fixed.outputs, variant, calibration))
+        print('Exported', path)
+        paths.append(path)
+    sess.close()
+    return paths
+
+
+def compare_backends(language: str, variants: Sequence[str] = VARIANTS) -> dict:
+    """
+    Порівняти TFLite-варіанти з мережею TensorFlow на зображеннях з data/.
+
+    Усі рушії отримують однаково підготовлені входи фіксованого розміру, тож різниця
+    показує лише втрати від перетворення і квантизації. Еталонних текстів для цих
+    зображень немає, тому точність вимірюється відносно результату TensorFlow: частка
+    однакових текстів і частка символьних розбіжностей. Затримка - медіана розпізнавання
+    одного зображення прогрітою моделлю.
+    """
+    from dataloaderIAM import Batch
+
+    if language == 'English':
+        from engRecognition import EnglishRecognition as Recognition
+        from preprocessor import Preprocessor
+        preprocessor = Preprocessor(EXPORT_IMG_SIZE)
+        images = [preprocessor.process_img(cv2.imread(fn, cv2.IMREAD_GRAYSCALE))
+                  for fn in data_files('English', lines=False)]
+
+        def recognize(recognition, model, img):
+            return model.infer_batch(Batch(img[None], None, 1))[0][0]
+    else:
+        from ukrRecognition import UkrainianRecognition as Recognition
+        images = Recognition().loadImages(data_files('Ukrainian'))
+
+        def recognize(recognition, model, img):
+            return recognition.decodeBatchPredictions(model.predict(img[None]))[0]
+
+    def run(recognition):
+        model = recognition.loadModel()
+        recognize(recognition, model, images[0])
+        texts, times = [], []
+        for img in images:
+            start = time.perf_counter()
+            texts.append(recognize(recognition, model, img))
+            times.append(time.perf_counter() - start)
+        size = model.memory_size()
+        model.close()
+        return texts, {'ms_per_image': 1000 * float(np.median(times)), 'size_mb': size / 1024 ** 2}
+
+    reference, report = run(Recognition())
+    results = {'tf': report}
+    for variant in variants:
+        if not os.path.exists(tflite_path(language, variant)):
+            continue
+        texts, report = run(Recognition(backend='tflite', variant=variant))
+        errors = sum(editdistance.eval(text, ref) for text, ref in zip(texts, reference))
+        report['agreement'] = float(np.mean([text == ref for text, ref in zip(texts, reference)]))
+        report['char_diff_rate'] = errors / max(sum(len(ref) for ref in reference), 1)
+        results['tflite_' + variant] = report
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the recognition networks to TFLite and compare the backends.')
+    parser.add_argument('--language', choices=['English', 'Ukrainian', 'both'], default='both')
+    parser.add_argument('--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--data_dir', help='IAM dataset for int8 calibration of the English network')
+    parser.add_argument('--calibration_samples', type=int, default=200)
+    parser.add_argument('--skip_export', action='store_true', help='only compare already exported models')
+    parser.add_argument('--report', help='file to write the comparison report to')
+    args = parser.parse_args()
+
+    languages = ['English', 'Ukrainian'] if args.language == 'both' else [args.language]
+    if not args.skip_export:
+        if 'English' in languages:
+            export_english(args.variants, args.data_dir, args.calibration_samples)
+        if 'Ukrainian' in languages:
+            export_ukrainian(args.variants, args.calibration_samples)
+
+    report = {language: compare_backends(language, args.variants) for language in languages}
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,28 @@
+import os
 from keras.applications import VGG16
 import tensorflow as tf
 from keras.models import Model
 import keras.layers as layers
 from keras.layers import Dense, Input, Bidirectional, LSTM, Reshape, Dropout
+import cv2
 import numpy as np
+import ctc
+import runtime
+from instrumentation import span
+from tflitebackend import UkrainianTFLiteModel, tflite_path
+
+# символи, які розпізнає українська модель; індекс 0 зарезервовано, останній клас - пропуск CTC
+VOCAB = ["\u0425", "!", "\u043b", "N", "\u0414", "c", "\u041a", "'", "a", "5", "6", "s", "\u044b", "\u0417",
+         "\u044e", "\u0445", ":", "\u041e", "\u0422", "\u0449", "\u0401", " ", "\u043a", "\u0441", "=", "+",
+         "\u0432", "\u0426", "\u0444", "\u0447", "\u042b", "[", "\u0418", "B", "\u0433", "4", "\u0435", "\u0443",
+         "7", "?", "\u044a", ")", "\u0442", "\u044c", "\u0427", "\u0424", "\u0411", "\u0437", "\u043c", "\u041c",
+         "I", "O", "9", "\u0416", "\u042e", "}", "\u0429", "\u043d", "n", "3", ",", "\u0439", "\u044f", "]",
+         "\u041f", "\u0438", "\u2116", "\u0421", "\"", "t", "V", "(", "\u043f", "\u0440", "e", "l", "r", "\u0448",
+         "\u0431", "M", "/", "\u0415", "2", "\u042d", "\u0434", "\u0436", "_", "\u042f", "|", "\u0410", "0",
+         "\u041b", "\u0420", "8", ";", "1", "-", "<", "\u0451", "\u0430", "z", "\u044d", "b", "\u0423", "\u0446",
+         "\u0428", "\u0412", "\u043e", ">", ".", "\u041d", "\u0413", "T", "p", "*", "k", "y", "F", "A", "H", "u",
+         "v", "g", "K", "f", "D", "d", "R", "L", "q", "\u042c", "Y", "X", "C", "i", "o", "S", "J", "G", "%", "w",
+         "x", "U", "E", "j", "h", "m", "W", "P"]
 
 class CTCLayer(layers.Layer):
     """
@@ -34,129 +53,266 @@ class CTCLayer(layers.Layer):
         # At test time, just return the computed predictions
         return y_pred
 
+class UkrainianModel:
+    """
+        Модель для розпізнавання рукописного тексту українською мовою, завантажена у власний граф.
+
+        Для розпізнавання потрібна лише частина мережі від зображення до target_dense. Вона один раз
+        експортується поруч із вагами навчання у заморожений граф (GraphDef з вагами-константами)
+        і надалі імпортується з нього без побудови VGG16, навчальної частини і шарів Keras, тож
+        для запуску не потрібні ні мережа, ні ваги ImageNet. Назва виходу, яку дає Keras, записується
+        в сам граф константою output_name. Експорт повторюється, якщо файл ваг новіший за
+        експортований або граф експортовано без назви виходу.
+
+        Атрибути:
+        ---------
+        graph : tf.Graph
+            Власний граф моделі, незалежний від графа за замовчуванням.
+        sess : tf.compat.v1.Session
+            Сесія TensorFlow, у якій виконується граф.
+        path : str
+            Файл експортованого графа.
+        input : tf.Tensor
+            Вхід зображень (N, 200, 50, 3).
+        output : tf.Tensor
+            Вихід шару target_dense - ймовірності символів.
+
+        Методи:
+        -------
+        exported_path(weights: str) -> str
+            Шлях до експортованого графа для файлу ваг.
+        export(weights: str, path: str) -> tf.compat.v1.GraphDef
+            Будує модель передбачення з ваг навчання, заморожує її граф і записує у файл.
+        build(weights: str) -> keras.Model
+            Будує навчальну мережу, завантажує ваги й виділяє модель передбачення.
+        predict(images: np.ndarray) -> np.ndarray
+            Обчислює ймовірності символів для пакету зображень.
+        memory_size() -> int
+            Оцінка обсягу пам'яті, який займають ваги моделі.
+        close()
+            Звільнення сесії TensorFlow.
+        """
+
+    # назва входу моделі передбачення і вузла з назвою її виходу в експортованому графі
+    inputName = "image_input:0"
+    outputNameNode = "output_name"
+
+    def __init__(self, weights: str = "best-model.h5", path: str = None,
+                 session_config: tf.compat.v1.ConfigProto = None) -> None:
+        self.path = path or self.exported_path(weights)
+        # експортований граф чинний, доки ваги навчання не оновлено
+        if os.path.exists(self.path) and (not os.path.exists(weights)
+                                          or os.path.getmtime(self.path) >= os.path.getmtime(weights)):
+            graph_def = tf.compat.v1.GraphDef()
+            with open(self.path, "rb") as f:
+                graph_def.ParseFromString(f.read())
+            if not any(node.name == self.outputNameNode for node in graph_def.node):
+                graph_def = self.export(weights, self.path)
+        else:
+            graph_def = self.export(weights, self.path)
+
+        self.graph = tf.Graph()
+        with self.graph.as_default():
+            tf.compat.v1.import_graph_def(graph_def, name="")
+        self.sess = tf.compat.v1.Session(graph=self.graph, config=session_config)
+        self.input = self.graph.get_tensor_by_name(self.inputName)
+        self.output = self.graph.get_tensor_by_name(self.sess.run(self.outputNameNode + ":0").decode())
+        self._size = graph_def.ByteSize()
+
+    @staticmethod
+    def exported_path(weights: str) -> str:
+        return os.path.splitext(weights)[0] + "-prediction.pb"
+
+    @classmethod
+    def export(cls, weights: str, path: str = None) -> tf.compat.v1.GraphDef:
+        graph = tf.Graph()
+        with graph.as_default(), tf.compat.v1.Session(graph=graph) as sess:
+            prediction_model = cls.build(weights)
+            # назва виходу залежить від версії Keras, тож зберігається разом із графом
+            tf.constant(prediction_model.output.name, name=cls.outputNameNode)
+            nodes = [prediction_model.output.op.name, cls.outputNameNode]
+            graph_def = tf.compat.v1.graph_util.convert_variables_to_constants(sess, graph.as_graph_def(), nodes)
+            graph_def = tf.compat.v1.graph_util.extract_sub_graph(graph_def, nodes)
+
+        if path:
+            # інші процеси (працівники bulk) можуть саме читати path, тож файл замінюється атомарно;
+            # тимчасове ім'я своє в кожного процесу, що експортує одночасно
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(graph_def.SerializeToString())
+                os.replace(tmp, path)
+            except OSError as e:
+                # без права запису граф просто експортується під час кожного запуску
+                print("Error:", e)
+        return graph_def
+
+    @staticmethod
+    def build(weights: str) -> Model:
+        # ваги VGG16 теж містяться у файлі ваг, тож ImageNet не завантажується
+        vgg = VGG16(include_top=False, weights=None, input_shape=(200, 50, 3))
+
+        conv1 = vgg.get_layer("block1_conv1")
+        conv2 = vgg.get_layer("block1_conv2")
+        pool1 = vgg.get_layer("block1_pool")
+
+        conv3 = vgg.get_layer("block2_conv1")
+        conv4 = vgg.get_layer("block2_conv2")
+        pool2 = vgg.get_layer("block2_pool")
+
+        img_input = Input(shape=(200, 50, 3), name="image_input", dtype="float32")
+        lbl_input = Input(shape=(None,), dtype="float32")
+
+
+        x = conv1(img_input)
+        x = conv2(x)
+        x = pool1(x)
+        x = layers.BatchNormalization()(x)
+        x = conv3(x)
+        x = conv4(x)
+        x = pool2(x)
+        x = layers.BatchNormalization()(x)
+        x = layers.Conv2D(
+            64,
+            (3, 3),
+            activation="relu",
+            kernel_initializer="he_normal",
+            padding="same",
+            name="Conv1",
+        )(x)
+        x = layers.BatchNormalization()(x)
+        x = Reshape(((200 // 4), (50 // 4) * 64))(x)
+        x = Dense(64, activation="relu", kernel_initializer="he_normal")(x)
+        x = Dropout(0.3)(x)
+        x = Bidirectional(LSTM(256, return_sequences=True, dropout=0.3))(x)
+        x = Bidirectional(LSTM(128, return_sequences=True, dropout=0.3))(x)
+
+        x = Dense(151, activation="softmax", name="target_dense")(x)
+        output = CTCLayer()(lbl_input, x)
+        model = Model([img_input, lbl_input], output)
+
+        model.load_weights(weights)
+
+        prediction_model = tf.keras.models.Model(
+            model.get_layer(name="image_input").input, model.get_layer(name="target_dense").output
+        )
+        return prediction_model
+
+    def predict(self, images: np.ndarray) -> np.ndarray:
+        return self.sess.run(self.output, {self.input: images})
+
+    def memory_size(self) -> int:
+        # ваги - майже весь обсяг замороженого графа
+        return self._size
+
+    def close(self) -> None:
+        self.sess.close()
+
+
 class UkrainianRecognition:
     """
         Клас для розпізнавання рукописного тексту українською мовою.
 
         Методи:
         -------
-        loadImage(path: str) -> tf.Tensor
+        loadImage(path: str) -> np.ndarray
             Завантажує зображення з диску, обробляє та підготовує його для подальшого використання в моделі.
 
-        decodeBatchPredictions(pred: np.ndarray, num_to_char: Dict[int, str]) -> str
-            Декодує прогнози моделі в текст.
+        loadImages(paths: List[str | np.ndarray]) -> np.ndarray
+            Завантажує кілька зображень (шляхів або масивів) одразу в суцільний масив float32 (N, 200, 50, 3).
+
+        decodeBatchPredictions(pred: np.ndarray) -> List[str]
+            Жадібно декодує прогнози пакету в текст для кожного зображення.
+
+        decodeBatchBeamSearch(pred: np.ndarray, topK: int) -> List[List[Tuple[str, float]]]
+            Декодує прогнози пакету пошуком променем, повертаючи topK гіпотез для кожного зображення.
+
+        loadModel(sessionConfig: tf.compat.v1.ConfigProto = None) -> UkrainianModel | UkrainianTFLiteModel
+            Завантажує модель для розпізнавання обраним рушієм з заданими налаштуваннями сесії.
+
+        infer(model: UkrainianModel, path: str) -> List[str]
+            Розпізнає текст з заданого зображення прогрітою моделлю.
+
+        inferBatch(model: UkrainianModel, paths: List[str]) -> Tuple[List[str], List[None]]
+            Розпізнає текст з кількох зображень одним викликом моделі.
 
         main(path: str) -> List[str]
             Основний метод для обробки зображення та отримання розпізнаного тексту.
         """
+    # ширина і висота, до яких масштабуються зображення
+    imgSize = (200, 50)
+
+    def __init__(self, beamWidth: int = 0, backend: str = "tf", variant: str = "fp32"):
+        # ширина променя; 0 - жадібне декодування
+        self.beamWidth = beamWidth
+        # рушій: "tf" - модель Keras, "tflite" - експортована модель у заданому варіанті
+        self.backend = backend
+        self.checkpoint = "best-model.h5" if backend == "tf" else tflite_path("Ukrainian", variant)
+        char_to_num = {k: v + 1 for v, k in enumerate(VOCAB)}
+        self.num_to_char = {v: k for k, v in char_to_num.items()}
+
     def loadImage(self, path):
-        img = tf.io.read_file(path)
-        # 2. Decode and convert to grayscale
-        img = tf.io.decode_image(img, channels=3)
-        # 3. Convert to float32 in [0, 1] range
-        img = tf.image.convert_image_dtype(img, tf.float32)
-        # 4. Resize to the desired size
-        with tf.compat.v1.Session() as sess:
-            img = sess.run(img)
-            img = tf.image.resize(img, [50, 200])
-            img = sess.run(img)
-            # 5. Transpose the image because we want the time
-            # dimension to correspond to the width of the image.
-            img = tf.transpose(img, perm=[1, 0, 2])
-            img = sess.run(img)
-        return img
-
-    def decodeBatchPredictions(self, pred, num_to_char):
-        input_len = np.ones(pred.shape[0]) * pred.shape[1]
-        results = tf.keras.backend.ctc_decode(pred, input_length=input_len, greedy=True)[0][0][:, :23]
-        with tf.compat.v1.Session() as sess:
-            results=sess.run(results)
-        strings = [num_to_char.get(i, '') for i in results[0]]
-        strings = "".join(strings)
-        return strings
+        return self.loadImages([path])[0]
 
-    def main(self, path):
-            vocab = ["\u0425", "!", "\u043b", "N", "\u0414", "c", "\u041a", "'", "a", "5", "6", "s", "\u044b", "\u0417",
-                     "\u044e", "\u0445", ":", "\u041e", "\u0422", "\u0449", "\u0401", " ", "\u043a", "\u0441", "=", "+",
-                     "\u0432", "\u0426", "\u0444", "\u0447", "\u042b", "[", "\u0418", "B", "\u0433", "4", "\u0435", "\u0443",
-                     "7", "?", "\u044a", ")", "\u0442", "\u044c", "\u0427", "\u0424", "\u0411", "\u0437", "\u043c", "\u041c",
-                     "I", "O", "9", "\u0416", "\u042e", "}", "\u0429", "\u043d", "n", "3", ",", "\u0439", "\u044f", "]",
-                     "\u041f", "\u0438", "\u2116", "\u0421", "\"", "t", "V", "(", "\u043f", "\u0440", "e", "l", "r", "\u0448",
-                     "\u0431", "M", "/", "\u0415", "2", "\u042d", "\u0434", "\u0436", "_", "\u042f", "|", "\u0410", "0",
-                     "\u041b", "\u0420", "8", ";", "1", "-", "<", "\u0451", "\u0430", "z", "\u044d", "b", "\u0423", "\u0446",
-                     "\u0428", "\u0412", "\u043e", ">", ".", "\u041d", "\u0413", "T", "p", "*", "k", "y", "F", "A", "H", "u",
-                     "v", "g", "K", "f", "D", "d", "R", "L", "q", "\u042c", "Y", "X", "C", "i", "o", "S", "J", "G", "%", "w",
-                     "x", "U", "E", "j", "h", "m", "W", "P"]
-
-            images = []
-            img=self.loadImage(path)
-            images.append(img)
-
-            images = np.array(images)
-
-            char_to_num = {k: v + 1 for v, k in enumerate(vocab)}
-            num_to_char = {v: k for k, v in char_to_num.items()}
+    def loadImages(self, paths) -> np.ndarray:
+        width, height = self.imgSize
+        images = np.empty((len(paths), width, height, 3), np.float32)
+        for image, path in zip(images, paths):
+            # decode as RGB, like tf.io.decode_image(channels=3); arrays are BGR or grayscale, as in OpenCV
+            img = path if isinstance(path, np.ndarray) else cv2.imread(str(path), cv2.IMREAD_COLOR)
+            if img is None:
+                raise ValueError('Cannot read image: ' + str(path))
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2RGB if img.ndim == 2 else cv2.COLOR_BGR2RGB).astype(np.float32)
+            # bilinear resize with half-pixel centers, the same as tf.image.resize
+            img = cv2.resize(img, (width, height), interpolation=cv2.INTER_LINEAR)
+            # transpose so that the time dimension corresponds to the width of the image,
+            # and scale to [0, 1] straight into the batch array
+            np.multiply(img.transpose(1, 0, 2), 1 / 255, out=image)
+        return images
 
-            try:
-                vgg = VGG16(include_top=False, input_shape=(200, 50, 3))
-
-                conv1 = vgg.get_layer("block1_conv1")
-                conv2 = vgg.get_layer("block1_conv2")
-                pool1 = vgg.get_layer("block1_pool")
-
-                conv3 = vgg.get_layer("block2_conv1")
-                conv4 = vgg.get_layer("block2_conv2")
-                pool2 = vgg.get_layer("block2_pool")
-
-                img_input = Input(shape=(200, 50, 3), name="image_input", dtype="float32")
-                lbl_input = Input(shape=(None,), dtype="float32")
-
-
-                x = conv1(img_input)
-                x = conv2(x)
-                x = pool1(x)
-                x = layers.BatchNormalization()(x)
-                x = conv3(x)
-                x = conv4(x)
-                x = pool2(x)
-                x = layers.BatchNormalization()(x)
-                x = layers.Conv2D(
-                    64,
-                    (3, 3),
-                    activation="relu",
-                    kernel_initializer="he_normal",
-                    padding="same",
-                    name="Conv1",
-                )(x)
-                x = layers.BatchNormalization()(x)
-                x = Reshape(((200 // 4), (50 // 4) * 64))(x)
-                x = Dense(64, activation="relu", kernel_initializer="he_normal")(x)
-                x = Dropout(0.3)(x)
-                x = Bidirectional(LSTM(256, return_sequences=True, dropout=0.3))(x)
-                x = Bidirectional(LSTM(128, return_sequences=True, dropout=0.3))(x)
-
-                x = Dense(151, activation="softmax", name="target_dense")(x)
-                output = CTCLayer()(lbl_input, x)
-                model = Model([img_input, lbl_input], output)
-
-                model.compile(optimizer=tf.keras.optimizers.Adam())
-                early_stopping = tf.keras.callbacks.EarlyStopping(patience=3, restore_best_weights=True)
-                model.summary()
-
-                model.load_weights("best-model.h5")
-
-                prediction_model = tf.keras.models.Model(
-                    model.get_layer(name="image_input").input, model.get_layer(name="target_dense").output
-                )
-                prediction_model.summary()
-
-                prs = prediction_model.predict(images)
-                pred_texts = self.decodeBatchPredictions(prs, num_to_char)
+    def decodeBatchPredictions(self, pred):
+        # жадібне декодування всього пакету; останній клас - пропуск CTC
+        return ["".join(self.num_to_char.get(i, '') for i in labels)
+                for labels in ctc.best_path_batch(pred, pred.shape[2] - 1)]
+
+    def decodeBatchBeamSearch(self, pred, topK=1):
+        # останній клас - пропуск CTC
+        nbests = ctc.prefix_beam_search_batch(pred, pred.shape[2] - 1, max(self.beamWidth, topK), topK)
+        return [[("".join(self.num_to_char.get(i, '') for i in labels), prob) for labels, prob in nbest]
+                for nbest in nbests]
 
+    def loadModel(self, sessionConfig=None):
+        with span('ukrainian.load_model', backend=self.backend):
+            if self.backend == "tflite":
+                threads = sessionConfig.intra_op_parallelism_threads if sessionConfig else 0
+                return UkrainianTFLiteModel(self.checkpoint, threads or None)
+            return UkrainianModel(self.checkpoint, session_config=sessionConfig)
+
+    def infer(self, model: UkrainianModel, path) -> list:
+        return self.inferBatch(model, [path])[0]
+
+    def inferBatch(self, model: UkrainianModel, paths):
+        # усі зображення мають однаковий розмір 200x50, тож пакет обробляється за один виклик
+        with span('ukrainian.load_images', count=len(paths)):
+            images = self.loadImages(paths)
+        with span('ukrainian.predict', batch=len(paths)):
+            prs = model.predict(images)
+        with span('ukrainian.decode', batch=len(paths)):
+            if self.beamWidth:
+                nbests = self.decodeBatchBeamSearch(prs)
+                return [nbest[0][0] for nbest in nbests], [nbest[0][1] for nbest in nbests]
+            return self.decodeBatchPredictions(prs), [None] * len(paths)
+
+    def main(self, path):
+            pred_texts = ""
+            try:
+                # одне зображення - профіль для найменшої затримки
+                model = self.loadModel(runtime.apply(runtime.get_profile("latency", "Ukrainian")))
+                pred_texts = self.infer(model, path)[0]
             except Exception as e:
                 print("Error:", e)
             return [pred_texts]
 
 
 if __name__=="__main__":
-    print(UkrainianRecognition().main("C:\\Users\\LEGION\\Desktop\\Coursework\\Kursova0\\data\\horoshyy.jpg"))
\ No newline at end of file
+    print(UkrainianRecognition().main("../data/horoshyy.jpg"))
@@ -0,0 +1,258 @@
+import hashlib
+import os
+import re
+from collections import Counter
+from typing import List, Tuple
+
+import numpy as np
+
+
+class LanguageModel:
+    """
+        Словник і біграмна модель слів, побудовані з корпусу тексту.
+
+        Слова зберігаються у компактному префіксному дереві у форматі CSR: дочірні вузли
+        вузла n - це edge_char/edge_node[first_edge[n]:first_edge[n + 1]]. Побудована модель
+        кешується на диску поруч із корпусом і перебудовується, лише коли змінюються корпус
+        або список символів.
+
+        ---
+
+        Атрибути
+        --------
+        char_list : List[str]
+            Список символів моделі розпізнавання.
+        word_chars : np.ndarray
+            Маска символів (за індексом мітки), з яких складаються слова.
+        first_edge : np.ndarray
+            Зміщення дочірніх ребер для кожного вузла дерева.
+        edge_char : np.ndarray
+            Мітка символу кожного ребра.
+        edge_node : np.ndarray
+            Вузол, у який веде кожне ребро.
+        node_word : np.ndarray
+            Ідентифікатор слова, що закінчується у вузлі, або -1.
+        unigram_log : np.ndarray
+            Логарифм згладженої ймовірності кожного слова.
+        bigram_keys : np.ndarray
+            Посортовані ключі пар слів (попереднє * кількість_слів + наступне).
+        bigram_counts : np.ndarray
+            Кількість кожної пари слів.
+        word_counts : np.ndarray
+            Кількість кожного слова.
+
+        Методи
+        ------
+        load(str corpus_path, List[str] char_list, str cache_path) -> LanguageModel
+            Завантажує модель з кешу або будує її з корпусу.
+        children(int node) -> Tuple[np.ndarray, np.ndarray]
+            Повертає мітки та вузли дочірніх ребер.
+        word_log_prob(int prev_word, int word) -> float
+            Логарифм ймовірності слова за попереднім словом.
+    """
+
+    # вага біграми в інтерполяції з униграмою
+    bigram_weight = 0.5
+
+    def __init__(self, char_list: List[str], arrays: dict):
+        self.char_list = char_list
+        self.word_chars = arrays['word_chars']
+        self.first_edge = arrays['first_edge']
+        self.edge_char = arrays['edge_char']
+        self.edge_node = arrays['edge_node']
+        self.node_word = arrays['node_word']
+        self.unigram_log = arrays['unigram_log']
+        self.bigram_keys = arrays['bigram_keys']
+        self.bigram_counts = arrays['bigram_counts']
+        self.word_counts = arrays['word_counts']
+        self.num_words = len(self.word_counts)
+
+    @classmethod
+    def load(cls, corpus_path: str, char_list: List[str], cache_path: str = None) -> 'LanguageModel':
+        cache_path = cache_path or os.path.splitext(corpus_path)[0] + '.lm.npz'
+        with open(corpus_path, 'rb') as f:
+            corpus = f.read()
+        key = hashlib.sha1(corpus + ''.join(char_list).encode('utf-8')).hexdigest()
+
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as cached:
+                if str(cached['key']) == key:
+                    return cls(char_list, dict(cached))
+
+        arrays = cls._build(corpus.decode('utf-8'), char_list)
+        np.savez(cache_path, key=key, **arrays)
+        return cls(char_list, arrays)
+
+    @staticmethod
+    def _build(corpus: str, char_list: List[str]) -> dict:
+        word_chars = np.array([c.isalpha() for c in char_list], dtype=bool)
+        letters = ''.join(re.escape(c) for c, is_word in zip(char_list, word_chars) if is_word)
+        words = re.findall('[' + letters + ']+', corpus)
+
+        vocab = sorted(set(words))
+        word_ids = {w: i for i, w in enumerate(vocab)}
+        ids = np.array([word_ids[w] for w in words], dtype=np.int64)
+        word_counts = np.bincount(ids, minlength=len(vocab))
+
+        # сусідні слова корпусу утворюють біграми
+        pair_keys, bigram_counts = np.unique(ids[:-1] * len(vocab) + ids[1:], return_counts=True)
+
+        # префіксне дерево: спершу словник дочірніх вузлів, потім упакування у CSR
+        char_idx = {c: i for i, c in enumerate(char_list)}
+        children = [{}]
+        node_word = [-1]
+        for word in vocab:
+            node = 0
+            for c in word:
+                label = char_idx[c]
+                if label not in children[node]:
+                    children[node][label] = len(children)
+                    children.append({})
+                    node_word.append(-1)
+                node = children[node][label]
+            node_word[node] = word_ids[word]
+
+        first_edge = np.zeros(len(children) + 1, dtype=np.int64)
+        first_edge[1:] = np.cumsum([len(c) for c in children])
+        edge_char = np.array([label for c in children for label in sorted(c)], dtype=np.int64)
+        edge_node = np.array([c[label] for c in children for label in sorted(c)], dtype=np.int64)
+
+        unigram_log = np.log((word_counts + 1) / (word_counts.sum() + len(vocab)))
+        return {'word_chars': word_chars, 'first_edge': first_edge, 'edge_char': edge_char,
+                'edge_node': edge_node, 'node_word': np.array(node_word, dtype=np.int64),
+                'unigram_log': unigram_log, 'bigram_keys': pair_keys, 'bigram_counts': bigram_counts,
+                'word_counts': word_counts}
+
+    def children(self, node: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.first_edge[node], self.first_edge[node + 1]
+        return self.edge_char[start:end], self.edge_node[start:end]
+
+    def word_log_prob(self, prev_word: int, word: int) -> float:
+        if prev_word < 0 or self.word_counts[prev_word] == 0:
+            return float(self.unigram_log[word])
+        key = prev_word * self.num_words + word
+        pos = np.searchsorted(self.bigram_keys, key)
+        count = self.bigram_counts[pos] if pos < len(self.bigram_keys) and self.bigram_keys[pos] == key else 0
+        bigram = count / self.word_counts[prev_word]
+        unigram = np.exp(self.unigram_log[word])
+        return float(np.log(self.bigram_weight * bigram + (1 - self.bigram_weight) * unigram))
+
+
+class WordBeamSearch:
+    """
+        Декодер CTC з пошуком променем, обмеженим словником.
+
+        Символи слів можуть лише продовжувати префікс зі словника, а інші символи (пробіл,
+        розділові знаки, цифри) дозволені між словами. Завершене слово отримує оцінку
+        біграмної моделі. На кожному кроці часу всі розширення всіх променів оцінюються
+        векторно, і лише найкращі кандидати зливаються в нові промені.
+
+        ---
+
+        Атрибути
+        --------
+        lm : LanguageModel
+            Словник і біграмна модель слів.
+        beam_width : int
+            Кількість променів, що зберігаються на кожному кроці.
+        lm_weight : float
+            Вага оцінки мовної моделі відносно оцінки оптичної моделі.
+
+        Методи
+        ------
+        decode(np.ndarray mat) -> List[int]
+            Декодує матрицю ймовірностей (T, C) одного зразка в мітки.
+    """
+
+    def __init__(self, lm: LanguageModel, beam_width: int = 25, lm_weight: float = 1.0):
+        self.lm = lm
+        self.beam_width = beam_width
+        self.lm_weight = lm_weight
+        self.blank = len(lm.char_list)
+        self.non_word = np.flatnonzero(~lm.word_chars)
+
+    def decode(self, mat: np.ndarray) -> List[int]:
+        lm = self.lm
+        log_mat = np.log(np.maximum(mat, 1e-30))
+
+        # стан променів: мітки, вузол дерева (0 - поза словом), попереднє слово,
+        # логарифми ймовірностей із пропуском / без нього в кінці та оцінка мовної моделі
+        labels = [()]
+        node = np.zeros(1, dtype=np.int64)
+        prev_word = np.full(1, -1, dtype=np.int64)
+        lp_blank = np.zeros(1)
+        lp_non_blank = np.full(1, -np.inf)
+        lm_score = np.zeros(1)
+
+        for t in range(len(log_mat)):
+            row = log_mat[t]
+            lp_total = np.logaddexp(lp_blank, lp_non_blank)
+            last = np.array([l[-1] if l else -1 for l in labels])
+
+            # 1) промені без нових символів: пропуск або повтор останнього символу
+            copy_blank = lp_total + row[self.blank]
+            copy_non_blank = np.where(last >= 0, lp_non_blank + row[np.maximum(last, 0)], -np.inf)
+
+            # 2) усі дозволені розширення всіх променів
+            beam_idx, ext_char, ext_node = [], [], []
+            for b in range(len(labels)):
+                chars, nodes = lm.children(node[b])
+                if node[b] == 0 or lm.node_word[node[b]] >= 0:
+                    chars = np.concatenate((chars, self.non_word))
+                    nodes = np.concatenate((nodes, np.zeros(len(self.non_word), dtype=np.int64)))
+                beam_idx.append(np.full(len(chars), b))
+                ext_char.append(chars)
+                ext_node.append(nodes)
+            beam_idx = np.concatenate(beam_idx)
+            ext_char = np.concatenate(ext_char)
+            ext_node = np.concatenate(ext_node)
+
+            # повтор символу можливий лише після пропуску
+            prefix = np.where(ext_char == last[beam_idx], lp_blank[beam_idx], lp_total[beam_idx])
+            ext_lp = prefix + row[ext_char]
+
+            # вихід зі слова завершує його і додає оцінку біграми
+            ext_lm = lm_score[beam_idx].copy()
+            ext_prev = prev_word[beam_idx].copy()
+            completes = (ext_node == 0) & (node[beam_idx] != 0)
+            for i in np.flatnonzero(completes):
+                word = lm.node_word[node[beam_idx[i]]]
+                ext_lm[i] += lm.word_log_prob(ext_prev[i], word)
+                ext_prev[i] = word
+
+            # 3) відбір найкращих розширень перед злиттям, щоб злиття торкалося лише їх
+            ext_score = ext_lp + self.lm_weight * ext_lm
+            if len(ext_score) > self.beam_width:
+                top = np.argpartition(-ext_score, self.beam_width)[:self.beam_width]
+            else:
+                top = np.arange(len(ext_score))
+
+            beams = {}
+            for b in range(len(labels)):
+                beams[labels[b]] = [node[b], prev_word[b], copy_blank[b], copy_non_blank[b], lm_score[b]]
+            for i in top:
+                key = labels[beam_idx[i]] + (int(ext_char[i]),)
+                if key in beams:
+                    beams[key][3] = np.logaddexp(beams[key][3], ext_lp[i])
+                else:
+                    beams[key] = [ext_node[i], ext_prev[i], -np.inf, ext_lp[i], ext_lm[i]]
+
+            # 4) залишити beam_width найкращих променів
+            keys = list(beams)
+            state = np.array([beams[k] for k in keys], dtype=np.float64)
+            score = np.logaddexp(state[:, 2], state[:, 3]) + self.lm_weight * state[:, 4]
+            keep = np.argsort(-score)[:self.beam_width]
+            labels = [keys[k] for k in keep]
+            node = state[keep, 0].astype(np.int64)
+            prev_word = state[keep, 1].astype(np.int64)
+            lp_blank = state[keep, 2]
+            lp_non_blank = state[keep, 3]
+            lm_score = state[keep, 4]
+
+        # промені, що закінчуються посеред слова, мають завершити слово зі словника
+        final = np.logaddexp(lp_blank, lp_non_blank) + self.lm_weight * lm_score
+        for b in range(len(labels)):
+            if node[b] != 0:
+                word = lm.node_word[node[b]]
+                final[b] = final[b] + self.lm_weight * lm.word_log_prob(prev_word[b], word) if word >= 0 else -np.inf
+        return list(labels[int(np.argmax(final))])
@@ -0,0 +1,155 @@
+import queue
+import threading
+from collections import namedtuple
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from registry import registry
+
+RecognitionJob = namedtuple('RecognitionJob', 'job_id, language, coding, path, page', defaults=(False,))
+
+
+class RecognitionWorker(QThread):
+    """
+        Фоновий потік розпізнавання тексту.
+
+        Завдання ставляться в чергу з головного потоку і виконуються по одному з прогрітими
+        моделями з реєстру, тож вікно не блокується ні завантаженням моделі, ні розпізнаванням.
+        Результати повертаються сигналами, які Qt доставляє в головний потік. Перед розпізнаванням
+        перевіряється кеш результатів, тож повторно надіслане зображення не потребує моделі.
+
+        ---
+
+        Атрибути
+        --------
+        cache : resultcache.ResultCache
+            Кеш результатів розпізнавання або None.
+        jobProgress : pyqtSignal(int, int, str)
+            Номер завдання, відсоток виконання і назва етапу.
+        jobFinished : pyqtSignal(int, bool, bool, str, list)
+            Номер завдання, мова, кодування, шлях і розпізнаний текст.
+        jobFailed : pyqtSignal(int, str)
+            Номер завдання і повідомлення про помилку.
+        queueChanged : pyqtSignal(int)
+            Кількість завдань, які ще не завершені.
+
+        Методи
+        ------
+        submit(bool language, bool coding, str path, bool page = False) -> int
+            Ставить розпізнавання в чергу і повертає номер завдання; page - розпізнати всю сторінку.
+        warmUp(bool language)
+            Завантажує модель мови заздалегідь, не чекаючи першого завдання.
+        cancel(int job_id)
+            Скасовує завдання; результат уже запущеного розпізнавання відкидається.
+        cancelAll()
+            Скасовує всі поставлені завдання.
+        isCancelled(int job_id) -> bool
+            Перевіряє, чи завдання скасоване.
+        stop()
+            Зупиняє потік після поточного завдання.
+    """
+
+    jobProgress = pyqtSignal(int, int, str)
+    jobFinished = pyqtSignal(int, bool, bool, str, list)
+    jobFailed = pyqtSignal(int, str)
+    queueChanged = pyqtSignal(int)
+
+    def __init__(self, cache=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._queue = queue.Queue()
+        self._active = set()
+        self._cancelled = set()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def languageName(language):
+        return "Ukrainian" if language else "English"
+
+    def submit(self, language, coding, path, page=False):
+        with self._lock:
+            self._next_id += 1
+            job_id = self._next_id
+            self._active.add(job_id)
+            pending = len(self._active)
+        self._queue.put(RecognitionJob(job_id, language, coding, path, page))
+        self.queueChanged.emit(pending)
+        return job_id
+
+    def warmUp(self, language):
+        # завдання без шляху лише завантажує модель
+        self._queue.put(RecognitionJob(0, language, False, None))
+
+    def cancel(self, job_id):
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def cancelAll(self):
+        with self._lock:
+            self._cancelled.update(self._active)
+
+    def stop(self):
+        self.cancelAll()
+        self._queue.put(None)
+        self.wait()
+
+    def isCancelled(self, job_id):
+        with self._lock:
+            return job_id in self._cancelled
+
+    def run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            if job.path is None:
+                try:
+                    registry.get(self.languageName(job.language))
+                except Exception as e:
+                    print(f"Error: {e}")
+                continue
+
+            try:
+                self.process(job)
+            except Exception as e:
+                if not self.isCancelled(job.job_id):
+                    self.jobFailed.emit(job.job_id, str(e))
+            finally:
+                with self._lock:
+                    self._active.discard(job.job_id)
+                    self._cancelled.discard(job.job_id)
+                    pending = len(self._active)
+                self.queueChanged.emit(pending)
+
+    def process(self, job):
+        # скасоване завдання перевіряється між етапами; сам виклик мережі перервати не можна
+        if self.isCancelled(job.job_id):
+            return
+        language = self.languageName(job.language)
+        key = None
+        if self.cache is not None:
+            # результати сторінок і окремих зображень не змішуються
+            cacheLanguage = language + "/page" if job.page else language
+            key = self.cache.key(job.path, cacheLanguage, registry.checkpoint(language))
+            recognized = self.cache.get(key)
+            if recognized is not None:
+                self.jobProgress.emit(job.job_id, 100, "Done (cached)")
+                self.jobFinished.emit(job.job_id, job.language, job.coding, job.path, recognized)
+                return
+
+        self.jobProgress.emit(job.job_id, 10, "Loading model")
+        recognizer = registry.get(language)
+
+        if self.isCancelled(job.job_id):
+            return
+        self.jobProgress.emit(job.job_id, 40, "Recognizing page" if job.page else "Recognizing")
+        recognized = [recognizer.recognizePage(job.path)] if job.page else recognizer.recognize(job.path)
+        if key is not None:
+            # результат належить контрольній точці, з якої модель справді завантажено
+            self.cache.put(key._replace(checkpoint=recognizer.checkpoint_id), recognized)
+
+        if self.isCancelled(job.job_id):
+            return
+        self.jobProgress.emit(job.job_id, 100, "Done")
+        self.jobFinished.emit(job.job_id, job.language, job.coding, job.path, list(recognized))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# модулі застосунку імпортуються один одним без пакету, як під час запуску з src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
@@ -0,0 +1,32 @@
+import os
+
+import cv2
+import numpy as np
+from path import Path
+
+# рядки gt/words.txt: id, результат сегментації, рівень сірого, x, y, ширина, висота, тег, мітка
+WORDS = [
+    ('a01-000u-00-00', 'ok', 12, 'A'),
+    ('a01-000u-00-01', 'ok', 40, 'MOVE'),
+    ('a01-000u-00-02', 'err', 24, 'to'),
+    ('a01-117-05-02', 'ok', 30, 'bad'),
+    ('b02-010-01-00', 'ok', 56, 'stop!'),
+]
+
+
+def write_iam(data_dir, words=WORDS, images=True) -> Path:
+    """Мінімальний набір у форматі IAM: gt/words.txt і, за потреби, PNG зразків."""
+    data_dir = Path(str(data_dir))
+    os.makedirs(data_dir / 'gt', exist_ok=True)
+    with open(data_dir / 'gt/words.txt', 'w') as f:
+        f.write('# a comment line\n')
+        for i, (sample_id, result, width, text) in enumerate(words):
+            f.write(f'{sample_id} {result} 154 408 768 {width} 20 AT {text}\n')
+            if images:
+                form, line = sample_id.split('-')[:2]
+                img_dir = data_dir / 'img' / form / f'{form}-{line}'
+                os.makedirs(img_dir, exist_ok=True)
+                img = np.full((20, width), 255, np.uint8)
+                img[:, i] = 0
+                cv2.imwrite(str(img_dir / f'{sample_id}.png'), img)
+    return data_dir
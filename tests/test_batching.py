@@ -0,0 +1,16 @@
+from batching import bucket_width, group_by_width
+
+
+def test_bucket_width_rounds_up_to_step():
+    assert [bucket_width(width, 16) for width in [1, 16, 17, 32, 33]] == [16, 16, 32, 32, 48]
+
+
+def test_groups_share_bucket_and_are_ordered_by_width():
+    widths = [40, 10, 33, 16, 12, 48, 5, 49]
+    assert group_by_width(widths, 16) == [[1, 3, 4, 6], [0, 2, 5], [7]]
+
+
+def test_large_buckets_are_split_by_batch_size():
+    widths = [8] * 5 + [20] * 2
+    assert group_by_width(widths, 16, max_batch_size=2) == [[0, 1], [2, 3], [4], [5, 6]]
+    assert group_by_width([], 16) == []
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from bulk import ResultWriter
+
+
+def result(path, text='word', error=''):
+    return {'path': path, 'language': 'English', 'text': text, 'probability': 0.9, 'error': error}
+
+
+def complete_length(data: bytes) -> int:
+    """Посимвольний еталон: кінець останнього розриву рядка поза лапками."""
+    end, quoted = 0, False
+    for i, byte in enumerate(data):
+        if byte == ord('"'):
+            quoted = not quoted
+        elif byte == ord('\n') and not quoted:
+            end = i + 1
+    return end
+
+
+@pytest.mark.parametrize('data', [b'', b'abc', b'a\n', b'a\nb', b'"a\nb"\n', b'"a\nb', b'x\n"a\n""b\n\nc',
+                                  b'x\n"a""\nb"\n"c\n', b'\n\n"', b'"\n"\n"\n'])
+def test_complete_length_matches_byte_scan(data):
+    assert ResultWriter._complete_length(data) == complete_length(data)
+
+
+@pytest.mark.parametrize('name', ['results.jsonl', 'results.csv'])
+def test_resume_drops_partial_row_and_keeps_written_ones(tmp_path, name):
+    path = str(tmp_path / name)
+    writer = ResultWriter(path)
+    writer.write([result('a.png'), result('page.png', text='first line\nsecond "quoted" line')])
+    writer.close()
+    # збій посеред запису: неповний рядок, у CSV ще й з незакритими лапками
+    with open(path, 'ab') as f:
+        f.write(b'c.png,English,"half\nwritten' if name.endswith('.csv') else b'{"path": "c.png", "te')
+
+    writer = ResultWriter(path)
+    assert writer.completed() == {'a.png', 'page.png'}
+    writer.write([result('c.png')])
+    writer.close()
+    assert ResultWriter(path).completed() == {'a.png', 'page.png', 'c.png'}
+
+
+def test_csv_header_written_once(tmp_path):
+    path = str(tmp_path / 'results.csv')
+    for name in ['a.png', 'b.png']:
+        writer = ResultWriter(path)
+        writer.write([result(name)])
+        writer.close()
+    with open(path, encoding='utf-8') as f:
+        assert f.read().count('path,language') == 1
+
+
+def test_jsonl_rows_round_trip(tmp_path):
+    path = str(tmp_path / 'results.jsonl')
+    writer = ResultWriter(path)
+    writer.write([result('a.png', text='слово'), result('b.png', text='', error='unreadable image')])
+    writer.close()
+    with open(path, encoding='utf-8') as f:
+        rows = [json.loads(line) for line in f]
+    assert [row['text'] for row in rows] == ['слово', '']
+    assert rows[1]['error'] == 'unreadable image'
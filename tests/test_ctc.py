@@ -0,0 +1,71 @@
+import itertools
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+import ctc
+
+BLANK = 2
+
+
+def collapse(path, blank=BLANK):
+    labels = [c for i, c in enumerate(path) if c != blank and (i == 0 or c != path[i - 1])]
+    return tuple(labels)
+
+
+def brute_force(probs, blank=BLANK):
+    """Ймовірність кожної мітки як сума ймовірностей усіх шляхів, що до неї зводяться."""
+    totals = defaultdict(float)
+    num_steps, num_chars = probs.shape
+    for path in itertools.product(range(num_chars), repeat=num_steps):
+        totals[collapse(path, blank)] += np.prod(probs[np.arange(num_steps), path])
+    return totals
+
+
+def random_probs(seed, num_steps=5, num_chars=3):
+    return ctc.softmax(np.random.default_rng(seed).normal(size=(num_steps, num_chars)) * 2)
+
+
+@pytest.mark.parametrize('labels', [(), (0,), (0, 0), (0, 1), (1, 0, 1)])
+def test_label_log_probability_matches_path_sum(labels):
+    probs = random_probs(0)
+    expected = brute_force(probs)[labels]
+    assert ctc.label_log_probability(np.log(probs), labels, BLANK) == pytest.approx(np.log(expected))
+
+
+def test_label_log_probability_empty_label_uniform():
+    probs = np.full((10, 3), 1 / 3)
+    assert ctc.label_log_probability(np.log(probs), [], BLANK) == pytest.approx(10 * np.log(1 / 3))
+
+
+def test_best_path_merges_repeats_and_drops_blanks():
+    probs = np.array([[0.6, 0.1, 0.3], [0.7, 0.2, 0.1], [0.1, 0.1, 0.8], [0.9, 0.05, 0.05], [0.2, 0.5, 0.3]])
+    labels, confidences = ctc.best_path(probs, BLANK)
+    assert labels == [0, 0, 1]
+    np.testing.assert_allclose(confidences, [0.7, 0.9, 0.5])
+
+
+def test_best_path_batch_matches_best_path_with_seq_lens():
+    mats = np.stack([random_probs(seed, num_steps=8) for seed in range(4)])
+    seq_lens = [8, 5, 3, 0]
+    batch = ctc.best_path_batch(mats, BLANK, seq_lens)
+    for mat, seq_len, labels in zip(mats, seq_lens, batch):
+        assert labels == ctc.best_path(mat[:seq_len], BLANK)[0]
+
+
+def test_prefix_beam_search_batch_matches_brute_force():
+    mats = np.stack([random_probs(seed) for seed in range(3)])
+    nbests = ctc.prefix_beam_search_batch(mats, BLANK, beam_width=64, top_k=3)
+    for mat, nbest in zip(mats, nbests):
+        expected = sorted(brute_force(mat).items(), key=lambda item: -item[1])[:3]
+        assert [tuple(labels) for labels, _ in nbest] == [labels for labels, _ in expected]
+        np.testing.assert_allclose([prob for _, prob in nbest], [prob for _, prob in expected])
+
+
+def test_prefix_beam_search_batch_respects_seq_lens():
+    mats = np.stack([random_probs(seed) for seed in range(2)])
+    nbest = ctc.prefix_beam_search_batch(mats, BLANK, beam_width=64, top_k=1, seq_lens=[5, 3])
+    expected = max(brute_force(mats[1, :3]).items(), key=lambda item: item[1])
+    assert tuple(nbest[1][0][0]) == expected[0]
+    assert nbest[1][0][1] == pytest.approx(expected[1])
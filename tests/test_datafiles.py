@@ -0,0 +1,21 @@
+import os
+
+from datafiles import DATA_DIR, LINES, WORDS, data_files
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def test_every_image_has_exactly_one_language():
+    images = sorted(fn for fn in os.listdir(DATA) if fn.endswith(('.png', '.jpg')))
+    listed = sorted(name for lists in (WORDS, LINES) for names in lists.values() for name in names)
+    assert listed == images
+
+
+def test_languages_do_not_share_images():
+    assert not set(data_files('English')) & set(data_files('Ukrainian'))
+    assert 'surname.jpg' in WORDS['English']
+
+
+def test_data_files_selects_words_and_lines():
+    assert data_files('English', lines=False) == [DATA_DIR + name for name in WORDS['English']]
+    assert data_files('English', words=False) == [DATA_DIR + name for name in LINES['English']]
@@ -0,0 +1,29 @@
+import cv2
+
+from dataloaderIAM import DataLoaderIAM
+from iam import WORDS, write_iam
+from imagestore import ImageStore
+
+
+def test_pack_round_trip_returns_the_decoded_images(tmp_path):
+    data_dir = write_iam(tmp_path)
+    loader = DataLoaderIAM(data_dir, 1)
+    samples = loader.train_samples + loader.validation_samples
+    store = ImageStore.pack(samples, data_dir)
+    for sample in samples:
+        expected = cv2.imread(sample.file_path, cv2.IMREAD_GRAYSCALE)
+        assert (store.get(sample.sample_id) == expected).all()
+    assert store.get('missing') is None
+
+
+def test_open_or_pack_repacks_after_the_sample_set_changes(tmp_path, capsys):
+    data_dir = write_iam(tmp_path)
+    loader = DataLoaderIAM(data_dir, 1, image_store=True)
+    assert 'Packing' in capsys.readouterr().out
+    DataLoaderIAM(data_dir, 1, image_store=True)
+    assert 'Packing' not in capsys.readouterr().out
+
+    write_iam(tmp_path, WORDS + [('c03-003-00-00', 'ok', 33, 'new')])
+    loader = DataLoaderIAM(data_dir, 1, image_store=True)
+    assert 'repacking' in capsys.readouterr().out
+    assert loader.store.get('c03-003-00-00').shape == (20, 33)
@@ -0,0 +1,67 @@
+import os
+
+import numpy as np
+
+from dataloaderIAM import DataLoaderIAM
+from iam import write_iam
+from manifest import Manifest
+
+
+def test_manifest_encodes_labels_with_model_char_list(tmp_path):
+    manifest = Manifest.load(write_iam(tmp_path, images=False))
+    assert manifest.char_list[0] == ' '
+    for idx, (text, valid) in enumerate(zip(manifest.texts.tolist(), manifest.valid.tolist())):
+        # символи зіпсованих зразків не входять у список і кодуються як -1
+        assert valid or -1 in manifest.label_ids(idx).tolist()
+        assert not valid or ''.join(manifest.char_list[i] for i in manifest.label_ids(idx)) == text
+    assert manifest.valid.tolist() == [True, True, True, False, True]
+    assert manifest.widths.tolist() == [12, 40, 24, 30, 56]
+
+
+def test_manifest_is_cached_until_words_change(tmp_path, capsys):
+    data_dir = write_iam(tmp_path, images=False)
+    Manifest.load(data_dir)
+    assert 'Building' in capsys.readouterr().out
+    Manifest.load(data_dir)
+    assert 'Building' not in capsys.readouterr().out
+
+    # новий час зміни без зміни вмісту перевіряється хешем
+    os.utime(data_dir / 'gt/words.txt', ns=(1, 1))
+    Manifest.load(data_dir)
+    assert 'Building' not in capsys.readouterr().out
+
+    with open(data_dir / 'gt/words.txt', 'a') as f:
+        f.write('b02-010-01-01 ok 154 408 768 10 20 AT new\n')
+    manifest = Manifest.load(data_dir)
+    assert 'Building' in capsys.readouterr().out
+    assert manifest.texts.tolist()[-1] == 'new'
+
+
+def test_manifest_of_older_format_is_rebuilt(tmp_path, capsys):
+    data_dir = write_iam(tmp_path, images=False)
+    arrays = Manifest._build(data_dir / 'gt/words.txt')
+    stat = os.stat(data_dir / 'gt/words.txt')
+    np.savez(data_dir / Manifest.file_name, mtime_ns=stat.st_mtime_ns, size=stat.st_size, sha1='', **arrays)
+    Manifest.load(data_dir)
+    assert 'Building' in capsys.readouterr().out
+
+
+def test_loader_derives_paths_and_labels_from_manifest(tmp_path):
+    data_dir = write_iam(tmp_path)
+    loader = DataLoaderIAM(data_dir, 2)
+    samples = sorted(loader.samples + loader.validation_samples, key=lambda sample: sample.sample_id)
+    assert [sample.sample_id for sample in samples] == ['a01-000u-00-00', 'a01-000u-00-01', 'a01-000u-00-02',
+                                                        'b02-010-01-00']
+    assert samples[0].file_path == f'{data_dir}/img/a01/a01-000u/a01-000u-00-00.png'
+    batch = loader.load_samples(samples)
+    assert [img.shape for img in batch.imgs] == [(20, 12), (20, 40), (20, 24), (20, 56)]
+    assert [''.join(loader.char_list[i] for i in labels) for labels in batch.gt_labels] == batch.gt_texts
+
+
+def test_train_set_with_seed_is_reproducible_and_resumable(tmp_path):
+    loader = DataLoaderIAM(write_iam(tmp_path), 1)
+    loader.train_set(seed=7)
+    order = [loader.next_samples()[0].sample_id for _ in range(len(loader.train_samples))]
+    loader.train_set()
+    loader.train_set(seed=7, start_batch=2)
+    assert [sample.sample_id for sample in loader.samples[loader.curr_idx:]] == order[2:]
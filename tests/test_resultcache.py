@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from database import CachedResult, setupDatabase
+from resultcache import CacheKey, ResultCache
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "cache.db"}')
+    setupDatabase(engine)
+    return engine
+
+
+def image(tmp_path, name, content=b'png bytes'):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def stored(engine):
+    with engine.connect() as connection:
+        return connection.execute(select(func.count()).select_from(CachedResult)).scalar()
+
+
+def test_result_is_found_by_image_content(tmp_path, engine):
+    cache = ResultCache(engine)
+    cache.put(cache.key(image(tmp_path, 'a.png'), 'English', 'ckpt-1'), ['word'])
+
+    assert cache.get(cache.key(image(tmp_path, 'renamed.png'), 'English', 'ckpt-1')) == ['word']
+    assert cache.get(cache.key(image(tmp_path, 'other.png', b'other'), 'English', 'ckpt-1')) is None
+    assert cache.get(cache.key(image(tmp_path, 'a.png'), 'Ukrainian', 'ckpt-1')) is None
+    # повторне збереження того самого ключа не дублює запис
+    cache.put(cache.key(image(tmp_path, 'a.png'), 'English', 'ckpt-1'), ['word'])
+    assert stored(engine) == 1
+
+
+def test_results_outlive_memory_and_process(tmp_path, engine):
+    cache = ResultCache(engine, capacity=1)
+    keys = [cache.key(image(tmp_path, f'{i}.png', bytes([i])), 'English', 'ckpt-1') for i in range(3)]
+    for i, key in enumerate(keys):
+        cache.put(key, [str(i)])
+    assert list(cache._memory) == [keys[2]]
+    assert cache.get(keys[0]) == ['0']
+    assert list(cache._memory) == [keys[0]]
+    assert ResultCache(engine).get(keys[1]) == ['1']
+
+
+def test_new_checkpoint_drops_results_of_the_old_one(tmp_path, engine):
+    cache = ResultCache(engine)
+    path = image(tmp_path, 'a.png')
+    cache.put(cache.key(path, 'English', 'ckpt-1'), ['old'])
+    cache.put(cache.key(path, 'Ukrainian', 'ckpt-1'), ['старе'])
+
+    key = cache.key(path, 'English', 'ckpt-2')
+    assert key == CacheKey(ResultCache.imageDigest(path), 'English', 'ckpt-2')
+    assert cache.get(key) is None
+    assert cache.get(CacheKey(key.digest, 'English', 'ckpt-1')) is None
+    # інша мова має власну контрольну точку
+    assert cache.get(CacheKey(key.digest, 'Ukrainian', 'ckpt-1')) == ['старе']
+
+
+def test_checkpoint_id_follows_the_checkpoint_file(tmp_path):
+    path = image(tmp_path, 'checkpoint', b'weights')
+    first = ResultCache.checkpointId(path)
+    assert ResultCache.checkpointId(path) == first
+    os.utime(path, ns=(1, 1))
+    assert ResultCache.checkpointId(path) != first
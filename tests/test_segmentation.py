@@ -0,0 +1,59 @@
+import numpy as np
+
+from segmentation import find_lines, find_words, recognize_page, runs
+
+
+def test_runs_finds_and_merges_true_spans():
+    mask = np.array([1, 1, 0, 1, 0, 0, 0, 1, 1, 1], dtype=bool)
+    assert runs(mask) == [(0, 2), (3, 4), (7, 10)]
+    assert runs(mask, max_gap=1) == [(0, 4), (7, 10)]
+    assert runs(mask, max_gap=3) == [(0, 10)]
+    assert runs(np.zeros(5, dtype=bool)) == []
+    assert runs(np.ones(3, dtype=bool)) == [(0, 3)]
+
+
+def page(*boxes, shape=(200, 300)):
+    """Бінарна сторінка: чорнило (255) у прямокутниках (x, y, w, h)."""
+    binary = np.zeros(shape, np.uint8)
+    for x, y, w, h in boxes:
+        binary[y:y + h, x:x + w] = 255
+    return binary
+
+
+def test_find_lines_merges_dots_and_drops_noise():
+    binary = page((10, 20, 200, 30), (40, 52, 4, 3),  # рядок і крапка під ним на відстані 2
+                  (50, 80, 5, 3),                     # шум між рядками
+                  (10, 110, 150, 28), (30, 103, 4, 4),  # крапка над рядком на відстані 3
+                  (10, 160, 150, 28), (30, 150, 4, 4))  # і на відстані 6, більшій за чверть рядка
+    assert find_lines(binary) == [(20, 55), (103, 138), (160, 188)]
+    assert find_lines(np.zeros((50, 50), np.uint8)) == []
+
+
+def test_find_words_splits_on_spaces_only():
+    # літери одного слова на відстані 3 пікселі, слова - на відстані 40
+    line = page((10, 5, 12, 20), (25, 8, 12, 17), (77, 5, 20, 15), (200, 10, 2, 2), shape=(30, 300))
+    words = find_words(line)
+    assert len(words) == 2
+    # по горизонталі рамка охоплює розмиту компоненту, по вертикалі - рівно чорнило
+    (x0, y0, w0, h0), (x1, y1, w1, h1) = words
+    assert x0 <= 10 and x0 + w0 >= 37 and (y0, h0) == (5, 20)
+    assert 37 < x1 <= 77 and x1 + w1 >= 97 and (y1, h1) == (5, 15)
+
+
+def test_recognize_page_reads_in_order_with_one_batch():
+    img = 255 - page((10, 20, 60, 30), (120, 20, 80, 30), (10, 100, 90, 30))
+    calls = []
+
+    def recognize_batch(crops):
+        calls.append(len(crops))
+        return [str(crop.shape[1]) for crop in crops], [1.0] * len(crops)
+
+    def widths(text):
+        return [[int(width) for width in line.split(' ')] for line in text.split('\n')]
+
+    (first, second), (third,) = widths(recognize_page(recognize_batch, img, workers=2))
+    assert first < second < third
+    (top,), (bottom,) = widths(recognize_page(recognize_batch, img, unit='line'))
+    assert top > bottom > 90
+    assert calls == [3, 2]
+    assert recognize_page(recognize_batch, np.full((50, 50), 255, np.uint8)) == ''
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from server import MicroBatcher, Overloaded, RecognitionServer
+
+
+class FakeModel:
+    """Замість мережі: текст - ширина зображення; запам'ятовує розміри пакетів."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.batches = []
+        self.delay = delay
+        self.error = error
+        self.release = threading.Event()
+
+    def infer_batch(self, imgs):
+        self.batches.append(len(imgs))
+        if self.delay:
+            self.release.wait(self.delay)
+        if self.error:
+            raise self.error
+        return [str(img.shape[1]) for img in imgs], [0.5] * len(imgs)
+
+
+def image(width):
+    return np.zeros((4, width), np.uint8)
+
+
+async def with_batcher(model, coro, **options):
+    batcher = MicroBatcher(model.infer_batch, **options)
+    task = asyncio.create_task(batcher.run())
+    try:
+        return await coro(batcher)
+    finally:
+        task.cancel()
+        batcher.close()
+
+
+def test_concurrent_requests_share_one_batch():
+    model = FakeModel()
+
+    async def requests(batcher):
+        return await asyncio.gather(*[batcher.submit(image(width), 1) for width in range(1, 6)])
+
+    results = asyncio.run(with_batcher(model, requests, max_wait=0.05))
+    assert results == [(str(width), 0.5) for width in range(1, 6)]
+    assert model.batches == [5]
+
+
+def test_batches_are_capped_at_max_batch_size():
+    model = FakeModel()
+
+    async def requests(batcher):
+        return await asyncio.gather(*[batcher.submit(image(width), 1) for width in range(1, 8)])
+
+    asyncio.run(with_batcher(model, requests, max_wait=0.05, max_batch_size=3))
+    assert model.batches == [3, 3, 1]
+
+
+def test_full_queue_rejects_and_slow_batch_times_out():
+    model = FakeModel(delay=1)
+
+    async def requests(batcher):
+        first = asyncio.create_task(batcher.submit(image(1), 0.05))
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(batcher.submit(image(2), 1))
+        await asyncio.sleep(0.01)
+        with pytest.raises(Overloaded):
+            await batcher.submit(image(3), 1)
+        with pytest.raises(asyncio.TimeoutError):
+            await first
+        model.release.set()
+        return await queued
+
+    assert asyncio.run(with_batcher(model, requests, max_wait=0, max_queue=1)) == ('2', 0.5)
+
+
+def test_model_error_reaches_every_request_of_the_batch():
+    model = FakeModel(error=RuntimeError('boom'))
+
+    async def requests(batcher):
+        return await asyncio.gather(batcher.submit(image(1), 1), batcher.submit(image(2), 1),
+                                    return_exceptions=True)
+
+    results = asyncio.run(with_batcher(model, requests, max_wait=0.05))
+    assert [str(result) for result in results] == ['boom', 'boom']
+
+
+async def exchange(server, request: bytes):
+    listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+    try:
+        port = listener.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(request)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+    finally:
+        listener.close()
+
+
+def status_and_body(response: bytes):
+    head, _, body = response.partition(b'\r\n\r\n')
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-5', b'1e3'])
+def test_malformed_content_length_is_a_bad_request(length):
+    request = b'POST /recognize HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\n'
+    status, body = status_and_body(asyncio.run(exchange(RecognitionServer([]), request)))
+    assert status == 400 and 'Content-Length' in body['error']
+
+
+def test_chunked_body_requires_length():
+    request = b'POST /recognize HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n0\r\n\r\n'
+    status, _ = status_and_body(asyncio.run(exchange(RecognitionServer([]), request)))
+    assert status == 411
+
+
+def test_recognize_goes_through_the_batcher():
+    model = FakeModel()
+    png = cv2.imencode('.png', np.full((8, 13, 3), 255, np.uint8))[1].tobytes()
+    request = (b'POST /recognize?language=English HTTP/1.1\r\nConnection: close\r\n'
+               b'Content-Length: ' + str(len(png)).encode() + b'\r\n\r\n' + png)
+
+    async def run():
+        server = RecognitionServer(['English'])
+        server.batchers['English'] = MicroBatcher(model.infer_batch, max_wait=0)
+        task = asyncio.create_task(server.batchers['English'].run())
+        try:
+            return await exchange(server, request)
+        finally:
+            task.cancel()
+            server.batchers['English'].close()
+
+    status, body = status_and_body(asyncio.run(run()))
+    assert status == 200 and body == {'language': 'English', 'text': '13', 'probability': 0.5}
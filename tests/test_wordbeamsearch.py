@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from wordbeamsearch import LanguageModel, WordBeamSearch
+
+CHARS = list(' .abcdgot')
+CORPUS = 'a cat. a dog, the cat bat a cat\n'
+
+
+def load(tmp_path, corpus=CORPUS, chars=CHARS):
+    path = tmp_path / 'corpus.txt'
+    if not path.exists() or path.read_text() != corpus:
+        path.write_text(corpus)
+    return LanguageModel.load(str(path), chars)
+
+
+def words_in_trie(lm, node=0, prefix=''):
+    words = {prefix} if lm.node_word[node] >= 0 else set()
+    for label, child in zip(*lm.children(node)):
+        words |= words_in_trie(lm, child, prefix + lm.char_list[label])
+    return words
+
+
+def test_trie_holds_exactly_the_corpus_words(tmp_path):
+    # 'the' містить символ поза списком, тож з корпусу береться лише 't'
+    lm = load(tmp_path)
+    assert words_in_trie(lm) == {'a', 'bat', 'cat', 'dog', 't'}
+    assert lm.word_chars.tolist() == [c.isalpha() for c in CHARS]
+
+
+def test_word_log_prob_interpolates_bigram_and_unigram(tmp_path):
+    lm = load(tmp_path)
+    vocab = sorted(words_in_trie(lm))
+    a, cat, dog = vocab.index('a'), vocab.index('cat'), vocab.index('dog')
+    # корпус: a cat a dog t cat bat a cat - 9 слів, 5 різних
+    unigram = lambda count: (count + 1) / (9 + 5)
+    assert lm.word_log_prob(-1, cat) == pytest.approx(np.log(unigram(3)))
+    assert lm.word_log_prob(a, cat) == pytest.approx(np.log(0.5 * 2 / 3 + 0.5 * unigram(3)))
+    assert lm.word_log_prob(cat, dog) == pytest.approx(np.log(0.5 * unigram(1)))
+
+
+def test_model_is_cached_until_corpus_or_chars_change(tmp_path, monkeypatch):
+    load(tmp_path)
+    assert (tmp_path / 'corpus.lm.npz').exists()
+
+    builds = []
+    build = LanguageModel._build
+    monkeypatch.setattr(LanguageModel, '_build', lambda *args: builds.append(1) or build(*args))
+    load(tmp_path)
+    assert builds == []
+    assert words_in_trie(load(tmp_path, corpus='cab dab')) == {'cab', 'dab'}
+    assert words_in_trie(load(tmp_path, corpus='cab dab', chars=CHARS + ['h'])) == {'cab', 'dab'}
+    assert len(builds) == 2
+
+
+def test_decoding_is_constrained_to_dictionary_words(tmp_path):
+    lm = load(tmp_path)
+    blank = len(CHARS)
+
+    def mat(*steps):
+        probs = np.full((len(steps), len(CHARS) + 1), 0.01)
+        for t, step in enumerate(steps):
+            for char, prob in step.items():
+                probs[t, blank if char is None else CHARS.index(char)] = prob
+        return probs / probs.sum(axis=1, keepdims=True)
+
+    # жадібно - 'cot', якого немає в словнику; найближче слово словника - 'cat'
+    decoded = WordBeamSearch(lm).decode(mat({'c': 0.9}, {'o': 0.5, 'a': 0.4}, {'t': 0.9}))
+    assert ''.join(CHARS[label] for label in decoded) == 'cat'
+    # жадібно - 'a do.', але 'do' не слово словника, тож крапка не може його завершити
+    decoded = WordBeamSearch(lm).decode(mat({'a': 0.9}, {' ': 0.9}, {'d': 0.9}, {'o': 0.9}, {'.': 0.5, 'g': 0.4}))
+    assert ''.join(CHARS[label] for label in decoded) == 'a dog'